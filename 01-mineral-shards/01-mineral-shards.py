@@ -22,101 +22,15 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
 
-import sys
-import numpy as np
 import os
-import tensorflow as tf
-import dill
-
-import baselines.common.tf_util as U # for tf placeholders in baselines
-
-from baselines import logger
-from baselines.common.schedules import LinearSchedule
-from baselines import deepq
-# Replay buffer or memory
-from baselines.deepq.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
-
-# Load env
-from pysc2.lib import actions as sc2_actions
-from pysc2.env import environment
-from pysc2.lib import features, actions
-
-#Below seems to be boilerplate, not sure where they're used but base_agent.py has them
-import gflags as flags
-
-_PLAYER_RELATIVE = features.SCREEN_FEATURES.player_relative.index
-_PLAYER_FRIENDLY = 1
-_PLAYER_NEUTRAL = 3  # beacon/minerals
-_PLAYER_HOSTILE = 4
-_NO_OP = actions.FUNCTIONS.no_op.id
-_MOVE_SCREEN = actions.FUNCTIONS.Move_screen.id
-_ATTACK_SCREEN = actions.FUNCTIONS.Attack_screen.id
-_SELECT_ARMY = actions.FUNCTIONS.select_army.id
-_NOT_QUEUED = [0]
-_SELECT_ALL = [0]
-
-FLAGS = flags.FLAGS
-
-# Copy and pasted as this provides model saving and loading
-class ActWrapper(object):
-  def __init__(self, act):
-    self._act = act
-    #self._act_params = act_params
-
-  @staticmethod
-  def load(path, act_params, num_cpu=16):
-    with open(path, "rb") as f:
-      model_data = dill.load(f)
-    act = deepq.build_act(**act_params)
-    sess = U.make_session(num_cpu=num_cpu)
-    sess.__enter__()
-    with tempfile.TemporaryDirectory() as td:
-      arc_path = os.path.join(td, "packed.zip")
-      with open(arc_path, "wb") as f:
-        f.write(model_data)
-
-      zipfile.ZipFile(arc_path, 'r', zipfile.ZIP_DEFLATED).extractall(td)
-      U.load_state(os.path.join(td, "model"))
-
-    return ActWrapper(act)
-
-  def __call__(self, *args, **kwargs):
-    return self._act(*args, **kwargs)
+import sys
 
-  def save(self, path):
-    """Save model to a pickle located at `path`"""
-    with tempfile.TemporaryDirectory() as td:
-      U.save_state(os.path.join(td, "model"))
-      arc_name = os.path.join(td, "packed.zip")
-      with zipfile.ZipFile(arc_name, 'w') as zipf:
-        for root, dirs, files in os.walk(td):
-          for fname in files:
-            file_path = os.path.join(root, fname)
-            if file_path != arc_name:
-              zipf.write(file_path, os.path.relpath(file_path, td))
-      with open(arc_name, "rb") as f:
-        model_data = f.read()
-    with open(path, "wb") as f:
-      dill.dump((model_data), f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from sc2rl import dqn
+from sc2rl.components import PathMemoryEncoder, FourWayMoveDecoder, PathPenaltyReward
+from sc2rl.act_wrapper import ActWrapper, load
 
-
-def load(path, act_params, num_cpu=16):
-  """Load act function that was returned by learn function.
-
-  Parameters
-  ----------
-  path: str
-      path to the act function pickle
-  num_cpu: int
-      number of cpus to use for executing the policy
-
-  Returns
-  -------
-  act: ActWrapper
-      function that takes a batch of observations
-      and returns actions.
-  """
-  return ActWrapper.load(path, num_cpu=num_cpu, act_params=act_params)
+_SCREEN_DIM = 64
 
 
 def learn(env,
@@ -142,7 +56,8 @@ def learn(env,
           num_cpu=16,
           param_noise=False,
           param_noise_threshold=0.05,
-          callback=None):
+          callback=None,
+          replay_memory_budget=None):
   """Train a deepq model.
 
   Parameters
@@ -200,9 +115,16 @@ def learn(env,
       epsilon to add to the TD errors when updating priorities.
   num_cpu: int
       number of cpus to use for training
+  param_noise: bool
+      explore with parameter space noise instead of epsilon-greedy
+  param_noise_threshold: float
+      see baselines.deepq.build_train
   callback: (locals, globals) -> None
       function called at every steps with state of the algorithm.
       If callback returns true training stops.
+  replay_memory_budget: int
+      if set, bytes the replay buffer may use; buffer_size is then derived
+      from it instead of taken as given.
 
   Returns
   -------
@@ -210,272 +132,40 @@ def learn(env,
       Wrapper over act function. Adds ability to save it and load it.
       See header of baselines/deepq/categorical.py for details on the act function.
   """
-  # Create all the functions necessary to train the model
-
-  sess = U.make_session(num_cpu=num_cpu)
-  sess.__enter__()
-
-  def make_obs_ph(name):
-    return U.BatchInput((64, 64), name=name)
-
-  act, train, update_target, debug = deepq.build_train(
-    make_obs_ph=make_obs_ph,
-    q_func=q_func,
-    num_actions=num_actions,
-    optimizer=tf.train.AdamOptimizer(learning_rate=lr),
+  # The single head picks UP/DOWN/LEFT/RIGHT; the screen is centered on the
+  # marines and remembers the path walked this episode
+  decoder = FourWayMoveDecoder(_SCREEN_DIM)
+  acts = dqn.learn(
+    env,
+    q_func,
+    encoder=PathMemoryEncoder(_SCREEN_DIM, decoder),
+    decoder=decoder,
+    reward_shaper=PathPenaltyReward(decoder, scale=10),
+    lr=lr,
+    max_timesteps=max_timesteps,
+    buffer_size=buffer_size,
+    exploration_fraction=exploration_fraction,
+    exploration_final_eps=exploration_final_eps,
+    train_freq=train_freq,
+    batch_size=batch_size,
+    print_freq=print_freq,
+    checkpoint_freq=checkpoint_freq,
+    learning_starts=learning_starts,
     gamma=gamma,
-    grad_norm_clipping=10
-  )
-  act_params = {
-    'make_obs_ph': make_obs_ph,
-    'q_func': q_func,
-    'num_actions': num_actions,
-  }
-
-  # Create the replay buffer
-  if prioritized_replay:
-    replay_buffer = PrioritizedReplayBuffer(buffer_size, alpha=prioritized_replay_alpha)
-    if prioritized_replay_beta_iters is None:
-      prioritized_replay_beta_iters = max_timesteps
-    beta_schedule = LinearSchedule(prioritized_replay_beta_iters,
-                                   initial_p=prioritized_replay_beta0,
-                                   final_p=1.0)
-  else:
-    replay_buffer = ReplayBuffer(buffer_size)
-    beta_schedule = None
-  # Create the schedule for exploration starting from 1.
-  exploration = LinearSchedule(schedule_timesteps=int(exploration_fraction * max_timesteps),
-                               initial_p=1.0,
-                               final_p=exploration_final_eps)
-
-  # Initialize the parameters and copy them to the target network.
-  U.initialize()
-  update_target()
-
-  episode_rewards = [0.0]
-  episode_minerals = [0.0]
-  saved_mean_reward = None
-
-  path_memory = np.zeros((64,64))
-
-  obs = env.reset()
-  # Select all marines first
-  obs = env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
-
-  player_relative = obs[0].observation["screen"][_PLAYER_RELATIVE]
-
-  screen = player_relative + path_memory
-
-  player_y, player_x = (player_relative == _PLAYER_FRIENDLY).nonzero()
-  player = [int(player_x.mean()), int(player_y.mean())]
-
-  if(player[0]>32):
-    screen = shift(LEFT, player[0]-32, screen)
-  elif(player[0]<32):
-    screen = shift(RIGHT, 32 - player[0], screen)
-
-  if(player[1]>32):
-    screen = shift(UP, player[1]-32, screen)
-  elif(player[1]<32):
-    screen = shift(DOWN, 32 - player[1], screen)
-
-  reset = True
-  with tempfile.TemporaryDirectory() as td:
-    model_saved = False
-    model_file = os.path.join(td, "model")
-
-    for t in range(max_timesteps):
-      if callback is not None:
-        if callback(locals(), globals()):
-          break
-      # Take action and update exploration to the newest value
-      kwargs = {}
-      if not param_noise:
-        update_eps = exploration.value(t)
-        update_param_noise_threshold = 0.
-      else:
-        update_eps = 0.
-        if param_noise_threshold >= 0.:
-          update_param_noise_threshold = param_noise_threshold
-        else:
-          # Compute the threshold such that the KL divergence between perturbed and non-perturbed
-          # policy is comparable to eps-greedy exploration with eps = exploration.value(t).
-          # See Appendix C.1 in Parameter Space Noise for Exploration, Plappert et al., 2017
-          # for detailed explanation.
-          update_param_noise_threshold = -np.log(1. - exploration.value(t) + exploration.value(t) / float(num_actions))
-        kwargs['reset'] = reset
-        kwargs['update_param_noise_threshold'] = update_param_noise_threshold
-        kwargs['update_param_noise_scale'] = True
-      action = act(np.array(screen)[None], update_eps=update_eps, **kwargs)[0]
-      print(action)
-      reset = False
-
-      coord = [player[0], player[1]]
-      rew = 0
-
-      path_memory_ = np.array(path_memory, copy=True)
-      if(action == 0): #UP
-
-        if(player[1] >= 16):
-          coord = [player[0], player[1] - 16]
-          path_memory_[player[1] - 16 : player[1], player[0]] = -1
-        elif(player[1] > 0):
-          coord = [player[0], 0]
-          path_memory_[0 : player[1], player[0]] = -1
-        else:
-          rew -= 1
-
-      elif(action == 1): #DOWN
-
-        if(player[1] <= 47):
-          coord = [player[0], player[1] + 16]
-          path_memory_[player[1] : player[1] + 16, player[0]] = -1
-        elif(player[1] > 47):
-          coord = [player[0], 63]
-          path_memory_[player[1] : 63, player[0]] = -1
-        else:
-          rew -= 1
-
-      elif(action == 2): #LEFT
-
-        if(player[0] >= 16):
-          coord = [player[0] - 16, player[1]]
-          path_memory_[player[1], player[0] - 16 : player[0]] = -1
-        elif(player[0] < 16):
-          coord = [0, player[1]]
-          path_memory_[player[1], 0 : player[0]] = -1
-        else:
-          rew -= 1
-
-      elif(action == 3): #RIGHT
-
-        if(player[0] <= 47):
-          coord = [player[0] + 16, player[1]]
-          path_memory_[player[1], player[0] : player[0] + 16] = -1
-        elif(player[0] > 47):
-          coord = [63, player[1]]
-          path_memory_[player[1], player[0] : 63] = -1
-        else:
-          rew -= 1
-
-      else:
-        #Cannot move, give minus reward
-        rew -= 1
-
-      if(path_memory[coord[1],coord[0]] != 0):
-        rew -= 0.5
-
-      path_memory = np.array(path_memory_)
-      #print("action : %s Coord : %s" % (action, coord))
-
-      if _MOVE_SCREEN not in obs[0].observation["available_actions"]:
-        obs = env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
-
-      new_action = [sc2_actions.FunctionCall(_MOVE_SCREEN, [_NOT_QUEUED, coord])]
-
-      # else:
-      #   new_action = [sc2_actions.FunctionCall(_NO_OP, [])]
-
-      obs = env.step(actions=new_action)
-
-      player_relative = obs[0].observation["screen"][_PLAYER_RELATIVE]
-      new_screen = player_relative + path_memory
-
-      player_y, player_x = (player_relative == _PLAYER_FRIENDLY).nonzero()
-      player = [int(player_x.mean()), int(player_y.mean())]
-
-      if(player[0]>32):
-        new_screen = shift(LEFT, player[0]-32, new_screen)
-      elif(player[0]<32):
-        new_screen = shift(RIGHT, 32 - player[0], new_screen)
-
-      if(player[1]>32):
-        new_screen = shift(UP, player[1]-32, new_screen)
-      elif(player[1]<32):
-        new_screen = shift(DOWN, 32 - player[1], new_screen)
-
-      rew += obs[0].reward * 10
-
-      done = obs[0].step_type == environment.StepType.LAST
-
-      # Store transition in the replay buffer.
-      replay_buffer.add(screen, action, rew, new_screen, float(done))
-      screen = new_screen
-
-      episode_rewards[-1] += rew
-      episode_minerals[-1] += obs[0].reward
-
-      if done:
-        obs = env.reset()
-        player_relative = obs[0].observation["screen"][_PLAYER_RELATIVE]
-
-        screen = player_relative + path_memory
-
-        player_y, player_x = (player_relative == _PLAYER_FRIENDLY).nonzero()
-        player = [int(player_x.mean()), int(player_y.mean())]
-
-        if(player[0]>32):
-          screen = shift(LEFT, player[0]-32, screen)
-        elif(player[0]<32):
-          screen = shift(RIGHT, 32 - player[0], screen)
-
-        if(player[1]>32):
-          screen = shift(UP, player[1]-32, screen)
-        elif(player[1]<32):
-          screen = shift(DOWN, 32 - player[1], screen)
-
-        # Select all marines first
-        env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
-        episode_rewards.append(0.0)
-        episode_minerals.append(0.0)
-
-        path_memory = np.zeros((64,64))
-
-        reset = True
-
-      if t > learning_starts and t % train_freq == 0:
-        # Minimize the error in Bellman's equation on a batch sampled from replay buffer.
-        if prioritized_replay:
-          experience = replay_buffer.sample(batch_size, beta=beta_schedule.value(t))
-          (obses_t, actions, rewards, obses_tp1, dones, weights, batch_idxes) = experience
-        else:
-          obses_t, actions, rewards, obses_tp1, dones = replay_buffer.sample(batch_size)
-          weights, batch_idxes = np.ones_like(rewards), None
-        td_errors = train(obses_t, actions, rewards, obses_tp1, dones, weights)
-        if prioritized_replay:
-          new_priorities = np.abs(td_errors) + prioritized_replay_eps
-          replay_buffer.update_priorities(batch_idxes, new_priorities)
-
-      if t > learning_starts and t % target_network_update_freq == 0:
-        # Update target network periodically.
-        update_target()
-
-      mean_100ep_reward = round(np.mean(episode_rewards[-101:-1]), 1)
-      mean_100ep_mineral = round(np.mean(episode_minerals[-101:-1]), 1)
-      num_episodes = len(episode_rewards)
-      if done and print_freq is not None and len(episode_rewards) % print_freq == 0:
-        logger.record_tabular("steps", t)
-        logger.record_tabular("episodes", num_episodes)
-        logger.record_tabular("mean 100 episode reward", mean_100ep_reward)
-        logger.record_tabular("mean 100 episode mineral", mean_100ep_mineral)
-        logger.record_tabular("% time spent exploring", int(100 * exploration.value(t)))
-        logger.dump_tabular()
-
-      if (checkpoint_freq is not None and t > learning_starts and
-              num_episodes > 100 and t % checkpoint_freq == 0):
-        if saved_mean_reward is None or mean_100ep_reward > saved_mean_reward:
-          if print_freq is not None:
-            logger.log("Saving model due to mean reward increase: {} -> {}".format(
-              saved_mean_reward, mean_100ep_reward))
-          U.save_state(model_file)
-          model_saved = True
-          saved_mean_reward = mean_100ep_reward
-    if model_saved:
-      if print_freq is not None:
-        logger.log("Restored model with mean reward: {}".format(saved_mean_reward))
-      U.load_state(model_file)
+    target_network_update_freq=target_network_update_freq,
+    prioritized_replay=prioritized_replay,
+    prioritized_replay_alpha=prioritized_replay_alpha,
+    prioritized_replay_beta0=prioritized_replay_beta0,
+    prioritized_replay_beta_iters=prioritized_replay_beta_iters,
+    prioritized_replay_eps=prioritized_replay_eps,
+    num_cpu=num_cpu,
+    param_noise=param_noise,
+    param_noise_threshold=param_noise_threshold,
+    callback=callback,
+    replay_memory_budget=replay_memory_budget,
+    score_name="mineral")
+  return acts["direction"]
 
-  return ActWrapper(act)
 
   
 # Create DQN model with baselines
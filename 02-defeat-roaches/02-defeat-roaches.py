@@ -0,0 +1,384 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""DQN on DefeatRoaches with a spatial Attack_screen head.
+
+Observations are friendly, hostile and hit point planes of the screen
+(uint8, h x w x 3). The Q-network is fully convolutional with one Q-value
+per screen pixel; the chosen pixel is the Attack_screen target. All
+--num_envs envs are stepped in lockstep through a ShmVecEnv, acting is one
+batched act call per step, and replay keeps the uint8 planes as fixed-size
+records in a numpy ring (sc2rl.mmap_replay with in_memory=True) instead of
+a list of Python tuples.
+
+  python 02-defeat-roaches.py --num_envs=8 --timesteps=2000000
+"""
+
+import sys
+import os
+import time
+import datetime
+
+import numpy as np
+import tensorflow as tf
+from absl import flags
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import baselines.common.tf_util as U
+from baselines import logger
+from baselines import deepq
+from baselines.common.schedules import LinearSchedule
+from baselines.logger import Logger, TensorBoardOutputFormat, HumanOutputFormat
+
+from pysc2.lib import actions as sc2_actions
+from pysc2.lib import features
+
+from sc2rl.act_wrapper import ActWrapper
+from sc2rl.action_catalog import load_catalog
+from sc2rl.env_profiles import make_env, PROFILES
+from sc2rl.episode_stats import EpisodeStats
+from sc2rl.exploration import ScheduleTable, EpsilonGreedy
+from sc2rl.memory import replay_footprint, record_footprint
+from sc2rl.metrics import MetricsSink
+from sc2rl.mmap_replay import MmapReplayBuffer, MmapPrioritizedReplayBuffer
+from sc2rl.profiler import PhaseProfiler
+from sc2rl.replay_io import bulk_add
+from sc2rl.shm_vec_env import ShmVecEnv
+
+_PLAYER_RELATIVE = features.SCREEN_FEATURES.player_relative.index
+_UNIT_HIT_POINTS = features.SCREEN_FEATURES.unit_hit_points.index
+_PLAYER_FRIENDLY = 1
+_PLAYER_HOSTILE = 4
+
+_ATTACK_SCREEN = sc2_actions.FUNCTIONS.Attack_screen.id
+_NOT_QUEUED = [0]
+
+PROJ_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("num_envs", 8, "env worker processes")
+flags.DEFINE_integer("screen_dim", 32, "screen and minimap size in pixels")
+flags.DEFINE_integer("step_mul", 8, "game steps per agent step")
+flags.DEFINE_enum("env_profile", "train", sorted(PROFILES),
+                  "SC2Env profile (see sc2rl.env_profiles)")
+flags.DEFINE_integer("timesteps", 2000000, "env steps (over all envs) to train")
+flags.DEFINE_float("lr", 0.0005, "learning rate")
+flags.DEFINE_integer("buffer_size", 100000, "replay buffer size")
+flags.DEFINE_float("exploration_fraction", 0.1, "fraction of training to anneal exploration over")
+flags.DEFINE_boolean("prioritized", True, "prioritized replay")
+flags.DEFINE_integer("num_cpu", 16, "number of cpus of the TensorFlow session")
+flags.DEFINE_boolean("profile", False, "time each phase of the training step")
+flags.DEFINE_string("log", "tensorboard", "logging type(stdout, tensorboard)")
+
+
+def roach_obs(timestep):
+  """ShmVecEnv `obs_fn`: friendly, hostile and hit point planes."""
+  screen = timestep.observation["screen"]
+  player_relative = screen[_PLAYER_RELATIVE]
+  planes = np.stack([(player_relative == _PLAYER_FRIENDLY) * 255,
+                     (player_relative == _PLAYER_HOSTILE) * 255,
+                     np.minimum(screen[_UNIT_HIT_POINTS], 255)], axis=-1)
+  available = load_catalog().available_mask([timestep.observation["available_actions"]])[0]
+  return {"planes": planes.astype(np.uint8), "available_actions": available}
+
+
+def roach_obs_spec(screen_dim):
+  catalog = load_catalog(screen_size=screen_dim)
+  return {
+    "planes": (catalog.spatial_shape("screen") + (3,), np.uint8),
+    "available_actions": ((catalog.num_functions,), np.bool_),
+  }
+
+
+def fully_conv_q_func(inpt, num_actions, scope, reuse=False):
+  """One Q-value per screen pixel (num_actions = height * width)."""
+  with tf.variable_scope(scope, reuse=reuse):
+    out = tf.cast(inpt, tf.float32) / 255.
+    out = tf.layers.conv2d(out, 16, 5, padding="same", activation=tf.nn.relu, name="conv1")
+    out = tf.layers.conv2d(out, 32, 3, padding="same", activation=tf.nn.relu, name="conv2")
+    out = tf.layers.conv2d(out, 1, 1, name="spatial")
+    return tf.reshape(out, [-1, num_actions])
+
+
+def learn(vec_env,
+          q_func,
+          lr=5e-4,
+          max_timesteps=2000000,
+          buffer_size=100000,
+          exploration_fraction=0.1,
+          exploration_final_eps=0.02,
+          train_freq=1,
+          batch_size=32,
+          print_freq=10,
+          learning_starts=5000,
+          gamma=0.99,
+          target_network_update_freq=1000,
+          prioritized_replay=True,
+          prioritized_replay_alpha=0.6,
+          prioritized_replay_beta0=0.4,
+          prioritized_replay_beta_iters=None,
+          prioritized_replay_eps=1e-6,
+          num_cpu=16,
+          profile=False,
+          profile_freq=1000,
+          callback=None,
+          async_metrics=True):
+  """Train a spatial Attack_screen DQN on DefeatRoaches.
+
+  Parameters
+  -------
+  vec_env: ShmVecEnv
+      DefeatRoaches envs built with obs_fn=roach_obs, roach_obs_spec
+  q_func: (tf.Variable, int, str, bool) -> tf.Variable
+      the model that takes the following inputs:
+          observation_in: object
+              the output of observation placeholder
+          num_actions: int
+              number of actions
+          scope: str
+          reuse: bool
+              should be passed to outer variable scope
+      and returns a tensor of shape (batch_size, num_actions) with values of every action.
+      e.g. fully_conv_q_func
+  lr: float
+      learning rate for adam optimizer
+  max_timesteps: int
+      number of env steps, summed over all envs, to train for
+  buffer_size: int
+      size of the replay buffer
+  exploration_fraction: float
+      fraction of entire training period over which the exploration rate is annealed
+  exploration_final_eps: float
+      final value of random action probability
+  train_freq: int
+      update the model every `train_freq` vec env steps.
+  batch_size: int
+      size of a batched sampled from replay buffer for training
+  print_freq: int
+      how often to print out training progress
+      set to None to disable printing
+  learning_starts: int
+      how many env steps of the model to collect transitions for before learning starts
+  gamma: float
+      discount factor
+  target_network_update_freq: int
+      update the target network every `target_network_update_freq` env steps.
+  prioritized_replay: True
+      if True prioritized replay buffer will be used.
+  prioritized_replay_alpha: float
+      alpha parameter for prioritized replay buffer
+  prioritized_replay_beta0: float
+      initial value of beta for prioritized replay buffer
+  prioritized_replay_beta_iters: int
+      number of iterations over which beta will be annealed from initial value
+      to 1.0. If set to None equals to max_timesteps.
+  prioritized_replay_eps: float
+      epsilon to add to the TD errors when updating priorities.
+  num_cpu: int
+      number of cpus to use for training
+  profile: bool
+      if True, time every phase of a step and record the percentiles on the logger.
+  profile_freq: int
+      number of vec env steps summarized by each profiler rollup.
+  callback: (locals, globals) -> None
+      function called at every step with state of the algorithm.
+      If callback returns true training stops.
+  async_metrics: bool
+      if True, metrics are buffered and written to the baselines logger on a
+      background thread (see sc2rl.metrics); callbacks should record through
+      the `metrics` local then. If False they are written synchronously.
+
+  Returns
+  -------
+  act: ActWrapper
+      Wrapper over act function. Adds ability to save it and load it.
+  """
+  sess = U.make_session(num_cpu)
+  sess.__enter__()
+
+  metrics = MetricsSink() if async_metrics else logger
+
+  num_envs = vec_env.num_envs
+  ob_shape = vec_env.obs_spec["planes"][0]
+  width = ob_shape[1]
+  num_actions = ob_shape[0] * width
+
+  def make_obs_ph(name):
+    return U.BatchInput(ob_shape, dtype=tf.uint8, name=name)
+
+  act, train, update_target, debug = deepq.build_train(
+    make_obs_ph=make_obs_ph,
+    q_func=q_func,
+    num_actions=num_actions,
+    optimizer=tf.train.AdamOptimizer(learning_rate=lr),
+    gamma=gamma,
+    grad_norm_clipping=10,
+    scope="deep_roaches")
+
+  # uint8 planes as fixed-size records in RAM instead of tuples of arrays
+  if prioritized_replay:
+    replay_buffer = MmapPrioritizedReplayBuffer(buffer_size, alpha=prioritized_replay_alpha,
+                                                in_memory=True)
+    if prioritized_replay_beta_iters is None:
+      prioritized_replay_beta_iters = max_timesteps
+    beta_schedule = ScheduleTable(LinearSchedule(prioritized_replay_beta_iters,
+                                                 initial_p=prioritized_replay_beta0,
+                                                 final_p=1.0),
+                                  max_timesteps)
+  else:
+    replay_buffer = MmapReplayBuffer(buffer_size, in_memory=True)
+    beta_schedule = None
+  exploration = ScheduleTable(LinearSchedule(schedule_timesteps=int(exploration_fraction * max_timesteps),
+                                             initial_p=1.0,
+                                             final_p=exploration_final_eps),
+                              max_timesteps)
+  explorer = EpsilonGreedy(num_actions)
+
+  U.initialize()
+  update_target()
+
+  episode_stats = EpisodeStats(["reward"], window=100)
+  episode_rewards = np.zeros(num_envs)
+  num_episodes = 0
+  num_reselects = 0
+  mean_100ep_reward = np.nan
+  profiler = PhaseProfiler(enabled=profile, rollup_freq=profile_freq, sink=metrics)
+
+  planes = vec_env.reset()["planes"].copy()
+  t = 0
+  last_target_update = 0
+  step = 0
+  tstart = time.time()
+  try:
+    while t < max_timesteps:
+      if callback is not None:
+        if callback(locals(), globals()):
+          break
+      eps = exploration.value(t)
+
+      with profiler.phase("act"):
+        greedy = act(planes, stochastic=False)
+        actions = explorer.select(greedy[:, None], eps)[:, 0]
+
+      calls = [[sc2_actions.FunctionCall(_ATTACK_SCREEN, [_NOT_QUEUED, [int(a % width), int(a // width)]])]
+               for a in actions]
+      with profiler.phase("env_step"):
+        obs, rewards, dones = vec_env.step(calls)
+        new_planes = obs["planes"].copy()
+
+      with profiler.phase("replay_add"):
+        # Envs reset themselves, so the new planes of a done env start its next
+        # episode; done transitions are not bootstrapped from them. Attacks
+        # that could not run are not stored.
+        executed = vec_env.executed.copy()
+        num_reselects += int(vec_env.reselected.sum())
+        bulk_add(replay_buffer, planes[executed], actions[executed], rewards[executed].astype(np.float32),
+                 new_planes[executed], dones[executed].astype(np.float32))
+      planes = new_planes
+
+      episode_rewards += rewards
+      for i in np.flatnonzero(dones):
+        episode_stats.end_episode(reward=episode_rewards[i])
+        episode_rewards[i] = 0.
+        num_episodes = episode_stats.num_episodes
+        mean_100ep_reward = round(episode_stats["reward"].mean(), 1)
+        if print_freq is not None and num_episodes % print_freq == 0:
+          metrics.record_tabular("steps", t)
+          metrics.record_tabular("episodes", num_episodes)
+          metrics.record_tabular("mean 100 episode reward", mean_100ep_reward)
+          metrics.record_tabular("% time spent exploring", int(100 * eps))
+          metrics.record_tabular("steps per second", int(t / (time.time() - tstart)))
+          metrics.record_tabular("steps with reselect", num_reselects)
+          record_footprint("replay", replay_footprint(replay_buffer), sink=metrics)
+          metrics.dump_tabular()
+
+      t += num_envs
+      step += 1
+
+      if t > learning_starts and step % train_freq == 0:
+        with profiler.phase("replay_sample"):
+          if prioritized_replay:
+            experience = replay_buffer.sample(batch_size, beta=beta_schedule.value(t))
+            (obses_t, batch_actions, batch_rewards, obses_tp1, batch_dones, weights, batch_idxes) = experience
+          else:
+            obses_t, batch_actions, batch_rewards, obses_tp1, batch_dones = replay_buffer.sample(batch_size)
+            weights, batch_idxes = np.ones_like(batch_rewards), None
+        with profiler.phase("train"):
+          td_errors = train(obses_t, batch_actions, batch_rewards, obses_tp1, batch_dones, weights)
+        if prioritized_replay:
+          with profiler.phase("update_priorities"):
+            replay_buffer.update_priorities(batch_idxes, np.abs(td_errors) + prioritized_replay_eps)
+
+      if t > learning_starts and t - last_target_update >= target_network_update_freq:
+        with profiler.phase("update_target"):
+          update_target()
+        last_target_update = t
+
+      profiler.step(step)
+  finally:
+    if async_metrics:
+      metrics.close()
+
+  return ActWrapper(act)
+
+
+def main():
+  output_formats = []
+  if (FLAGS.log == "tensorboard"):
+    logdir = "tensorboard/DefeatRoaches/deepq/%s_lr%s_n%s/%s" % (
+      FLAGS.timesteps, FLAGS.lr, FLAGS.num_envs,
+      datetime.datetime.now().strftime("%m%d%H%M"))
+    output_formats.append(TensorBoardOutputFormat(logdir))
+  elif (FLAGS.log == "stdout"):
+    output_formats.append(HumanOutputFormat(sys.stdout))
+  if output_formats:
+    Logger.DEFAULT \
+      = Logger.CURRENT \
+      = Logger(dir=None, output_formats=output_formats)
+
+  screen_dim = FLAGS.screen_dim
+
+  def env_fn(index):
+    return make_env("DefeatRoaches", FLAGS.env_profile, screen_dim=screen_dim, step_mul=FLAGS.step_mul)
+
+  # Fork the env workers before the TensorFlow session exists
+  with ShmVecEnv([env_fn] * FLAGS.num_envs, roach_obs_spec(screen_dim),
+                 obs_fn=roach_obs) as vec_env:
+    act = learn(
+      vec_env,
+      q_func=fully_conv_q_func,
+      lr=FLAGS.lr,
+      max_timesteps=FLAGS.timesteps,
+      buffer_size=FLAGS.buffer_size,
+      exploration_fraction=FLAGS.exploration_fraction,
+      prioritized_replay=FLAGS.prioritized,
+      num_cpu=FLAGS.num_cpu,
+      profile=FLAGS.profile)
+  act.save(os.path.join(PROJ_DIR, "defeat_roaches.pkl"))
+
+
+if __name__ == '__main__':
+  FLAGS(sys.argv)
+  main()
@@ -0,0 +1,94 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Record scripted-policy demonstrations as an offline dataset.
+
+Runs the vectorized beacon policy (sc2rl.scripted) on --num_envs
+MoveToBeacon envs and records the transitions with sc2rl.dataset, ready
+for the omni beacon learner's start.py --replay_warmstart:
+
+  python demos.py --num_envs=8 --steps=5000 --out=demos/beacon
+  python start.py --replay_warmstart=demos/beacon
+"""
+
+import sys
+import os
+import time
+
+from absl import flags
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sc2rl import env_profiles
+from sc2rl.dataset import TransitionRecorder
+from sc2rl.scripted import demo_transitions
+from sc2rl.shm_vec_env import ShmVecEnv, player_relative_spec
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("num_envs", 8, "env worker processes")
+flags.DEFINE_integer("steps", 5000, "steps per env")
+flags.DEFINE_integer("screen_dim", 16, "screen and minimap size in pixels")
+flags.DEFINE_integer("step_mul", 8, "game steps per agent step")
+flags.DEFINE_string("out", "demos", "dataset directory")
+flags.DEFINE_boolean("fake", False, "use sc2rl.fake_env instead of StarCraft II")
+
+# The recorded (x, y) clicks on beacon screens only fit the omni beacon learner
+_MAP = "MoveToBeacon"
+
+
+def make_env(index):
+  screen_dim = FLAGS.screen_dim
+  if FLAGS.fake:
+    from sc2rl.fake_env import FakeSC2Env
+    return FakeSC2Env(map_name=_MAP, screen_size_px=(screen_dim, screen_dim),
+                      minimap_size_px=(screen_dim, screen_dim), seed=index)
+  return env_profiles.make_env(_MAP, "train", screen_dim=screen_dim, step_mul=FLAGS.step_mul)
+
+
+def main():
+  recorder = TransitionRecorder(FLAGS.out)
+  num_episodes = 0
+  num_transitions = 0
+  total_reward = 0.
+  start = time.time()
+  with ShmVecEnv([make_env] * FLAGS.num_envs, player_relative_spec(FLAGS.screen_dim)) as vec_env:
+    for columns in demo_transitions(vec_env, FLAGS.steps):
+      for row in zip(columns["obs_t"], columns["action"], columns["reward"],
+                     columns["obs_tp1"], columns["done"]):
+        recorder.add(*row)
+      num_transitions += len(columns["done"])
+      num_episodes += int(columns["done"].sum())
+      total_reward += float(columns["reward"].sum())
+  recorder.close()
+  elapsed = time.time() - start
+  num_steps = FLAGS.steps * FLAGS.num_envs
+  print("recorded %d transitions in %.1fs (%.0f steps/s) to %s" % (
+    num_transitions, elapsed, num_steps / elapsed, FLAGS.out))
+  if num_episodes:
+    print("%d episodes, mean reward %.2f" % (num_episodes, total_reward / num_episodes))
+
+
+if __name__ == '__main__':
+  FLAGS(sys.argv)
+  main()
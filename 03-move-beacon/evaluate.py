@@ -0,0 +1,114 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Evaluate saved deepq checkpoints with greedy, batched rollouts.
+
+Finds every mineral_x_<tag>.pkl / mineral_y_<tag>.pkl pair that
+start.py's deepq_callback saved in --checkpoints, evaluates them in
+parallel (see sc2rl.evaluation) and prints and writes one CSV row each:
+
+  python evaluate.py --checkpoints=models/deepq/2017-11-20 --episodes=100
+"""
+
+import sys
+import os
+import csv
+
+from absl import flags
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sc2rl import env_profiles
+from sc2rl.evaluation import find_checkpoints, evaluate_checkpoints
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("checkpoints", "models/deepq", "directory of the checkpoints to evaluate")
+flags.DEFINE_string("output", "", "CSV file to write (default: <checkpoints>/evaluation.csv)")
+flags.DEFINE_string("map", "MoveToBeacon", "name of the map")
+flags.DEFINE_integer("episodes", 100, "greedy episodes per checkpoint")
+flags.DEFINE_integer("num_envs", 4, "env workers per checkpoint")
+flags.DEFINE_integer("max_parallel", 0, "checkpoints evaluated at once (0 = fill all cores)")
+flags.DEFINE_integer("screen_dim", 16, "screen and minimap size the models were trained on")
+flags.DEFINE_integer("step_mul", 8, "game steps per agent step")
+flags.DEFINE_boolean("dueling", True, "whether the models use a dueling head")
+flags.DEFINE_boolean("fake", False, "use sc2rl.fake_env instead of StarCraft II")
+
+FIELDS = ["checkpoint", "episodes", "reward_mean", "reward_ci95",
+          "beacon_time_mean", "beacon_time_ci95", "x_path", "y_path", "error"]
+
+
+def make_env(index):
+  screen_dim = FLAGS.screen_dim
+  if FLAGS.fake:
+    from sc2rl.fake_env import FakeSC2Env
+    return FakeSC2Env(map_name=FLAGS.map, screen_size_px=(screen_dim, screen_dim),
+                      minimap_size_px=(screen_dim, screen_dim), seed=index)
+  return env_profiles.make_env(FLAGS.map, "train", screen_dim=screen_dim, step_mul=FLAGS.step_mul)
+
+
+def main():
+  checkpoints = find_checkpoints(FLAGS.checkpoints)
+  if not checkpoints:
+    print("no checkpoint pairs in %s" % FLAGS.checkpoints)
+    return
+  # Imported once here, before the evaluators are forked, instead of in every one
+  import tensorflow
+  import baselines.common.tf_util as U
+  from baselines import deepq
+
+  screen_dim = FLAGS.screen_dim
+  model = deepq.models.cnn_to_mlp(
+    convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=FLAGS.dueling)
+  output = FLAGS.output or os.path.join(FLAGS.checkpoints, "evaluation.csv")
+
+  results = []
+  for result in evaluate_checkpoints(
+      checkpoints,
+      max_parallel=FLAGS.max_parallel or None,
+      env_fn=make_env,
+      make_obs_ph=lambda name: U.BatchInput((screen_dim, screen_dim), name=name),
+      q_func=model,
+      num_actions=screen_dim,
+      screen_dim=screen_dim,
+      num_envs=FLAGS.num_envs,
+      num_episodes=FLAGS.episodes):
+    if "error" in result:
+      print("%s: failed, %s" % (result["checkpoint"], result["error"]))
+    else:
+      print("%s: reward %.2f +- %.2f, steps per beacon %.2f +- %.2f (%d episodes)" % (
+        result["checkpoint"], result["reward_mean"], result["reward_ci95"],
+        result["beacon_time_mean"], result["beacon_time_ci95"], result["episodes"]))
+    results.append(result)
+
+  with open(output, "w", newline="") as f:
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    for result in sorted(results, key=lambda r: r.get("reward_mean", float("-inf")), reverse=True):
+      writer.writerow(result)
+  print("wrote %s" % output)
+
+
+if __name__ == '__main__':
+  FLAGS(sys.argv)
+  main()
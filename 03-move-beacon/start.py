@@ -24,36 +24,18 @@ SOFTWARE.
 
 import sys
 import os
-from importlib import import_module
-
-from absl import flags
-from baselines import deepq
-from pysc2.env import sc2_env
-from pysc2.lib import actions
-import os
-
-deepq_model = import_module("02-omni-move-beacon")
-
 import datetime
-
-from baselines.common.vec_env.subproc_vec_env import SubprocVecEnv
-#from a2c.policies import CnnPolicy
-#from a2c import a2c
-from baselines.logger import Logger, TensorBoardOutputFormat, HumanOutputFormat
-
 import random
 
-#import deepq_mineral_4way
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from sc2rl.startup import ImportTimer
 
-import threading
-import time
-
-_MOVE_SCREEN = actions.FUNCTIONS.Move_screen.id
-_SELECT_ARMY = actions.FUNCTIONS.select_army.id
-_SELECT_ALL = [0]
-_NOT_QUEUED = [0]
-
-step_mul = 8
+# TensorFlow, baselines and pysc2 are imported in main() for the chosen
+# algorithm only, see sc2rl.startup
+import_timer = ImportTimer()
+with import_timer.phase("flags"):
+  from absl import flags
+  from sc2rl.env_profiles import make_env, PROFILES
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string("map", "MoveToBeacon",
@@ -69,7 +51,34 @@ flags.DEFINE_float("lr", 0.0005, "Learning rate")
 flags.DEFINE_integer("num_agents", 4, "number of RL agents for A2C")
 flags.DEFINE_integer("num_scripts", 4, "number of script agents for A2C")
 flags.DEFINE_integer("nsteps", 20, "number of batch steps for A2C")
+flags.DEFINE_integer("num_actors", 4, "number of actor processes for Ape-X")
+flags.DEFINE_integer("screen_dim", 16, "screen and minimap size, also the actions per head")
+flags.DEFINE_integer("buffer_size", 5000, "replay buffer size")
+flags.DEFINE_integer("train_freq", 4, "env steps per train step")
+flags.DEFINE_integer("num_cpu", 16, "number of cpus of the TensorFlow session")
+flags.DEFINE_string("progress_json", "", "also write every log dump as a JSON line to this file")
+flags.DEFINE_integer("population_size", 4, "number of population based training members")
+flags.DEFINE_integer("pbt_ready_steps", 20000, "env steps between PBT exploit/explore rounds")
 flags.DEFINE_string("experiment", "SCREEN_DIM=16", "name of experiment")
+flags.DEFINE_boolean("profile", False, "time each phase of the deepq training step")
+flags.DEFINE_integer("profile_freq", 1000, "steps per profiler rollup")
+flags.DEFINE_integer("replay_memory_mb", 0,
+                     "size the replay buffer to this many MB instead of buffer_size (0 = off)")
+flags.DEFINE_string("state_dir", None, "keep a resumable snapshot of the deepq run here")
+flags.DEFINE_integer("snapshot_freq", 50000, "minimum steps between deepq snapshots")
+flags.DEFINE_enum("replay_backend", "memory", ["memory", "mmap"],
+                  "keep deepq replay screens in RAM or in a memory-mapped file")
+flags.DEFINE_string("replay_mmap_dir", None, "directory of the mmap replay frame file")
+flags.DEFINE_string("record_dir", None, "record every deepq transition to this offline dataset")
+flags.DEFINE_string("replay_warmstart", None,
+                    "dataset or state_dir of an earlier deepq run to pre-fill replay from")
+flags.DEFINE_enum("env_profile", "train", sorted(PROFILES),
+                  "SC2Env profile: headless training or rendered watching with replays")
+flags.DEFINE_integer("step_mul", 0, "game steps per agent step (0 = the map's setting)")
+flags.DEFINE_integer("save_replay_period", 0,
+                     "save the SC2 replay of every Nth deepq episode in the background (0 = off)")
+flags.DEFINE_string("replay_save_dir", "replays/", "directory and index of the saved SC2 replays")
+flags.DEFINE_boolean("import_report", False, "print how long the imports of the chosen algorithm took")
 
 PROJ_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -78,8 +87,6 @@ last_filename = ""
 
 start_time = datetime.datetime.now().strftime("%m%d%H%M")
 
-SCREEN_DIM = 16
-
 def main():
 
   print("algorithm : %s" % FLAGS.algorithm)
@@ -89,6 +96,10 @@ def main():
   print("dueling : %s" % FLAGS.dueling)
   print("num_agents : %s" % FLAGS.num_agents)
   print("lr : %s" % FLAGS.lr)
+  print("screen_dim : %s" % FLAGS.screen_dim)
+  print("buffer_size : %s" % FLAGS.buffer_size)
+  print("train_freq : %s" % FLAGS.train_freq)
+  print("env_profile : %s" % FLAGS.env_profile)
 
   if (FLAGS.lr == 0):
     FLAGS.lr = random.uniform(0.00001, 0.001)
@@ -103,7 +114,7 @@ def main():
     logdir = "tensorboard/mineral/%s/%s_%s_prio%s_duel%s_lr%s/%s-%s" % (
       FLAGS.algorithm, FLAGS.timesteps, FLAGS.exploration_fraction,
       FLAGS.prioritized, FLAGS.dueling, lr_round, start_time, FLAGS.experiment)
-  elif (FLAGS.algorithm == "deepq"):
+  elif (FLAGS.algorithm in ("deepq", "apex", "pbt")):
     logdir = "tensorboard/%s/%s/%s_%s_prio%s_duel%s_lr%s/%s-%s" % (
       FLAGS.map, FLAGS.algorithm, FLAGS.timesteps, FLAGS.exploration_fraction,
       FLAGS.prioritized, FLAGS.dueling, lr_round, start_time, FLAGS.experiment)
@@ -113,64 +124,169 @@ def main():
       FLAGS.num_agents + FLAGS.num_scripts, FLAGS.num_scripts,
       FLAGS.nsteps, lr_round, start_time, FLAGS.experiment)
 
+  with import_timer.phase("logger"):
+    from baselines.logger import Logger, TensorBoardOutputFormat, HumanOutputFormat, JSONOutputFormat
+
+  with import_timer.phase(FLAGS.algorithm):
+    if (FLAGS.algorithm in ("deepq", "apex", "pbt", "deepq-4way")):
+      from baselines import deepq
+    if (FLAGS.algorithm in ("deepq", "pbt", "deepq-4way")):
+      from sc2rl import dqn
+      from sc2rl.components import (BeaconEncoder, XYMoveDecoder, ScaledReward,
+                                    PathMemoryEncoder, FourWayMoveDecoder, PathPenaltyReward)
+    if (FLAGS.algorithm == "apex"):
+      import baselines.common.tf_util as U
+      from sc2rl import apex
+    if (FLAGS.algorithm == "pbt"):
+      from sc2rl import pbt
+    if (FLAGS.algorithm == "a2c"):
+      from sc2rl import a2c
+      from sc2rl.a2c import CnnPolicy
+      from sc2rl.scripted import beacon_policy, nearest_shard_policy
+      from sc2rl.shm_vec_env import ShmVecEnv, player_relative_spec
+
+  if (FLAGS.import_report):
+    print(import_timer.report())
+
+  output_formats = []
   if (FLAGS.log == "tensorboard"):
-    Logger.DEFAULT \
-      = Logger.CURRENT \
-      = Logger(dir=None,
-               output_formats=[TensorBoardOutputFormat(logdir)])
-
+    output_formats.append(TensorBoardOutputFormat(logdir))
   elif (FLAGS.log == "stdout"):
+    output_formats.append(HumanOutputFormat(sys.stdout))
+  if (FLAGS.progress_json):
+    output_formats.append(JSONOutputFormat(open(FLAGS.progress_json, "wt")))
+
+  if output_formats:
     Logger.DEFAULT \
       = Logger.CURRENT \
-      = Logger(dir=None,
-               output_formats=[HumanOutputFormat(sys.stdout)])
+      = Logger(dir=None, output_formats=output_formats)
+
+  screen_dim = FLAGS.screen_dim
 
   if (FLAGS.algorithm == "deepq"):
 
-    with sc2_env.SC2Env(
-        map_name="MoveToBeacon",
-        step_mul=step_mul,
-        visualize=True,
-        screen_size_px=(SCREEN_DIM, SCREEN_DIM),
-        minimap_size_px=(SCREEN_DIM, SCREEN_DIM),
-        replay_dir='replays/') as env:
+    with make_env("MoveToBeacon", FLAGS.env_profile, screen_dim, FLAGS.step_mul) as env:
 
       model = deepq.models.cnn_to_mlp(
-        convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=True)
+        convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=FLAGS.dueling)
 
-      act = deepq_model.learn(
+      acts = dqn.learn(
         env,
         q_func=model,
-        num_actions=SCREEN_DIM,
+        encoder=BeaconEncoder(screen_dim),
+        decoder=XYMoveDecoder(screen_dim),
+        reward_shaper=ScaledReward(100),
         lr=FLAGS.lr,
         max_timesteps=FLAGS.timesteps,
-        buffer_size=5000,
+        buffer_size=FLAGS.buffer_size,
         exploration_fraction=FLAGS.exploration_fraction,
         exploration_final_eps=0.01,
-        train_freq=4,
+        train_freq=FLAGS.train_freq,
         learning_starts=500,
         target_network_update_freq=100,
         gamma=0.99,
-        prioritized_replay=True,
-        callback=deepq_callback)
-      act.save("mineral_shards.pkl")
+        prioritized_replay=FLAGS.prioritized,
+        num_cpu=FLAGS.num_cpu,
+        callback=deepq_callback,
+        profile=FLAGS.profile,
+        profile_freq=FLAGS.profile_freq,
+        replay_memory_budget=FLAGS.replay_memory_mb * 2 ** 20 or None,
+        state_dir=FLAGS.state_dir,
+        snapshot_freq=FLAGS.snapshot_freq,
+        replay_backend=FLAGS.replay_backend,
+        replay_mmap_dir=FLAGS.replay_mmap_dir,
+        record_dir=FLAGS.record_dir,
+        replay_warmstart=FLAGS.replay_warmstart,
+        replay_save_period=FLAGS.save_replay_period or None,
+        replay_dir=FLAGS.replay_save_dir,
+        score_name="beacon")
+      acts["x"].save("mineral_x.pkl")
+      acts["y"].save("mineral_y.pkl")
+
+  elif (FLAGS.algorithm == "apex"):
+
+    def env_fn(actor_id):
+      return make_env("MoveToBeacon", FLAGS.env_profile, screen_dim, FLAGS.step_mul)
+
+    model = deepq.models.cnn_to_mlp(
+      convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=True)
+
+    act_x, act_y = apex.learn(
+      env_fn,
+      q_func=model,
+      make_obs_ph=lambda name: U.BatchInput((screen_dim, screen_dim), name=name),
+      num_actions=screen_dim,
+      num_actors=FLAGS.num_actors,
+      lr=FLAGS.lr,
+      max_timesteps=FLAGS.timesteps,
+      buffer_size=50000,
+      learning_starts=500,
+      target_network_update_freq=100,
+      gamma=0.99,
+      callback=deepq_callback)
+    act_x.save("mineral_x.pkl")
+    act_y.save("mineral_y.pkl")
+
+  elif (FLAGS.algorithm == "pbt"):
+
+    def member_fn(member_id, pbt_callback):
+      member_formats = []
+      if (FLAGS.log == "tensorboard"):
+        member_formats.append(TensorBoardOutputFormat("%s/member_%d" % (logdir, member_id)))
+      elif (FLAGS.log == "stdout"):
+        member_formats.append(HumanOutputFormat(sys.stdout))
+      Logger.DEFAULT \
+        = Logger.CURRENT \
+        = Logger(dir=None, output_formats=member_formats)
+
+      with make_env("MoveToBeacon", FLAGS.env_profile, screen_dim, FLAGS.step_mul) as env:
+
+        model = deepq.models.cnn_to_mlp(
+          convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=FLAGS.dueling)
+
+        # Spread the initial learning rates over the population
+        member_lr = FLAGS.lr * random.Random(member_id).uniform(0.5, 2.0)
+        dqn.learn(
+          env,
+          q_func=model,
+          encoder=BeaconEncoder(screen_dim),
+          decoder=XYMoveDecoder(screen_dim),
+          reward_shaper=ScaledReward(100),
+          lr=member_lr,
+          max_timesteps=FLAGS.timesteps,
+          buffer_size=FLAGS.buffer_size,
+          exploration_fraction=FLAGS.exploration_fraction,
+          exploration_final_eps=0.01,
+          train_freq=FLAGS.train_freq,
+          learning_starts=500,
+          target_network_update_freq=100,
+          gamma=0.99,
+          prioritized_replay=FLAGS.prioritized,
+          num_cpu=FLAGS.num_cpu,
+          callback=pbt_callback,
+          score_name="beacon")
+
+    scores = pbt.run_population(
+      member_fn,
+      FLAGS.population_size,
+      pbt_dir=os.path.join(PROJ_DIR, "models/pbt/%s" % start_time),
+      ready_steps=FLAGS.pbt_ready_steps)
+    print("pbt final scores : %s" % scores)
 
   elif (FLAGS.algorithm == "deepq-4way"):
 
-    with sc2_env.SC2Env(
-        map_name="CollectMineralShards",
-        step_mul=step_mul,
-        screen_size_px=(32, 32),
-        minimap_size_px=(32, 32),
-        visualize=True) as env:
+    with make_env("CollectMineralShards", FLAGS.env_profile, 32, FLAGS.step_mul) as env:
 
       model = deepq.models.cnn_to_mlp(
         convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=True)
 
-      act = deepq_mineral_4way.learn(
+      decoder = FourWayMoveDecoder(32)
+      acts = dqn.learn(
         env,
         q_func=model,
-        num_actions=4,
+        encoder=PathMemoryEncoder(32, decoder),
+        decoder=decoder,
+        reward_shaper=PathPenaltyReward(decoder),
         lr=FLAGS.lr,
         max_timesteps=FLAGS.timesteps,
         buffer_size=10000,
@@ -181,36 +297,49 @@ def main():
         target_network_update_freq=1000,
         gamma=0.99,
         prioritized_replay=True,
-        callback=deepq_4way_callback)
+        num_cpu=FLAGS.num_cpu,
+        callback=deepq_4way_callback,
+        replay_save_period=FLAGS.save_replay_period or None,
+        replay_dir=FLAGS.replay_save_dir,
+        score_name="mineral")
 
-      act.save("mineral_shards.pkl")
+      acts["direction"].save("mineral_shards.pkl")
 
   elif (FLAGS.algorithm == "a2c"):
 
-    num_timesteps = int(40e6)
-
-    num_timesteps //= 4
-
     seed = 0
 
-    env = SubprocVecEnv((FLAGS.num_agents + FLAGS.num_scripts), FLAGS.map)
+    def env_fn(index):
+      return make_env(FLAGS.map, FLAGS.env_profile, screen_dim, FLAGS.step_mul)
+
+    if FLAGS.map == "CollectMineralShards":
+      script_policy = nearest_shard_policy
+    else:
+      script_policy = beacon_policy
 
-    policy_fn = CnnPolicy
-    a2c.learn(
-      policy_fn,
-      env,
-      seed,
-      total_timesteps=num_timesteps,
-      nprocs=FLAGS.num_agents + FLAGS.num_scripts,
-      nscripts=FLAGS.num_scripts,
-      ent_coef=0.5,
-      nsteps=FLAGS.nsteps,
-      max_grad_norm=0.01,
-      callback=a2c_callback)
+    with ShmVecEnv([env_fn] * (FLAGS.num_agents + FLAGS.num_scripts),
+                   player_relative_spec(screen_dim)) as env:
+      a2c.learn(
+        CnnPolicy,
+        env,
+        seed,
+        total_timesteps=FLAGS.timesteps,
+        nscripts=FLAGS.num_scripts,
+        ent_coef=0.01,
+        nsteps=FLAGS.nsteps,
+        lr=FLAGS.lr,
+        max_grad_norm=0.5,
+        script_policy=script_policy,
+        num_cpu=FLAGS.num_cpu,
+        callback=a2c_callback)
 
 
-from pysc2.env import environment
-import numpy as np
+def _log(locals, message):
+  """Log through the learner's metrics sink when it has one (see sc2rl.metrics)."""
+  if 'metrics' in locals:
+    locals['metrics'].log(message)
+  else:
+    print(message)
 
 
 def deepq_callback(locals, globals):
@@ -219,10 +348,10 @@ def deepq_callback(locals, globals):
   last_x_filename = ""
   last_y_filename = ""
   if ('done' in locals and locals['done'] == True):
-    if ('mean_100ep_reward' in locals and locals['num_episodes'] >= 10
+    if (locals.get('mean_100ep_reward') is not None and locals['num_episodes'] >= 10
         and locals['mean_100ep_reward'] > (max_mean_reward * 1.2)):
-      print("mean_100ep_reward : %s max_mean_reward : %s" %
-            (locals['mean_100ep_reward'], max_mean_reward))
+      _log(locals, "mean_100ep_reward : %s max_mean_reward : %s" %
+                   (locals['mean_100ep_reward'], max_mean_reward))
 
       if (not os.path.exists(os.path.join(PROJ_DIR, 'models/deepq/%s' % datetime.date.today()))):
         try:
@@ -232,14 +361,16 @@ def deepq_callback(locals, globals):
 
       if (last_x_filename != ""):
         os.remove(last_x_filename)
-        print("delete last model file : %s" % last_x_filename)
+        _log(locals, "delete last model file : %s" % last_x_filename)
       if (last_y_filename != ""):
         os.remove(last_y_filename)
-        print("delete last model file : %s" % last_x_filename)
+        _log(locals, "delete last model file : %s" % last_x_filename)
+
+      from sc2rl.act_wrapper import ActWrapper
 
       max_mean_reward = locals['mean_100ep_reward']
-      act_x = deepq_model.ActWrapper(locals['act_x'])
-      act_y = deepq_model.ActWrapper(locals['act_y'])
+      act_x = ActWrapper(locals['acts']['x'])
+      act_y = ActWrapper(locals['acts']['y'])
 
       x_filename = os.path.join(
         PROJ_DIR,
@@ -249,7 +380,7 @@ def deepq_callback(locals, globals):
         PROJ_DIR,
         'models/deepq/{}/mineral_y_{}.pkl'.format(datetime.date.today(), locals['mean_100ep_reward']))
       act_y.save(y_filename)
-      print("save best mean_100ep_reward model to {} and {}".format(x_filename, y_filename))
+      _log(locals, "save best mean_100ep_reward model to {} and {}".format(x_filename, y_filename))
       last_x_filename = x_filename
       last_y_filename = y_filename
 
@@ -258,10 +389,10 @@ def deepq_4way_callback(locals, globals):
   #pprint.pprint(locals)
   global max_mean_reward, last_filename
   if ('done' in locals and locals['done'] == True):
-    if ('mean_100ep_reward' in locals and locals['num_episodes'] >= 10
+    if (locals.get('mean_100ep_reward') is not None and locals['num_episodes'] >= 10
         and locals['mean_100ep_reward'] > max_mean_reward):
-      print("mean_100ep_reward : %s max_mean_reward : %s" %
-            (locals['mean_100ep_reward'], max_mean_reward))
+      _log(locals, "mean_100ep_reward : %s max_mean_reward : %s" %
+                   (locals['mean_100ep_reward'], max_mean_reward))
 
       if (not os.path.exists(
           os.path.join(PROJ_DIR, 'models/deepq-4way/'))):
@@ -276,11 +407,12 @@ def deepq_4way_callback(locals, globals):
 
       if (last_filename != ""):
         os.remove(last_filename)
-        print("delete last model file : %s" % last_filename)
+        _log(locals, "delete last model file : %s" % last_filename)
+
+      from sc2rl.act_wrapper import ActWrapper
 
       max_mean_reward = locals['mean_100ep_reward']
-      act = deepq_mineral_4way.ActWrapper(locals['act'])
-      #act_y = deepq_mineral_shards.ActWrapper(locals['act_y'])
+      act = ActWrapper(locals['acts']['direction'])
 
       filename = os.path.join(PROJ_DIR,
                               'models/deepq-4way/mineral_%s.pkl' %
@@ -290,7 +422,7 @@ def deepq_4way_callback(locals, globals):
       #   PROJ_DIR,
       #   'models/deepq/mineral_y_%s.pkl' % locals['mean_100ep_reward'])
       # act_y.save(filename)
-      print("save best mean_100ep_reward model to %s" % filename)
+      _log(locals, "save best mean_100ep_reward model to %s" % filename)
       last_filename = filename
 
 
@@ -298,10 +430,10 @@ def a2c_callback(locals, globals):
   global max_mean_reward, last_filename
   #pprint.pprint(locals)
 
-  if ('mean_100ep_reward' in locals and locals['num_episodes'] >= 10
+  if (locals.get('mean_100ep_reward') is not None and locals['num_episodes'] >= 10
       and locals['mean_100ep_reward'] > max_mean_reward):
-    print("mean_100ep_reward : %s max_mean_reward : %s" %
-          (locals['mean_100ep_reward'], max_mean_reward))
+    _log(locals, "mean_100ep_reward : %s max_mean_reward : %s" %
+                 (locals['mean_100ep_reward'], max_mean_reward))
 
     if (not os.path.exists(os.path.join(PROJ_DIR, 'models/a2c/'))):
       try:
@@ -315,7 +447,7 @@ def a2c_callback(locals, globals):
 
     if (last_filename != ""):
       os.remove(last_filename)
-      print("delete last model file : %s" % last_filename)
+      _log(locals, "delete last model file : %s" % last_filename)
 
     max_mean_reward = locals['mean_100ep_reward']
     model = locals['model']
@@ -324,7 +456,7 @@ def a2c_callback(locals, globals):
       PROJ_DIR,
       'models/a2c/mineral_%s.pkl' % locals['mean_100ep_reward'])
     model.save(filename)
-    print("save best mean_100ep_reward model to %s" % filename)
+    _log(locals, "save best mean_100ep_reward model to %s" % filename)
     last_filename = filename
 
 
@@ -0,0 +1,280 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Hyperparameter sweeps over start.py runs.
+
+Launches one start.py process per configuration, at most --max_parallel at
+a time, each pinned to its own --cpus_per_run cores. Runs report progress
+through start.py --progress_json; a run whose best `mean 100 episode
+reward` falls below the median of its peers at the same step count is
+stopped early. Results of every run go to one CSV table.
+
+  python sweep.py --mode=grid --max_parallel=4 --timesteps=200000
+  python sweep.py --mode=random --num_trials=16 \\
+      --space='{"lr": [1e-5, 1e-3], "train_freq": [1, 4, 8]}'
+
+Random mode samples list entries uniformly, except two-number float
+entries, which are sampled log-uniformly between the two bounds for `lr`
+and uniformly for anything else.
+"""
+
+import sys
+import os
+import csv
+import json
+import time
+import random
+import datetime
+import itertools
+import subprocess
+
+import numpy as np
+from absl import flags
+
+PROJ_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SPACE = {
+  "lr": [0.0001, 0.0005, 0.001],
+  "exploration_fraction": [0.1, 0.2],
+  "prioritized": [True, False],
+  "dueling": [True],
+  "screen_dim": [16, 32],
+  "buffer_size": [5000, 50000],
+  "train_freq": [4],
+}
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("mode", "grid", "grid or random search")
+flags.DEFINE_string("space", "", "JSON dict overriding entries of the default search space")
+flags.DEFINE_integer("num_trials", 8, "number of configurations of a random search")
+flags.DEFINE_integer("seed", 0, "random search seed")
+flags.DEFINE_integer("max_parallel", 4, "runs at the same time")
+flags.DEFINE_integer("cpus_per_run", 0, "cores pinned to each run (0 = cores / max_parallel)")
+flags.DEFINE_integer("timesteps", 200000, "steps to train every run")
+flags.DEFINE_string("algorithm", "deepq", "start.py algorithm")
+flags.DEFINE_integer("early_stop_steps", 20000, "no run is stopped before this many steps")
+flags.DEFINE_integer("early_stop_min_peers", 3, "runs that must have reached a step before comparing")
+flags.DEFINE_float("poll_secs", 10., "seconds between progress checks")
+flags.DEFINE_string("out_dir", "", "directory of the run logs and results (default sweeps/<time>)")
+
+_REWARD_KEY = "mean 100 episode reward"
+
+
+def search_space():
+  space = dict(DEFAULT_SPACE)
+  if FLAGS.space:
+    space.update(json.loads(FLAGS.space))
+  return space
+
+
+def grid_configs(space):
+  keys = sorted(space)
+  for values in itertools.product(*[space[key] for key in keys]):
+    yield dict(zip(keys, values))
+
+
+def random_configs(space, num_trials, rng):
+  for _ in range(num_trials):
+    config = {}
+    for key in sorted(space):
+      values = space[key]
+      if len(values) == 2 and all(isinstance(v, float) for v in values):
+        low, high = values
+        if key == "lr":
+          config[key] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+          config[key] = rng.uniform(low, high)
+      else:
+        config[key] = rng.choice(values)
+    yield config
+
+
+class Run(object):
+  """One start.py process and the progress it reported so far."""
+
+  def __init__(self, run_id, config, out_dir, cpus):
+    self.run_id = run_id
+    self.config = config
+    self.cpus = cpus
+    self.progress_path = os.path.join(out_dir, "run_%03d.json" % run_id)
+    self.log_path = os.path.join(out_dir, "run_%03d.log" % run_id)
+    self.history = []
+    self.status = "pending"
+    self.start_time = None
+    self.end_time = None
+    self.process = None
+    self._offset = 0
+
+  def start(self):
+    args = [sys.executable, os.path.join(PROJ_DIR, "start.py"),
+            "--algorithm=%s" % FLAGS.algorithm,
+            "--timesteps=%d" % FLAGS.timesteps,
+            "--num_cpu=%d" % len(self.cpus),
+            "--progress_json=%s" % self.progress_path,
+            "--experiment=sweep%03d" % self.run_id]
+    for key, value in sorted(self.config.items()):
+      if isinstance(value, bool):
+        args.append("--%s%s" % ("" if value else "no", key))
+      else:
+        args.append("--%s=%s" % (key, value))
+
+    cpus = self.cpus
+
+    def pin():
+      os.sched_setaffinity(0, cpus)
+
+    with open(self.log_path, "w") as log:
+      self.process = subprocess.Popen(args, cwd=PROJ_DIR, stdout=log,
+                                      stderr=subprocess.STDOUT, preexec_fn=pin)
+    self.status = "running"
+    self.start_time = time.time()
+
+  def poll_progress(self):
+    if not os.path.exists(self.progress_path):
+      return
+    with open(self.progress_path) as f:
+      f.seek(self._offset)
+      for line in f:
+        if not line.endswith("\n"):
+          break
+        self._offset += len(line)
+        row = json.loads(line)
+        if _REWARD_KEY in row and "steps" in row:
+          self.history.append((row["steps"], row[_REWARD_KEY]))
+
+  @property
+  def steps(self):
+    return self.history[-1][0] if self.history else 0
+
+  def best_reward(self, until_step=None):
+    rewards = [reward for steps, reward in self.history
+               if until_step is None or steps <= until_step]
+    return max(rewards) if rewards else None
+
+  def finish(self, status):
+    self.status = status
+    self.end_time = time.time()
+
+  def row(self):
+    row = dict(self.config)
+    row.update({
+      "run": self.run_id,
+      "status": self.status,
+      "steps": self.steps,
+      "final_reward": self.history[-1][1] if self.history else None,
+      "best_reward": self.best_reward(),
+      "seconds": round((self.end_time or time.time()) - self.start_time, 1)
+                 if self.start_time else None,
+      "cpus": " ".join(str(cpu) for cpu in self.cpus),
+    })
+    return row
+
+
+def should_stop(run, runs):
+  """Median stopping rule on the best rolling reward reached by run.steps."""
+  if run.steps < FLAGS.early_stop_steps:
+    return False
+  peers = [other.best_reward(run.steps) for other in runs
+           if other is not run and other.steps >= run.steps]
+  peers = [reward for reward in peers if reward is not None]
+  if len(peers) < FLAGS.early_stop_min_peers:
+    return False
+  return run.best_reward() < np.median(peers)
+
+
+def write_results(runs, path):
+  rows = [run.row() for run in runs if run.status != "pending"]
+  if not rows:
+    return
+  fields = ["run", "status", "steps", "final_reward", "best_reward", "seconds", "cpus"]
+  fields += sorted(set(key for row in rows for key in row) - set(fields))
+  with open(path, "w") as f:
+    writer = csv.DictWriter(f, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+      writer.writerow(row)
+
+
+def main():
+  out_dir = FLAGS.out_dir or os.path.join(
+    PROJ_DIR, "sweeps", datetime.datetime.now().strftime("%m%d%H%M"))
+  os.makedirs(out_dir, exist_ok=True)
+  results_path = os.path.join(out_dir, "results.csv")
+
+  space = search_space()
+  if FLAGS.mode == "grid":
+    configs = list(grid_configs(space))
+  else:
+    configs = list(random_configs(space, FLAGS.num_trials, random.Random(FLAGS.seed)))
+  print("sweep : %d runs, results in %s" % (len(configs), results_path))
+
+  available_cpus = sorted(os.sched_getaffinity(0))
+  cpus_per_run = FLAGS.cpus_per_run or max(len(available_cpus) // FLAGS.max_parallel, 1)
+  cpu_slots = [available_cpus[i * cpus_per_run:(i + 1) * cpus_per_run] or available_cpus
+               for i in range(FLAGS.max_parallel)]
+  free_slots = list(range(FLAGS.max_parallel))
+  slot_of = {}
+
+  runs = [Run(i, config, out_dir, None) for i, config in enumerate(configs)]
+  pending = list(runs)
+  try:
+    while pending or any(run.status == "running" for run in runs):
+      while pending and free_slots:
+        run = pending.pop(0)
+        slot = free_slots.pop(0)
+        run.cpus = cpu_slots[slot]
+        slot_of[run.run_id] = slot
+        run.start()
+        print("start run %d on cpus %s : %s" % (run.run_id, run.cpus, run.config))
+
+      time.sleep(FLAGS.poll_secs)
+      for run in runs:
+        if run.status != "running":
+          continue
+        run.poll_progress()
+        returncode = run.process.poll()
+        if returncode is not None:
+          run.finish("finished" if returncode == 0 else "failed(%d)" % returncode)
+        elif should_stop(run, runs):
+          run.process.terminate()
+          run.process.wait()
+          run.finish("stopped")
+        else:
+          continue
+        free_slots.append(slot_of.pop(run.run_id))
+        print("%s run %d at step %d, best reward %s" % (
+          run.status, run.run_id, run.steps, run.best_reward()))
+      write_results(runs, results_path)
+  finally:
+    for run in runs:
+      if run.status == "running":
+        run.process.terminate()
+        run.process.wait()
+        run.finish("killed")
+    write_results(runs, results_path)
+
+
+if __name__ == '__main__':
+  FLAGS(sys.argv)
+  main()
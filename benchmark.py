@@ -0,0 +1,452 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Throughput benchmarks for the DQN trainer components.
+
+Runs entirely against `sc2rl.fake_env.FakeSC2Env`, so no StarCraft II install
+is needed. Every result is one JSON object per line, e.g.
+
+  python benchmark.py --output=bench.jsonl
+  python benchmark.py --only=replay,preprocess --compare=bench.jsonl
+
+With --compare, results slower than the baseline file by more than
+--tolerance are reported and the exit status is 1.
+
+The env_profiles group compares the steps/sec of the sc2rl.env_profiles
+profiles on the real game, so it needs StarCraft II and only runs when
+named in --only:
+
+  python benchmark.py --only=env_profiles --profile_maps=MoveToBeacon
+
+The startup group times the cold import of the entry points in a fresh
+interpreter; the ones that import their heavy dependencies lazily must
+stay under --startup_budget seconds or the exit status is 1.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import subprocess
+
+import numpy as np
+from absl import flags
+
+from sc2rl.fake_env import FakeSC2Env
+from sc2rl import preprocess
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("only", "", "comma separated benchmark groups to run "
+                    "(replay, preprocess, vec_env, act, train, checkpoint, end_to_end, "
+                    "startup, env_profiles)")
+flags.DEFINE_string("output", "", "file to write JSON lines results to")
+flags.DEFINE_string("compare", "", "JSON lines results to compare against")
+flags.DEFINE_float("tolerance", 0.2, "allowed relative slowdown before a regression is reported")
+flags.DEFINE_integer("repeats", 1000, "iterations per micro benchmark")
+flags.DEFINE_integer("batch_size", 32, "replay/train batch size")
+flags.DEFINE_integer("act_batch", 16, "batch size of the batched act benchmark")
+flags.DEFINE_integer("e2e_steps", 2000, "env steps of the end to end benchmark")
+flags.DEFINE_integer("num_envs", 8, "worker processes of the vec_env benchmark")
+flags.DEFINE_integer("profile_steps", 500, "agent steps per env profile of the env_profiles benchmark")
+flags.DEFINE_string("profile_maps", "MoveToBeacon", "comma separated maps of the env_profiles benchmark")
+flags.DEFINE_integer("startup_repeats", 3, "fresh interpreters per module of the startup benchmark")
+flags.DEFINE_float("startup_budget", 1.0, "seconds the lazy entry points may take to import")
+
+SCREEN_DIMS = (16, 32, 64)
+# Groups that need StarCraft II; run only when named in --only
+OPT_IN_GROUPS = ("env_profiles",)
+# Modules of the startup benchmark, and whether their import must fit the budget
+STARTUP_MODULES = (
+  ("start", True),
+  ("sc2rl.act_wrapper", True),
+  ("sc2rl.env_profiles", True),
+  # Imported by every env worker, evaluate.py and demos.py; must stay TF-free
+  ("sc2rl.shm_vec_env", True),
+  ("sc2rl.evaluation", True),
+  ("sc2rl.dqn", False),
+  ("sc2rl.a2c", False),
+)
+_IMPORT_SNIPPET = ("import sys, time; sys.path[:0] = %r; start = time.perf_counter(); "
+                   "import %s; print(time.perf_counter() - start)")
+
+
+def _result(name, params, n, seconds):
+  return {
+    "benchmark": name,
+    "params": params,
+    "n": n,
+    "seconds": seconds,
+    "ops_per_sec": n / seconds if seconds > 0 else float("inf"),
+    "mean_ms": 1000. * seconds / n,
+  }
+
+
+def _timed(fn, n, warmup=10):
+  for _ in range(warmup):
+    fn()
+  start = time.perf_counter()
+  for _ in range(n):
+    fn()
+  return time.perf_counter() - start
+
+
+def _make_model():
+  from baselines import deepq
+  return deepq.models.cnn_to_mlp(
+    convs=[(16, 8, 4), (32, 4, 2)], hiddens=[256], dueling=True)
+
+
+def _random_screens(dim, batch, rng):
+  return (rng.rand(batch, dim, dim) < 0.05).astype(int)
+
+
+def bench_replay(repeats, batch_size):
+  from baselines.deepq.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+
+  results = []
+  rng = np.random.RandomState(0)
+  for dim in SCREEN_DIMS:
+    for prioritized in (False, True):
+      size = 10000
+      if prioritized:
+        buffer = PrioritizedReplayBuffer(size, alpha=0.6)
+      else:
+        buffer = ReplayBuffer(size)
+      screens = _random_screens(dim, 2, rng)
+      params = {"screen_dim": dim, "prioritized": prioritized, "buffer_size": size}
+
+      def add():
+        buffer.add(screens[0], 1, 0., screens[1], 0.)
+      results.append(_result("replay_add", params, size, _timed(add, size, warmup=0)))
+
+      if prioritized:
+        def sample():
+          buffer.sample(batch_size, beta=0.4)
+      else:
+        def sample():
+          buffer.sample(batch_size)
+      params = dict(params, batch_size=batch_size)
+      results.append(_result("replay_sample", params, repeats, _timed(sample, repeats)))
+
+      if prioritized:
+        idxes = rng.randint(0, size, size=batch_size)
+        priorities = rng.rand(batch_size) + 1e-6
+
+        def update():
+          buffer.update_priorities(idxes, priorities)
+        results.append(_result("replay_update_priorities", params, repeats,
+                               _timed(update, repeats)))
+  return results
+
+
+def bench_preprocess(repeats, batch_size):
+  results = []
+  for dim in SCREEN_DIMS:
+    env = FakeSC2Env(screen_size_px=(dim, dim), minimap_size_px=(dim, dim), seed=0)
+    obs = env.reset()
+    player_relative = preprocess.player_relative_screen(obs[0])
+
+    def single():
+      preprocess.beacon_screen(player_relative)
+      preprocess.player_position(player_relative)
+    results.append(_result("preprocess", {"screen_dim": dim, "batch": 1},
+                           repeats, _timed(single, repeats)))
+
+    batch = np.stack([player_relative] * batch_size)
+
+    def batched():
+      preprocess.beacon_screen(batch)
+      preprocess.centroids(batch, preprocess._PLAYER_FRIENDLY)
+    results.append(_result("preprocess", {"screen_dim": dim, "batch": batch_size},
+                           repeats * batch_size, _timed(batched, repeats)))
+  return results
+
+
+def bench_vec_env(repeats, num_envs):
+  from pysc2.lib import actions as sc2_actions
+  from sc2rl.shm_vec_env import ShmVecEnv, player_relative_spec
+
+  results = []
+  for dim in SCREEN_DIMS:
+    env_fns = [lambda i, dim=dim: FakeSC2Env(screen_size_px=(dim, dim),
+                                             minimap_size_px=(dim, dim), seed=i)
+               for _ in range(num_envs)]
+    with ShmVecEnv(env_fns, player_relative_spec(dim)) as vec_env:
+      obs = vec_env.reset()
+      actions = [[sc2_actions.FunctionCall(sc2_actions.FUNCTIONS.Move_screen.id,
+                                           [[0], [dim // 2, dim // 2]])]] * num_envs
+
+      def run():
+        vec_env.step(actions)
+      results.append(_result("vec_env_step", {"screen_dim": dim, "num_envs": num_envs},
+                             repeats * num_envs, _timed(run, repeats)))
+  return results
+
+
+def bench_act(repeats, act_batch):
+  import tensorflow as tf
+  import baselines.common.tf_util as U
+  from baselines import deepq
+
+  results = []
+  rng = np.random.RandomState(0)
+  for dim in SCREEN_DIMS:
+    with tf.Graph().as_default(), U.make_session(1) as sess:
+      act = deepq.build_act(
+        make_obs_ph=lambda name: U.BatchInput((dim, dim), name=name),
+        q_func=_make_model(), num_actions=dim)
+      U.initialize()
+      for batch in (1, act_batch):
+        screens = _random_screens(dim, batch, rng)
+
+        def run():
+          act(screens, stochastic=False)
+        results.append(_result("act", {"screen_dim": dim, "batch": batch},
+                               repeats * batch, _timed(run, repeats)))
+  return results
+
+
+def bench_train(repeats, batch_size):
+  import tensorflow as tf
+  import baselines.common.tf_util as U
+  from baselines import deepq
+
+  results = []
+  rng = np.random.RandomState(0)
+  for dim in SCREEN_DIMS:
+    with tf.Graph().as_default(), U.make_session(1) as sess:
+      act, train, update_target, debug = deepq.build_train(
+        make_obs_ph=lambda name: U.BatchInput((dim, dim), name=name),
+        q_func=_make_model(), num_actions=dim,
+        optimizer=tf.train.AdamOptimizer(learning_rate=5e-4),
+        gamma=0.99, grad_norm_clipping=10)
+      U.initialize()
+      obses_t = _random_screens(dim, batch_size, rng)
+      obses_tp1 = _random_screens(dim, batch_size, rng)
+      actions = rng.randint(0, dim, size=batch_size)
+      rewards = rng.rand(batch_size)
+      dones = np.zeros(batch_size)
+      weights = np.ones(batch_size)
+
+      def run():
+        train(obses_t, actions, rewards, obses_tp1, dones, weights)
+      n = max(repeats // 10, 10)
+      results.append(_result("train", {"screen_dim": dim, "batch_size": batch_size},
+                             n * batch_size, _timed(run, n)))
+      results.append(_result("update_target", {"screen_dim": dim}, n,
+                             _timed(update_target, n)))
+  return results
+
+
+def bench_checkpoint():
+  import tensorflow as tf
+  import baselines.common.tf_util as U
+  from baselines import deepq
+
+  from sc2rl.act_wrapper import ActWrapper
+
+  results = []
+  for dim in SCREEN_DIMS:
+    act_params = {
+      'make_obs_ph': lambda name: U.BatchInput((dim, dim), name=name),
+      'q_func': _make_model(),
+      'num_actions': dim,
+    }
+    with tempfile.TemporaryDirectory() as td:
+      path = os.path.join(td, "act.pkl")
+      with tf.Graph().as_default(), U.make_session(1) as sess:
+        act = deepq.build_act(**act_params)
+        U.initialize()
+        start = time.perf_counter()
+        ActWrapper(act).save(path)
+        seconds = time.perf_counter() - start
+        results.append(_result("checkpoint_save",
+                               {"screen_dim": dim, "bytes": os.path.getsize(path)},
+                               1, seconds))
+      with tf.Graph().as_default():
+        start = time.perf_counter()
+        ActWrapper.load(path, act_params, num_cpu=1)
+        results.append(_result("checkpoint_load", {"screen_dim": dim}, 1,
+                               time.perf_counter() - start))
+        tf.get_default_session().close()
+  return results
+
+
+def bench_end_to_end(steps):
+  import tensorflow as tf
+
+  from sc2rl import dqn
+  from sc2rl.components import BeaconEncoder, XYMoveDecoder, ScaledReward
+
+  results = []
+  for dim in SCREEN_DIMS:
+    timing = {}
+
+    def callback(locals, globals):
+      if locals['t'] == 0:
+        timing['start'] = time.perf_counter()
+      timing['steps'] = locals['t']
+
+    env = FakeSC2Env(screen_size_px=(dim, dim), minimap_size_px=(dim, dim), seed=0)
+    with tf.Graph().as_default():
+      dqn.learn(
+        env,
+        q_func=_make_model(),
+        encoder=BeaconEncoder(dim),
+        decoder=XYMoveDecoder(dim),
+        reward_shaper=ScaledReward(100),
+        max_timesteps=steps,
+        buffer_size=5000,
+        train_freq=4,
+        learning_starts=steps // 4,
+        target_network_update_freq=100,
+        prioritized_replay=True,
+        num_cpu=1,
+        print_freq=None,
+        callback=callback)
+      tf.get_default_session().close()
+    results.append(_result("end_to_end", {"screen_dim": dim, "train_freq": 4},
+                           timing['steps'], time.perf_counter() - timing['start']))
+  return results
+
+
+def bench_startup(repeats, budget):
+  root = os.path.dirname(os.path.abspath(__file__))
+  paths = [root, os.path.join(root, "03-move-beacon")]
+  results = []
+  for module, budgeted in STARTUP_MODULES:
+    seconds = 0.
+    for _ in range(repeats):
+      output = subprocess.check_output([sys.executable, "-c", _IMPORT_SNIPPET % (paths, module)])
+      seconds += float(output.decode().split()[-1])
+    result = _result("startup_import", {"module": module}, repeats, seconds)
+    if budgeted:
+      result["budget"] = budget
+    results.append(result)
+  return results
+
+
+def bench_env_profiles(steps, maps):
+  from pysc2.lib import actions as sc2_actions
+  from sc2rl.env_profiles import PROFILES, env_kwargs, make_env
+
+  results = []
+  rng = np.random.RandomState(0)
+  for map_name in maps:
+    for profile in sorted(PROFILES):
+      kwargs = env_kwargs(map_name, profile)
+      dim = kwargs["screen_size_px"][0]
+      moves = [sc2_actions.FunctionCall(sc2_actions.FUNCTIONS.Move_screen.id, [[0], list(xy)])
+               for xy in rng.randint(0, dim, size=(steps, 2))]
+      select_army = sc2_actions.FunctionCall(sc2_actions.FUNCTIONS.select_army.id, [[0]])
+      with make_env(map_name, profile) as env:
+        env.reset()
+        env.step([select_army])
+        start = time.perf_counter()
+        for move in moves:
+          obs = env.step([move])
+          if sc2_actions.FUNCTIONS.Move_screen.id not in obs[0].observation["available_actions"]:
+            env.step([select_army])
+        seconds = time.perf_counter() - start
+      params = {
+        "map": map_name,
+        "profile": profile,
+        "screen_dim": dim,
+        "minimap_dim": kwargs["minimap_size_px"][0],
+        "step_mul": kwargs["step_mul"],
+        "visualize": kwargs["visualize"],
+      }
+      results.append(_result("env_profile_step", params, steps, seconds))
+  return results
+
+
+def compare(results, baseline_path, tolerance):
+  """Return the results that got slower than `baseline_path` by more than `tolerance`."""
+  def key(result):
+    return result["benchmark"], json.dumps(
+      dict((k, v) for k, v in result["params"].items() if k != "bytes"), sort_keys=True)
+
+  with open(baseline_path) as f:
+    baseline = dict((key(r), r) for r in (json.loads(line) for line in f if line.strip()))
+  regressions = []
+  for result in results:
+    old = baseline.get(key(result))
+    if old is not None and result["ops_per_sec"] < old["ops_per_sec"] * (1. - tolerance):
+      regressions.append((result, old))
+  return regressions
+
+
+def main():
+  groups = [
+    ("replay", lambda: bench_replay(FLAGS.repeats, FLAGS.batch_size)),
+    ("preprocess", lambda: bench_preprocess(FLAGS.repeats, FLAGS.batch_size)),
+    ("vec_env", lambda: bench_vec_env(FLAGS.repeats, FLAGS.num_envs)),
+    ("act", lambda: bench_act(FLAGS.repeats, FLAGS.act_batch)),
+    ("train", lambda: bench_train(FLAGS.repeats, FLAGS.batch_size)),
+    ("checkpoint", bench_checkpoint),
+    ("end_to_end", lambda: bench_end_to_end(FLAGS.e2e_steps)),
+    ("startup", lambda: bench_startup(FLAGS.startup_repeats, FLAGS.startup_budget)),
+    ("env_profiles", lambda: bench_env_profiles(
+      FLAGS.profile_steps, [name for name in FLAGS.profile_maps.split(",") if name])),
+  ]
+  only = [name for name in FLAGS.only.split(",") if name]
+
+  results = []
+  for name, run in groups:
+    if only and name not in only:
+      continue
+    if not only and name in OPT_IN_GROUPS:
+      continue
+    for result in run():
+      print(json.dumps(result, sort_keys=True))
+      sys.stdout.flush()
+      results.append(result)
+
+  if FLAGS.output:
+    with open(FLAGS.output, "w") as f:
+      for result in results:
+        f.write(json.dumps(result, sort_keys=True) + "\n")
+
+  failed = False
+  for result in results:
+    if "budget" in result and result["seconds"] / result["n"] > result["budget"]:
+      print("OVER BUDGET %s %s: %.3fs (budget %.3fs)" % (
+        result["benchmark"], result["params"], result["seconds"] / result["n"], result["budget"]))
+      failed = True
+
+  if FLAGS.compare:
+    regressions = compare(results, FLAGS.compare, FLAGS.tolerance)
+    for result, old in regressions:
+      print("REGRESSION %s %s: %.1f ops/s (was %.1f)" % (
+        result["benchmark"], result["params"], result["ops_per_sec"], old["ops_per_sec"]))
+    failed = failed or bool(regressions)
+
+  if failed:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  FLAGS(sys.argv)
+  main()
@@ -0,0 +1,330 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Synchronous advantage actor-critic on a ShmVecEnv.
+
+All envs are stepped in lockstep; every `nsteps` steps the rollouts of all
+envs go through one forward/backward pass. The policy picks a Move_screen
+target among all screen pixels (a fully convolutional spatial head, as in
+the SC2LE paper) and has a value head on a dense layer.
+
+The first `nscripts` envs are driven by a scripted policy (sc2rl.scripted)
+instead of the network. Their transitions train the value head like any
+other and the policy through a cross-entropy (imitation) term, which gives
+the agent envs a head start on these maps.
+"""
+
+import time
+
+import dill
+import numpy as np
+import tensorflow as tf
+
+import baselines.common.tf_util as U
+from baselines import logger
+from baselines.common import explained_variance
+from baselines.common.schedules import LinearSchedule, ConstantSchedule
+
+from pysc2.lib import actions as sc2_actions
+
+from sc2rl.episode_stats import EpisodeStats
+from sc2rl.preprocess import player_relative_planes
+
+_MOVE_SCREEN = sc2_actions.FUNCTIONS.Move_screen.id
+_NOT_QUEUED = [0]
+
+
+class CnnPolicy(object):
+  """Spatial policy and value function over player_relative planes.
+
+  Parameters
+  ----------
+  sess: tf.Session
+  ob_shape: tuple
+      (height, width, channels) of one observation
+  """
+
+  def __init__(self, sess, ob_shape):
+    height, width, channels = ob_shape
+    X = tf.placeholder(tf.float32, (None, height, width, channels), name="X")
+    with tf.variable_scope("model"):
+      h = tf.layers.conv2d(X, 16, 5, padding="same", activation=tf.nn.relu, name="conv1")
+      h = tf.layers.conv2d(h, 32, 3, padding="same", activation=tf.nn.relu, name="conv2")
+      # One logit per screen pixel, flattened row-major: action = y * width + x
+      pi = tf.reshape(tf.layers.conv2d(h, 1, 1, name="spatial"), [-1, height * width])
+      fc = tf.layers.dense(tf.reshape(h, [-1, height * width * 32]), 256,
+                           activation=tf.nn.relu, name="fc")
+      vf = tf.layers.dense(fc, 1, name="v")[:, 0]
+
+    # Gumbel-max sample of the categorical distribution
+    u = tf.random_uniform(tf.shape(pi))
+    a0 = tf.argmax(pi - tf.log(-tf.log(u)), axis=1)
+
+    def step(ob):
+      return sess.run([a0, vf], {X: ob})
+
+    def value(ob):
+      return sess.run(vf, {X: ob})
+
+    self.X = X
+    self.pi = pi
+    self.vf = vf
+    self.width = width
+    self.step = step
+    self.value = value
+
+
+class Model(object):
+  """Loss, optimizer and parameter (de)serialization around a policy."""
+
+  def __init__(self, policy, ob_shape, num_updates, ent_coef=0.01, vf_coef=0.5,
+               imitation_coef=1.0, max_grad_norm=0.5, lr=7e-4, lrschedule="linear",
+               alpha=0.99, epsilon=1e-5, num_cpu=16):
+    sess = U.make_session(num_cpu)
+    sess.__enter__()
+
+    A = tf.placeholder(tf.int32, [None], name="A")
+    ADV = tf.placeholder(tf.float32, [None], name="ADV")
+    R = tf.placeholder(tf.float32, [None], name="R")
+    SCRIPT = tf.placeholder(tf.float32, [None], name="SCRIPT")
+    VALID = tf.placeholder(tf.float32, [None], name="VALID")
+    LR = tf.placeholder(tf.float32, [], name="LR")
+
+    train_model = policy(sess, ob_shape)
+
+    neglogpac = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=train_model.pi, labels=A)
+    # Steps whose Move_screen never ran (see ShmVecEnv.executed) have no
+    # policy target; they still train the value head
+    num_valid = tf.maximum(tf.reduce_sum(VALID), 1.)
+    pg_loss = tf.reduce_sum(VALID * (1. - SCRIPT) * ADV * neglogpac) / num_valid
+    imitation_loss = tf.reduce_sum(VALID * SCRIPT * neglogpac) / num_valid
+    vf_loss = tf.reduce_mean(tf.square(train_model.vf - R)) / 2.
+    entropy = tf.reduce_sum(VALID * tf.nn.softmax_cross_entropy_with_logits(
+      labels=tf.nn.softmax(train_model.pi), logits=train_model.pi)) / num_valid
+    loss = pg_loss + imitation_coef * imitation_loss - ent_coef * entropy + vf_coef * vf_loss
+
+    params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope="model")
+    grads = tf.gradients(loss, params)
+    if max_grad_norm is not None:
+      grads, _ = tf.clip_by_global_norm(grads, max_grad_norm)
+    trainer = tf.train.RMSPropOptimizer(learning_rate=LR, decay=alpha, epsilon=epsilon)
+    _train = trainer.apply_gradients(list(zip(grads, params)))
+
+    if lrschedule == "linear":
+      lr_schedule = LinearSchedule(num_updates, initial_p=lr, final_p=0.)
+    elif lrschedule == "constant":
+      lr_schedule = ConstantSchedule(lr)
+    else:
+      raise ValueError("unknown lrschedule {}".format(lrschedule))
+
+    def train(obs, actions, returns, values, scripts, valids, update):
+      advs = returns - values
+      td_map = {train_model.X: obs, A: actions, ADV: advs, R: returns,
+                SCRIPT: scripts, VALID: valids, LR: lr_schedule.value(update)}
+      policy_loss, value_loss, policy_imitation, policy_entropy, _ = sess.run(
+        [pg_loss, vf_loss, imitation_loss, entropy, _train], td_map)
+      return policy_loss, value_loss, policy_imitation, policy_entropy
+
+    def save(path):
+      with open(path, "wb") as f:
+        dill.dump(sess.run(params), f)
+
+    def load(path):
+      with open(path, "rb") as f:
+        values = dill.load(f)
+      for param, value in zip(params, values):
+        param.load(value, sess)
+
+    self.train = train
+    self.train_model = train_model
+    self.step = train_model.step
+    self.value = train_model.value
+    self.save = save
+    self.load = load
+    U.initialize()
+
+
+class Runner(object):
+  """Collects `nsteps` steps of every env of a ShmVecEnv per `run`."""
+
+  def __init__(self, env, model, nsteps=5, nscripts=0, gamma=0.99, script_policy=None):
+    if nscripts and script_policy is None:
+      raise ValueError("nscripts > 0 needs a script_policy")
+    self.env = env
+    self.model = model
+    self.nsteps = nsteps
+    self.nscripts = nscripts
+    self.gamma = gamma
+    self.script_policy = script_policy
+    self.obs = env.reset()
+    self.scripts = (np.arange(env.num_envs) < nscripts).astype(np.float32)
+    self.episode_rewards = np.zeros(env.num_envs)
+    self.num_reselects = 0
+    self.episode_stats = EpisodeStats(["reward"], window=100)
+    self.script_stats = EpisodeStats(["reward"], window=100)
+
+  def run(self):
+    """Returns obs, actions, returns, values, scripts and valids, flattened step-major.
+
+    `valids` is 1 where the env executed the step's Move_screen.
+    """
+    nenvs = self.env.num_envs
+    width = self.model.train_model.width
+    mb_obs, mb_actions, mb_values, mb_rewards, mb_dones, mb_valids = [], [], [], [], [], []
+    for _ in range(self.nsteps):
+      player_relative = self.obs["player_relative"]
+      planes = player_relative_planes(player_relative)
+      actions, values = self.model.step(planes)
+      if self.nscripts:
+        targets = self.script_policy(player_relative[:self.nscripts])
+        actions[:self.nscripts] = targets[:, 1] * width + targets[:, 0]
+      # The env's step_fn re-selects the army when Move_screen needs it;
+      # when the move still could not run, env.executed is False
+      calls = [[sc2_actions.FunctionCall(_MOVE_SCREEN, [_NOT_QUEUED, [int(action % width), int(action // width)]])]
+               for action in actions]
+
+      self.obs, rewards, dones = self.env.step(calls)
+      mb_obs.append(planes)
+      mb_actions.append(actions)
+      mb_values.append(values)
+      mb_rewards.append(rewards.copy())
+      mb_dones.append(dones.astype(np.float32))
+      mb_valids.append(self.env.executed.astype(np.float32))
+      self.num_reselects += int(self.env.reselected.sum())
+
+      self.episode_rewards += rewards
+      for i in np.flatnonzero(dones):
+        stats = self.script_stats if i < self.nscripts else self.episode_stats
+        stats.end_episode(reward=self.episode_rewards[i])
+        self.episode_rewards[i] = 0.
+
+    mb_rewards = np.asarray(mb_rewards, dtype=np.float32)
+    mb_dones = np.asarray(mb_dones)
+    # n-step returns, cut at episode ends (envs reset themselves on done)
+    mb_returns = np.zeros_like(mb_rewards)
+    ret = self.model.value(player_relative_planes(self.obs["player_relative"]))
+    for t in reversed(range(self.nsteps)):
+      ret = mb_rewards[t] + self.gamma * ret * (1. - mb_dones[t])
+      mb_returns[t] = ret
+
+    def flat(x):
+      x = np.asarray(x)
+      return x.reshape((-1,) + x.shape[2:])
+
+    scripts = np.tile(self.scripts, self.nsteps)
+    return flat(mb_obs), flat(mb_actions), flat(mb_returns), flat(mb_values), scripts, flat(mb_valids)
+
+
+def learn(policy, env, seed, nsteps=5, nscripts=0, total_timesteps=int(80e6),
+          vf_coef=0.5, ent_coef=0.01, imitation_coef=1.0, max_grad_norm=0.5,
+          lr=7e-4, lrschedule="linear", epsilon=1e-5, alpha=0.99, gamma=0.99,
+          log_interval=100, script_policy=None, num_cpu=16, callback=None):
+  """Train a policy with synchronous A2C.
+
+  Parameters
+  -------
+  policy: (sess, ob_shape) -> policy
+      e.g. CnnPolicy
+  env: ShmVecEnv
+      envs built with player_relative_spec; num_envs is num_agents + nscripts
+  seed: int
+      TF and numpy seed
+  nsteps: int
+      steps per env in each update batch
+  nscripts: int
+      number of envs, the first ones, driven by `script_policy`
+  total_timesteps: int
+      env steps over all envs to train for
+  vf_coef, ent_coef, imitation_coef: float
+      weights of the value, entropy and script imitation losses
+  max_grad_norm: float
+      global gradient norm clipping, or None
+  lr: float
+      RMSProp learning rate
+  lrschedule: str
+      "linear" (decay to 0 over training) or "constant"
+  epsilon, alpha: float
+      RMSProp epsilon and decay
+  gamma: float
+      discount factor
+  log_interval: int
+      updates between logger dumps
+  script_policy: (batch, h, w) array -> (batch, 2) array
+      see sc2rl.scripted.POLICIES
+  num_cpu: int
+      number of cpus to use for training
+  callback: (locals, globals) -> None
+      called after every update, e.g. to save `model` when
+      `mean_100ep_reward` improves.
+
+  Returns
+  -------
+  model: Model
+      trained model; model.save(path) / model.load(path) store its parameters.
+  """
+  tf.set_random_seed(seed)
+  np.random.seed(seed)
+
+  nenvs = env.num_envs
+  nbatch = nenvs * nsteps
+  num_updates = total_timesteps // nbatch
+  ob_shape = tuple(env.obs_spec["player_relative"][0]) + (3,)
+  model = Model(policy, ob_shape, num_updates, ent_coef=ent_coef, vf_coef=vf_coef,
+                imitation_coef=imitation_coef, max_grad_norm=max_grad_norm, lr=lr,
+                lrschedule=lrschedule, alpha=alpha, epsilon=epsilon, num_cpu=num_cpu)
+  runner = Runner(env, model, nsteps=nsteps, nscripts=nscripts, gamma=gamma,
+                  script_policy=script_policy)
+
+  tstart = time.time()
+  for update in range(1, num_updates + 1):
+    obs, actions, returns, values, scripts, valids = runner.run()
+    policy_loss, value_loss, policy_imitation, policy_entropy = model.train(
+      obs, actions, returns, values, scripts, valids, update)
+
+    episode_stats = runner.episode_stats
+    num_episodes = episode_stats.num_episodes
+    mean_100ep_reward = round(episode_stats["reward"].mean(), 1)
+
+    if callback is not None:
+      callback(locals(), globals())
+
+    if update % log_interval == 0 or update == 1:
+      nseconds = time.time() - tstart
+      logger.record_tabular("nupdates", update)
+      logger.record_tabular("total_timesteps", update * nbatch)
+      logger.record_tabular("fps", int(update * nbatch / nseconds))
+      logger.record_tabular("policy_entropy", float(policy_entropy))
+      logger.record_tabular("policy_loss", float(policy_loss))
+      logger.record_tabular("imitation_loss", float(policy_imitation))
+      logger.record_tabular("value_loss", float(value_loss))
+      logger.record_tabular("explained_variance", float(explained_variance(values, returns)))
+      logger.record_tabular("episodes", num_episodes)
+      logger.record_tabular("mean 100 episode reward", mean_100ep_reward)
+      logger.record_tabular("steps with reselect", runner.num_reselects)
+      if nscripts:
+        logger.record_tabular("mean 100 script episode reward",
+                              round(runner.script_stats["reward"].mean(), 1))
+      logger.dump_tabular()
+
+  return model
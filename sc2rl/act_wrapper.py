@@ -0,0 +1,97 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import zipfile
+import tempfile
+
+
+# dill, TensorFlow and baselines are imported where they are used, so
+# modules that only pass ActWrappers around import quickly
+class ActWrapper(object):
+  def __init__(self, act):
+    self._act = act
+    #self._act_params = act_params
+
+  @staticmethod
+  def load(path, act_params, num_cpu=16):
+    import dill
+    import baselines.common.tf_util as U
+    from baselines import deepq
+
+    with open(path, "rb") as f:
+      model_data = dill.load(f)
+    act = deepq.build_act(**act_params)
+    sess = U.make_session(num_cpu=num_cpu)
+    sess.__enter__()
+    with tempfile.TemporaryDirectory() as td:
+      arc_path = os.path.join(td, "packed.zip")
+      with open(arc_path, "wb") as f:
+        f.write(model_data)
+
+      zipfile.ZipFile(arc_path, 'r', zipfile.ZIP_DEFLATED).extractall(td)
+      U.load_state(os.path.join(td, "model"))
+
+    return ActWrapper(act)
+
+  def __call__(self, *args, **kwargs):
+    return self._act(*args, **kwargs)
+
+  def save(self, path):
+    """Save model to a pickle located at `path`"""
+    import dill
+    import baselines.common.tf_util as U
+
+    with tempfile.TemporaryDirectory() as td:
+      U.save_state(os.path.join(td, "model"))
+      arc_name = os.path.join(td, "packed.zip")
+      with zipfile.ZipFile(arc_name, 'w') as zipf:
+        for root, dirs, files in os.walk(td):
+          for fname in files:
+            file_path = os.path.join(root, fname)
+            if file_path != arc_name:
+              zipf.write(file_path, os.path.relpath(file_path, td))
+      with open(arc_name, "rb") as f:
+        model_data = f.read()
+    with open(path, "wb") as f:
+      dill.dump((model_data), f)
+
+
+def load(path, act_params, num_cpu=16):
+  """Load act function that was returned by learn function.
+
+  Parameters
+  ----------
+  path: str
+      path to the act function pickle
+  num_cpu: int
+      number of cpus to use for executing the policy
+
+  Returns
+  -------
+  act: ActWrapper
+      function that takes a batch of observations
+      and returns actions.
+  """
+  return ActWrapper.load(path, num_cpu=num_cpu, act_params=act_params)
@@ -0,0 +1,199 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""The pysc2 action space as dense numpy tables.
+
+`actions.txt` at the repository root lists every pysc2 function with its
+argument types and sizes. ActionCatalog compiles it into integer arrays
+indexed by function id, plus boolean masks of which functions take which
+arguments, so per-batch questions ("which envs may Move_screen", "which of
+the available functions are spatial") are single numpy indexing ops, and
+masks can be fed to TF as plain tensors.
+
+  catalog = load_catalog(screen_size=16, minimap_size=16)
+  available = catalog.available_mask([ts.observation["available_actions"] for ts in timesteps])
+  can_move = available[:, catalog.index["Move_screen"]]
+"""
+
+import os
+import re
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "actions.txt")
+
+_FUNCTION_RE = re.compile(r"^\s*(\d+)/(\S+)\s+\((.*)\)\s*$")
+_ARG_RE = re.compile(r"^(\d+)/(\w+) \[([\d, ]+)\]$")
+
+SPATIAL_ARGS = ("screen", "minimap", "screen2")
+
+_MASKED_LOGIT = 1e9
+
+
+def parse_actions(path=DEFAULT_PATH):
+  """Parse an actions.txt dump.
+
+  Returns
+  -------
+  functions: list
+      (function_id, name, [(arg_type_id, arg_name, sizes), ...]) per function
+  """
+  functions = []
+  with open(path) as f:
+    for line in f:
+      match = _FUNCTION_RE.match(line)
+      if match is None:
+        continue
+      function_id, name, args = match.groups()
+      parsed_args = []
+      for arg in filter(None, (a.strip() for a in args.split(";"))):
+        arg_match = _ARG_RE.match(arg)
+        if arg_match is None:
+          raise ValueError("cannot parse argument %r of %s" % (arg, name))
+        type_id, arg_name, sizes = arg_match.groups()
+        parsed_args.append((int(type_id), arg_name, [int(s) for s in sizes.split(",")]))
+      functions.append((int(function_id), name, parsed_args))
+  return functions
+
+
+class ActionCatalog(object):
+  """Dense tables of the functions of an actions.txt dump.
+
+  Parameters
+  ----------
+  functions: list
+      output of parse_actions
+  screen_size, minimap_size: int
+      if set, replace the sizes of the spatial arguments, which actions.txt
+      lists for an 84x84 screen and a 64x64 minimap
+
+  Attributes
+  ----------
+  names: list of str
+      function names by id
+  index: dict
+      function name -> id
+  arg_names: list of str
+      argument type names by argument type id
+  num_args: np.array (num_functions,)
+      number of arguments of every function
+  arg_types: np.array (num_functions, max_args)
+      argument type ids of every function, -1 padded
+  arg_sizes: np.array (num_arg_types, 2)
+      sizes of every argument type; scalar arguments have a second size of 1
+  arg_mask: np.array (num_functions, num_arg_types) bool
+      whether a function takes an argument type
+  screen_mask, minimap_mask, queued_mask, spatial_mask: np.array (num_functions,) bool
+      functions taking a screen, a minimap, a queued or any spatial argument
+  """
+
+  def __init__(self, functions, screen_size=None, minimap_size=None):
+    functions = sorted(functions)
+    if [f[0] for f in functions] != list(range(len(functions))):
+      raise ValueError("function ids are not dense")
+    self.num_functions = len(functions)
+    self.names = [f[1] for f in functions]
+    self.index = dict((name, i) for i, name in enumerate(self.names))
+
+    arg_specs = {}
+    for _, _, args in functions:
+      for type_id, arg_name, sizes in args:
+        arg_specs[type_id] = (arg_name, sizes)
+    num_arg_types = max(arg_specs) + 1
+    self.arg_names = [arg_specs[i][0] for i in range(num_arg_types)]
+    self.arg_index = dict((name, i) for i, name in enumerate(self.arg_names))
+
+    self.arg_sizes = np.ones((num_arg_types, 2), dtype=np.int32)
+    for type_id, (arg_name, sizes) in arg_specs.items():
+      if arg_name in ("screen", "screen2") and screen_size is not None:
+        sizes = [screen_size, screen_size]
+      elif arg_name == "minimap" and minimap_size is not None:
+        sizes = [minimap_size, minimap_size]
+      self.arg_sizes[type_id, :len(sizes)] = sizes
+
+    max_args = max(len(f[2]) for f in functions)
+    self.num_args = np.array([len(f[2]) for f in functions], dtype=np.int32)
+    self.arg_types = np.full((self.num_functions, max_args), -1, dtype=np.int32)
+    self.arg_mask = np.zeros((self.num_functions, num_arg_types), dtype=bool)
+    for function_id, _, args in functions:
+      type_ids = [a[0] for a in args]
+      self.arg_types[function_id, :len(type_ids)] = type_ids
+      self.arg_mask[function_id, type_ids] = True
+
+    self.screen_mask = self.arg_mask[:, self.arg_index["screen"]]
+    self.minimap_mask = self.arg_mask[:, self.arg_index["minimap"]]
+    self.queued_mask = self.arg_mask[:, self.arg_index["queued"]]
+    self.spatial_mask = self.arg_mask[:, [self.arg_index[a] for a in SPATIAL_ARGS]].any(axis=1)
+
+  def function_mask(self, names):
+    """Boolean mask over function ids selecting `names`."""
+    mask = np.zeros(self.num_functions, dtype=bool)
+    mask[[self.index[name] for name in names]] = True
+    return mask
+
+  def spatial_shape(self, arg_name="screen"):
+    """(height, width) of a spatial argument, i.e. of the layers it indexes."""
+    width, height = self.arg_sizes[self.arg_index[arg_name]]
+    return int(height), int(width)
+
+  def available_mask(self, available_actions, restrict=None):
+    """(batch, num_functions) bool mask from per-env available_actions id lists.
+
+    Parameters
+    ----------
+    available_actions: list of array-like
+        observation["available_actions"] of every env (ragged)
+    restrict: np.array (num_functions,) bool
+        optional mask of the functions an agent may use at all
+    """
+    lengths = [len(ids) for ids in available_actions]
+    mask = np.zeros((len(available_actions), self.num_functions), dtype=bool)
+    if sum(lengths):
+      rows = np.repeat(np.arange(len(available_actions)), lengths)
+      mask[rows, np.concatenate([np.asarray(ids, dtype=np.int64) for ids in available_actions])] = True
+    if restrict is not None:
+      mask &= restrict
+    return mask
+
+
+def mask_logits(logits, mask):
+  """Push the logits of unavailable functions to a large negative value in-graph.
+
+  `mask` is a bool tensor (or fed array) broadcastable to `logits`, e.g. a
+  (batch, num_functions) available_mask. A finite penalty instead of -inf
+  keeps softmax entropies and their gradients finite.
+  """
+  import tensorflow as tf
+  return logits - _MASKED_LOGIT * (1. - tf.cast(mask, logits.dtype))
+
+
+_CATALOGS = {}
+
+
+def load_catalog(path=DEFAULT_PATH, screen_size=None, minimap_size=None):
+  """ActionCatalog of `path`, parsed once per process and size."""
+  key = (os.path.abspath(path), screen_size, minimap_size)
+  if key not in _CATALOGS:
+    _CATALOGS[key] = ActionCatalog(parse_actions(path), screen_size, minimap_size)
+  return _CATALOGS[key]
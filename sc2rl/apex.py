@@ -0,0 +1,463 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Ape-X style distributed DQN (Horgan et al., 2018) on one multi-core box.
+
+Process layout:
+
+  actors (num_actors processes)   each runs its own env copy with a fixed
+      epsilon, computes initial priorities from its local Q-values and sends
+      batches of transitions to the replay server over a shared queue.
+  replay server (1 process)        owns the prioritized replay buffer, adds
+      incoming batches and answers the learner's sample/update requests
+      over a pipe.
+  learner (calling process)        trains both heads on sampled batches,
+      sends back new priorities and periodically publishes its weights to
+      a shared-memory `WeightChannel` the actors read from.
+
+Processes are forked, so `env_fn` and `q_func` can be closures; all
+TensorFlow sessions are created only after the fork.
+"""
+
+import time
+import multiprocessing
+from queue import Empty
+
+import numpy as np
+import tensorflow as tf
+
+import baselines.common.tf_util as U
+
+from baselines import logger
+from baselines import deepq
+from baselines.common.schedules import LinearSchedule
+from baselines.deepq.replay_buffer import PrioritizedReplayBuffer
+
+from pysc2.env import environment
+from pysc2.lib import actions as sc2_actions
+
+from sc2rl.act_wrapper import ActWrapper
+from sc2rl.army_select import select_and_step
+from sc2rl.episode_stats import EpisodeStats
+from sc2rl.exploration import EpsilonGreedy, ScheduleTable, apex_epsilons
+from sc2rl.preprocess import beacon_screen, player_relative_screen
+from sc2rl.weight_channel import WeightChannel
+
+_MOVE_SCREEN = sc2_actions.FUNCTIONS.Move_screen.id
+_SELECT_ARMY = sc2_actions.FUNCTIONS.select_army.id
+_NOT_QUEUED = [0]
+_SELECT_ALL = [0]
+
+HEADS = ("x", "y")
+
+
+class VariableSync(object):
+  """Reads and assigns a fixed list of variables as numpy arrays."""
+
+  def __init__(self, variables):
+    self.variables = self.sorted(variables)
+    self._placeholders = [tf.placeholder(v.dtype.base_dtype, v.get_shape())
+                          for v in self.variables]
+    self._assign = tf.group(*[v.assign(ph) for v, ph
+                              in zip(self.variables, self._placeholders)])
+
+  @staticmethod
+  def sorted(variables):
+    return sorted(variables, key=lambda v: v.name)
+
+  def get(self):
+    return tf.get_default_session().run(self.variables)
+
+  def set(self, values):
+    tf.get_default_session().run(self._assign, feed_dict=dict(zip(self._placeholders, values)))
+
+
+def _q_func_shapes(make_obs_ph, q_func, num_actions):
+  """Shapes of the weights `VariableSync` moves, from a throwaway graph."""
+  with tf.Graph().as_default():
+    shapes = []
+    for head in HEADS:
+      _build_q_values(make_obs_ph, q_func, num_actions, "deep_" + head)
+      shapes.extend(v.get_shape().as_list() for v in VariableSync.sorted(q_func_vars("deep_" + head)))
+  return shapes
+
+
+def q_func_vars(scope):
+  """Online network variables of a head built by `deepq.build_train(scope=scope)`."""
+  return tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope=scope + "/q_func")
+
+
+def _build_q_values(make_obs_ph, q_func, num_actions, scope):
+  with tf.variable_scope(scope):
+    observations_ph = U.ensure_tf_input(make_obs_ph("observation"))
+    q_values = q_func(observations_ph.get(), num_actions, scope="q_func")
+  return U.function([observations_ph], q_values)
+
+
+def _reset(env):
+  obs = env.reset()
+  # Select marines
+  return env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
+
+
+def _actor(actor_id, env_fn, q_func, make_obs_ph, num_actions, eps, gamma,
+           send_batch, weight_poll_freq, weight_channel, transition_queue,
+           stats_queue, stop_event, num_cpu):
+  transition_queue.cancel_join_thread()
+  stats_queue.cancel_join_thread()
+
+  sess = U.make_session(num_cpu)
+  sess.__enter__()
+  q_fns = [_build_q_values(make_obs_ph, q_func, num_actions, "deep_" + head) for head in HEADS]
+  syncs = [VariableSync(q_func_vars("deep_" + head)) for head in HEADS]
+  U.initialize()
+
+  split = len(syncs[0].variables)
+
+  def set_weights(arrays):
+    syncs[0].set(arrays[:split])
+    syncs[1].set(arrays[split:])
+
+  # Act with the learner's weights from the start
+  latest = None
+  while latest is None:
+    latest = weight_channel.read(set_weights)
+    if latest is None:
+      time.sleep(0.1)
+  version = latest[0]
+
+  explorer = EpsilonGreedy(num_actions)
+  batch = []
+  pending = None
+  episode_reward = 0.0
+  episode_beacons = 0.0
+  steps = 0
+
+  env = env_fn(actor_id)
+  try:
+    obs = _reset(env)
+    screen = beacon_screen(player_relative_screen(obs[0]))
+    while not stop_event.is_set():
+      q = [q_fn(np.array(screen)[None])[0] for q_fn in q_fns]
+      if pending is not None:
+        # Initial priority from the local Q-values, like the learner's TD error
+        obs_t, action, rew, obs_tp1, q_sa = pending
+        td = [rew + gamma * q_h.max() - q_sa_h for q_h, q_sa_h in zip(q, q_sa)]
+        batch.append((obs_t, action, rew, obs_tp1, 0., np.mean(np.abs(td))))
+
+      greedy = [q_h.argmax() for q_h in q]
+      action = explorer.select([greedy], eps)[0]
+
+      obs, executed = select_and_step(env, obs[0], sc2_actions.FunctionCall(_MOVE_SCREEN, [_NOT_QUEUED, list(action)]))
+
+      new_screen = beacon_screen(player_relative_screen(obs[0]))
+      rew = obs[0].reward * 100
+      done = obs[0].step_type == environment.StepType.LAST
+      q_sa = [q_h[a] for q_h, a in zip(q, action)]
+      episode_reward += rew
+      episode_beacons += obs[0].reward
+      steps += 1
+
+      if done:
+        if executed:
+          td = [rew - q_sa_h for q_sa_h in q_sa]
+          batch.append((screen, action, rew, new_screen, 1., np.mean(np.abs(td))))
+        pending = None
+        stats_queue.put(("episode", actor_id, steps, episode_reward, episode_beacons))
+        episode_reward = 0.0
+        episode_beacons = 0.0
+        obs = _reset(env)
+        new_screen = beacon_screen(player_relative_screen(obs[0]))
+      elif executed:
+        pending = (screen, action, rew, new_screen, q_sa)
+      else:
+        # The move did not run; there is no transition to send for it
+        pending = None
+      screen = new_screen
+
+      if len(batch) >= send_batch:
+        obses_t, actions, rewards, obses_tp1, dones, priorities = zip(*batch)
+        transition_queue.put((np.array(obses_t), np.array(actions), np.array(rewards),
+                              np.array(obses_tp1), np.array(dones), np.array(priorities)))
+        batch = []
+
+      if steps % weight_poll_freq == 0:
+        read_start = time.time()
+        latest = weight_channel.read(set_weights, since_version=version)
+        if latest is not None:
+          version, latency = latest
+          stats_queue.put(("weights", actor_id, version, latency, time.time() - read_start))
+  finally:
+    env.close()
+
+
+def _replay_server(buffer_size, alpha, transition_queue, conn, stop_event, max_drain=64):
+
+  replay_buffer = PrioritizedReplayBuffer(buffer_size, alpha=alpha)
+  while not stop_event.is_set():
+    drained = 0
+    while drained < max_drain:
+      try:
+        item = transition_queue.get_nowait()
+      except Empty:
+        break
+      obses_t, actions, rewards, obses_tp1, dones, priorities = item
+      idxes = []
+      for i in range(len(rewards)):
+        idxes.append(replay_buffer._next_idx)
+        replay_buffer.add(obses_t[i], actions[i], rewards[i], obses_tp1[i], dones[i])
+      replay_buffer.update_priorities(idxes, np.maximum(priorities, 1e-6))
+      drained += 1
+
+    if conn.poll(0 if drained else 0.001):
+      command = conn.recv()
+      if command[0] == "sample":
+        _, batch_size, beta = command
+        conn.send((len(replay_buffer), replay_buffer.sample(batch_size, beta=beta)))
+      elif command[0] == "update":
+        _, idxes, priorities = command
+        replay_buffer.update_priorities(idxes, priorities)
+      elif command[0] == "size":
+        conn.send(len(replay_buffer))
+      elif command[0] == "close":
+        break
+
+
+def _check_alive(processes):
+  """Raise if an actor or the replay server died, e.g. because pysc2 failed to start."""
+  for process in processes:
+    if not process.is_alive():
+      raise RuntimeError("{} exited with code {}".format(process.name, process.exitcode))
+
+
+def _recv(conn, processes, poll_interval=1.):
+  """conn.recv() that raises instead of waiting forever on a dead process."""
+  while not conn.poll(poll_interval):
+    _check_alive(processes)
+  return conn.recv()
+
+
+def learn(env_fn,
+          q_func,
+          make_obs_ph,
+          num_actions=16,
+          num_actors=4,
+          lr=5e-4,
+          max_timesteps=100000,
+          buffer_size=50000,
+          batch_size=32,
+          learning_starts=1000,
+          gamma=0.99,
+          target_network_update_freq=500,
+          prioritized_replay_alpha=0.6,
+          prioritized_replay_beta0=0.4,
+          prioritized_replay_eps=1e-6,
+          actor_base_eps=0.4,
+          actor_eps_alpha=7.,
+          actor_send_batch=50,
+          actor_weight_poll_freq=400,
+          weight_publish_freq=100,
+          print_freq=100,
+          num_cpu=16,
+          actor_num_cpu=1,
+          callback=None):
+  """Train the x/y beacon heads with Ape-X actors, replay server and learner.
+
+  Parameters
+  -------
+  env_fn: int -> pysc2.env.SC2Env
+      creates the env of the actor with the given id; called inside the actor
+  q_func: (tf.Variable, int, str, bool) -> tf.Variable
+      the model, see `sc2rl.dqn.learn`
+  make_obs_ph: str -> U.BatchInput
+      creates the observation placeholder
+  num_actions: int
+      number of actions of each head (the screen size)
+  num_actors: int
+      number of actor processes
+  max_timesteps: int
+      number of learner (train) steps
+  buffer_size: int
+      size of the central replay buffer
+  learning_starts: int
+      transitions the replay server must hold before training starts
+  actor_base_eps, actor_eps_alpha: float
+      actor i explores with epsilon base_eps ** (1 + alpha * i / (num_actors - 1))
+  actor_send_batch: int
+      transitions an actor collects before sending them to the replay server
+  actor_weight_poll_freq: int
+      env steps between an actor's checks for new weights. The time from
+      publication to pickup and the time to load them are logged.
+  weight_publish_freq: int
+      learner steps between weight publications
+  print_freq: int
+      learner steps between log dumps, None to disable
+  num_cpu, actor_num_cpu: int
+      number of cpus of the learner and of each actor session
+  callback: (locals, globals) -> None
+      called every learner step; `done` is True on steps where actors
+      reported finished episodes, and `acts` holds the x and y act functions
+      like sc2rl.dqn's. If callback returns true training stops.
+
+  Returns
+  -------
+  act_x, act_y: ActWrapper
+      the learner's act functions
+  """
+  ctx = multiprocessing.get_context("fork")
+  stop_event = ctx.Event()
+  transition_queue = ctx.Queue(maxsize=4 * num_actors)
+  stats_queue = ctx.Queue()
+  learner_conn, server_conn = ctx.Pipe()
+  weight_channel = WeightChannel(_q_func_shapes(make_obs_ph, q_func, num_actions), ctx=ctx)
+  epsilons = apex_epsilons(num_actors, actor_base_eps, actor_eps_alpha)
+
+  # Fork every process before this one creates any TensorFlow state
+  processes = [ctx.Process(target=_replay_server, name="apex replay server",
+                           args=(buffer_size, prioritized_replay_alpha,
+                                 transition_queue, server_conn, stop_event))]
+  for actor_id in range(num_actors):
+    processes.append(ctx.Process(
+      target=_actor, name="apex actor %d" % actor_id,
+      args=(actor_id, env_fn, q_func, make_obs_ph, num_actions, epsilons[actor_id],
+            gamma, actor_send_batch, actor_weight_poll_freq, weight_channel,
+            transition_queue, stats_queue, stop_event, actor_num_cpu)))
+  for process in processes:
+    process.daemon = True
+    process.start()
+
+  sess = U.make_session(num_cpu)
+  sess.__enter__()
+
+  act_x, train_x, update_target_x, debug_x = deepq.build_train(
+    make_obs_ph=make_obs_ph, q_func=q_func, num_actions=num_actions,
+    optimizer=tf.train.AdamOptimizer(learning_rate=lr),
+    gamma=gamma, grad_norm_clipping=10, scope="deep_x")
+  act_y, train_y, update_target_y, debug_y = deepq.build_train(
+    make_obs_ph=make_obs_ph, q_func=q_func, num_actions=num_actions,
+    optimizer=tf.train.AdamOptimizer(learning_rate=lr),
+    gamma=gamma, grad_norm_clipping=10, scope="deep_y")
+  # Same `acts` local as sc2rl.dqn, for callbacks written against it
+  acts = {"x": act_x, "y": act_y}
+  syncs = [VariableSync(q_func_vars("deep_" + head)) for head in HEADS]
+
+  beta_schedule = ScheduleTable(LinearSchedule(max_timesteps,
+                                               initial_p=prioritized_replay_beta0,
+                                               final_p=1.0),
+                                max_timesteps)
+
+  U.initialize()
+  update_target_x()
+  update_target_y()
+
+  def publish_weights():
+    start = time.time()
+    weights = [values for sync in syncs for values in sync.get()]
+    weight_stats["publish"].append(time.time() - start)
+    weight_channel.publish(weights)
+
+  weight_stats = EpisodeStats(["publish", "latency", "load"], window=100)
+  publish_weights()
+
+  episode_stats = EpisodeStats(["reward", "beacons"], window=100)
+  actor_steps = np.zeros(num_actors, dtype=np.int64)
+  num_episodes = 0
+  mean_100ep_reward = None
+
+  try:
+    replay_size = 0
+    while replay_size < learning_starts:
+      time.sleep(1.)
+      _check_alive(processes)
+      learner_conn.send(("size",))
+      replay_size = _recv(learner_conn, processes)
+
+    start_time = time.time()
+    learner_conn.send(("sample", batch_size, beta_schedule.value(0)))
+    for t in range(max_timesteps):
+      done = False
+      while True:
+        try:
+          stats = stats_queue.get_nowait()
+        except Empty:
+          break
+        if stats[0] == "episode":
+          _, actor_id, steps, episode_reward, episode_beacons = stats
+          actor_steps[actor_id] = steps
+          episode_stats.end_episode(reward=episode_reward, beacons=episode_beacons)
+          done = True
+        elif stats[0] == "weights":
+          _, actor_id, version, latency, load_time = stats
+          weight_stats["latency"].append(latency)
+          weight_stats["load"].append(load_time)
+      if done:
+        num_episodes = episode_stats.num_episodes
+        mean_100ep_reward = round(episode_stats["reward"].mean(), 1)
+        mean_100ep_beacon = round(episode_stats["beacons"].mean(), 1)
+
+      if callback is not None:
+        if callback(locals(), globals()):
+          break
+
+      replay_size, experience = _recv(learner_conn, processes)
+      # Prefetch the next batch while this one trains
+      learner_conn.send(("sample", batch_size, beta_schedule.value(t + 1)))
+      (obses_t, actions, rewards, obses_tp1, dones, weights, batch_idxes) = experience
+
+      td_errors_x = train_x(obses_t, actions[:, 0], rewards, obses_tp1, dones, weights)
+      td_errors_y = train_y(obses_t, actions[:, 1], rewards, obses_tp1, dones, weights)
+      new_priorities = (np.abs(td_errors_x) + np.abs(td_errors_y)) / 2. + prioritized_replay_eps
+      learner_conn.send(("update", batch_idxes, new_priorities))
+
+      if t % target_network_update_freq == 0:
+        update_target_x()
+        update_target_y()
+
+      if t % weight_publish_freq == 0:
+        publish_weights()
+        # The replay server may keep serving after an actor died; fail anyway
+        _check_alive(processes)
+
+      if print_freq is not None and t % print_freq == 0 and num_episodes > 0:
+        elapsed = max(time.time() - start_time, 1e-6)
+        logger.record_tabular("learner steps", t)
+        logger.record_tabular("env steps", int(actor_steps.sum()))
+        logger.record_tabular("episodes", num_episodes)
+        logger.record_tabular("mean 100 episode reward", mean_100ep_reward)
+        logger.record_tabular("mean 100 episode beacon", mean_100ep_beacon)
+        logger.record_tabular("replay size", replay_size)
+        logger.record_tabular("learner steps/sec", t / elapsed)
+        logger.record_tabular("weight version", weight_channel.version)
+        logger.record_tabular("weight publish ms", 1000. * weight_stats["publish"].mean())
+        logger.record_tabular("weight sync latency ms", 1000. * weight_stats["latency"].nanmean())
+        logger.record_tabular("weight load ms", 1000. * weight_stats["load"].nanmean())
+        logger.dump_tabular()
+  finally:
+    stop_event.set()
+    for process in processes:
+      process.join(timeout=10)
+      if process.is_alive():
+        process.terminate()
+
+  return ActWrapper(act_x), ActWrapper(act_y)
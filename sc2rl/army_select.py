@@ -0,0 +1,93 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Executing FunctionCalls that need the army selected.
+
+`select_and_step` replaces the learners' "if Move_screen is unavailable,
+spend this step on select_army" fallback: it re-selects the army, then
+executes the chosen action in the same learner step, and tells the caller
+whether the action actually ran so that a transition is never stored for
+an action that did not.
+
+It does not save game time. The selection is an ordinary env step, so a
+re-selecting step simulates 2 * step_mul game loops, as the old fallback
+did. SC2Env takes one FunctionCall per agent per call and has no public
+per-call step_mul, and envs built with step_mul=1 that repeat actions
+would fetch step_mul observations on every step to save loops on the rare
+re-selecting ones. Re-selects are counted instead (EnvAdapter.num_reselects,
+ShmVecEnv.reselected) and logged by the learners, so their cost shows.
+
+There is no availability mask over Q-values either: the Q heads pick
+coordinates or directions of one function, not between functions, so
+availability is all decided here.
+
+Nothing here imports TensorFlow, so env worker processes can use it.
+"""
+
+from pysc2.env import environment
+from pysc2.lib import actions as sc2_actions
+
+_NO_OP = sc2_actions.FUNCTIONS.no_op.id
+_SELECT_ARMY = sc2_actions.FUNCTIONS.select_army.id
+_SELECT_ALL = [0]
+
+
+def needs_reselect(timestep, function_call):
+  """Whether `function_call` is unavailable in `timestep`, so select_and_step re-selects first."""
+  return function_call.function not in timestep.observation["available_actions"]
+
+
+def select_and_step(env, timestep, function_call):
+  """Execute `function_call`, re-selecting the army first if it needs to.
+
+  Parameters
+  ----------
+  env: SC2Env
+      single-agent env
+  timestep: TimeStep
+      latest observation of `env`
+  function_call: FunctionCall
+      action to execute
+
+  Returns
+  -------
+  obs: list of TimeStep
+      as env.step; the reward of the selection step is added to it.
+  executed: bool
+      whether `function_call` ran. It did not when neither it nor
+      select_army was available (a no_op ran instead), or when after the
+      selection the episode had ended or it was still unavailable (`obs` is
+      then the selection's). Callers should skip such transitions.
+  """
+  if not needs_reselect(timestep, function_call):
+    return env.step(actions=[function_call]), True
+  if _SELECT_ARMY not in timestep.observation["available_actions"]:
+    return env.step(actions=[sc2_actions.FunctionCall(_NO_OP, [])]), False
+
+  selected = env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
+  if (selected[0].step_type == environment.StepType.LAST or
+      function_call.function not in selected[0].observation["available_actions"]):
+    return selected, False
+  obs = env.step(actions=[function_call])
+  return [obs[0]._replace(reward=obs[0].reward + selected[0].reward)], True
@@ -0,0 +1,230 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Pluggable pieces of the shared DQN learner (sc2rl.dqn).
+
+A map is trained by combining:
+
+- an EnvAdapter, which starts episodes and executes FunctionCalls,
+- an ObservationEncoder, which turns a TimeStep into the array the
+  Q-networks see and replay stores,
+- an ActionDecoder, which names the Q heads and turns their actions into a
+  FunctionCall,
+- a RewardShaper, which turns the env reward into the training reward.
+
+Encoders, decoders and shapers get `reset(timestep)` at the start of every
+episode, so they can keep per-episode state.
+"""
+
+import numpy as np
+
+from pysc2.lib import actions as sc2_actions
+from pysc2.lib import features
+
+from sc2rl.army_select import needs_reselect, select_and_step
+from sc2rl.preprocess import beacon_screen, center_on, _PLAYER_FRIENDLY
+
+_PLAYER_RELATIVE = features.SCREEN_FEATURES.player_relative.index
+_MOVE_SCREEN = sc2_actions.FUNCTIONS.Move_screen.id
+_SELECT_ARMY = sc2_actions.FUNCTIONS.select_army.id
+_NOT_QUEUED = [0]
+_SELECT_ALL = [0]
+
+# Directions of FourWayMoveDecoder
+UP, DOWN, LEFT, RIGHT = range(4)
+
+
+def _marines(timestep, default):
+  """[x, y] centroid of the friendly units, or `default` when none is visible."""
+  player_relative = timestep.observation["screen"][_PLAYER_RELATIVE]
+  player_y, player_x = (player_relative == _PLAYER_FRIENDLY).nonzero()
+  if not len(player_x):
+    return default
+  return [int(player_x.mean()), int(player_y.mean())]
+
+
+class EnvAdapter(object):
+  """Starts episodes with the army selected; re-selects it when an action needs it.
+
+  `step` returns the observations and whether the FunctionCall ran (see
+  sc2rl.army_select.select_and_step). `num_steps` and `num_reselects`
+  count the steps and the ones that had to re-select first.
+  """
+
+  def __init__(self):
+    self.num_steps = 0
+    self.num_reselects = 0
+
+  def reset(self, env):
+    env.reset()
+    return env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
+
+  def step(self, env, timestep, function_call):
+    self.num_steps += 1
+    self.num_reselects += needs_reselect(timestep, function_call)
+    return select_and_step(env, timestep, function_call)
+
+
+class ObservationEncoder(object):
+  """TimeStep -> array of `shape`; override `encode`."""
+
+  def __init__(self, shape, dtype=np.float32):
+    self.shape = tuple(shape)
+    self.dtype = dtype
+
+  def reset(self, timestep):
+    pass
+
+  def encode(self, timestep):
+    raise NotImplementedError
+
+
+class BeaconEncoder(ObservationEncoder):
+  """Binary mask of the neutral units (beacon/minerals)."""
+
+  def __init__(self, screen_dim):
+    super(BeaconEncoder, self).__init__((screen_dim, screen_dim), int)
+
+  def encode(self, timestep):
+    return beacon_screen(timestep.observation["screen"][_PLAYER_RELATIVE])
+
+
+class PathMemoryEncoder(ObservationEncoder):
+  """player_relative plus the decoder's path memory, centered on the marines."""
+
+  def __init__(self, screen_dim, decoder):
+    super(PathMemoryEncoder, self).__init__((screen_dim, screen_dim), np.float32)
+    self.decoder = decoder
+
+  def encode(self, timestep):
+    player_relative = timestep.observation["screen"][_PLAYER_RELATIVE]
+    screen = player_relative + self.decoder.path_memory
+    center = [self.shape[1] // 2, self.shape[0] // 2]
+    return center_on(screen, _marines(timestep, center)).astype(self.dtype)
+
+
+class ActionDecoder(object):
+  """Names the Q heads and turns their actions into a FunctionCall.
+
+  `heads` is a list of (name, num_actions); `decode` gets one action per
+  head, in that order.
+  """
+
+  heads = []
+
+  def reset(self, timestep):
+    pass
+
+  def decode(self, actions, timestep):
+    raise NotImplementedError
+
+
+class XYMoveDecoder(ActionDecoder):
+  """Move_screen to ([x], [y]) picked by separate x and y heads."""
+
+  def __init__(self, screen_dim):
+    self.heads = [("x", screen_dim), ("y", screen_dim)]
+
+  def decode(self, actions, timestep):
+    return sc2_actions.FunctionCall(_MOVE_SCREEN, [_NOT_QUEUED, [int(actions[0]), int(actions[1])]])
+
+
+class FourWayMoveDecoder(ActionDecoder):
+  """Move_screen `step` pixels UP/DOWN/LEFT/RIGHT of the marines.
+
+  Keeps a path memory of the pixels walked this episode (-1) and, for the
+  reward shaper, whether the last move was blocked by the screen edge and
+  whether it ends on a pixel walked before it.
+  """
+
+  def __init__(self, screen_dim, step=16):
+    self.heads = [("direction", 4)]
+    self.screen_dim = screen_dim
+    self.step = step
+    self.path_memory = np.zeros((screen_dim, screen_dim))
+    self.blocked = False
+    self.revisit = False
+
+  def reset(self, timestep):
+    self.path_memory = np.zeros((self.screen_dim, self.screen_dim))
+    self.blocked = False
+    self.revisit = False
+
+  def decode(self, actions, timestep):
+    last = self.screen_dim - 1
+    center = [self.screen_dim // 2, self.screen_dim // 2]
+    x, y = _marines(timestep, center)
+    direction = int(actions[0])
+    if direction == UP:
+      coord = [x, max(y - self.step, 0)]
+      walked = (slice(coord[1], y), x)
+    elif direction == DOWN:
+      coord = [x, min(y + self.step, last)]
+      walked = (slice(y, coord[1]), x)
+    elif direction == LEFT:
+      coord = [max(x - self.step, 0), y]
+      walked = (y, slice(coord[0], x))
+    else:
+      coord = [min(x + self.step, last), y]
+      walked = (y, slice(x, coord[0]))
+    self.blocked = coord == [x, y]
+    self.revisit = self.path_memory[coord[1], coord[0]] != 0
+    self.path_memory[walked] = -1
+    return sc2_actions.FunctionCall(_MOVE_SCREEN, [_NOT_QUEUED, coord])
+
+
+class RewardShaper(object):
+  """Training reward of a step; by default the env reward."""
+
+  def reset(self, timestep):
+    pass
+
+  def shape(self, timestep, actions):
+    return timestep.reward
+
+
+class ScaledReward(RewardShaper):
+  def __init__(self, scale):
+    self.scale = scale
+
+  def shape(self, timestep, actions):
+    return timestep.reward * self.scale
+
+
+class PathPenaltyReward(ScaledReward):
+  """Scaled reward minus penalties for blocked and revisiting FourWayMoveDecoder moves."""
+
+  def __init__(self, decoder, scale=10, blocked_penalty=1., revisit_penalty=0.5):
+    super(PathPenaltyReward, self).__init__(scale)
+    self.decoder = decoder
+    self.blocked_penalty = blocked_penalty
+    self.revisit_penalty = revisit_penalty
+
+  def shape(self, timestep, actions):
+    reward = super(PathPenaltyReward, self).shape(timestep, actions)
+    if self.decoder.blocked:
+      reward -= self.blocked_penalty
+    if self.decoder.revisit:
+      reward -= self.revisit_penalty
+    return reward
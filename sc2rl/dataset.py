@@ -0,0 +1,169 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Offline transition datasets.
+
+A dataset is a directory of chunk files, each an `.npz` with one array per
+column (obs_t, action, reward, obs_tp1, done) holding `chunk_size`
+consecutive transitions. Chunks are compressed and written atomically, so
+a directory can be read while a run is still recording into it.
+"""
+
+import glob
+import os
+
+import numpy as np
+
+COLUMNS = ("obs_t", "action", "reward", "obs_tp1", "done")
+
+
+class TransitionRecorder(object):
+  """Buffers transitions and writes them out one chunk at a time.
+
+  Parameters
+  ----------
+  directory: str
+      dataset directory; recording into an existing dataset appends to it
+  chunk_size: int
+      transitions per chunk file
+  compress: bool
+      write chunks with np.savez_compressed instead of np.savez
+  """
+
+  def __init__(self, directory, chunk_size=10000, compress=True):
+    self.directory = directory
+    self.chunk_size = chunk_size
+    self.compress = compress
+    os.makedirs(directory, exist_ok=True)
+    self._num_chunks = len(chunk_files(directory))
+    self._columns = None
+    self._size = 0
+
+  def add(self, obs_t, action, reward, obs_tp1, done):
+    if self._columns is None:
+      self._columns = [np.empty((self.chunk_size,) + np.shape(value), dtype=np.asarray(value).dtype)
+                       for value in (obs_t, action, reward, obs_tp1, done)]
+    for column, value in zip(self._columns, (obs_t, action, reward, obs_tp1, done)):
+      column[self._size] = value
+    self._size += 1
+    if self._size == self.chunk_size:
+      self.flush()
+
+  def flush(self):
+    """Write the transitions buffered so far as a (possibly short) chunk."""
+    if not self._size:
+      return
+    path = os.path.join(self.directory, "chunk_%08d.npz" % self._num_chunks)
+    tmp_path = path + ".tmp"
+    save = np.savez_compressed if self.compress else np.savez
+    with open(tmp_path, "wb") as f:
+      save(f, **dict((name, column[:self._size]) for name, column in zip(COLUMNS, self._columns)))
+    os.replace(tmp_path, path)
+    self._num_chunks += 1
+    self._size = 0
+
+  def close(self):
+    self.flush()
+
+
+def chunk_files(directory):
+  return sorted(glob.glob(os.path.join(directory, "chunk_*.npz")))
+
+
+def iterate_chunks(directory):
+  """Yield the chunks of a dataset in recording order, as dicts of columns."""
+  for path in chunk_files(directory):
+    with np.load(path) as chunk:
+      yield dict((name, chunk[name]) for name in COLUMNS)
+
+
+def iterate_transitions(directory):
+  """Yield single (obs_t, action, reward, obs_tp1, done) transitions in order."""
+  for chunk in iterate_chunks(directory):
+    for transition in zip(*[chunk[name] for name in COLUMNS]):
+      yield transition
+
+
+def load_columns(directory, max_transitions=None):
+  """Load the last `max_transitions` transitions of a dataset as columns.
+
+  Chunks are read newest first and only until enough transitions are
+  loaded, so warm-starting a small buffer from a large dataset stays cheap.
+  """
+  chunks = []
+  num = 0
+  for path in reversed(chunk_files(directory)):
+    if max_transitions is not None and num >= max_transitions:
+      break
+    with np.load(path) as chunk:
+      chunks.append([chunk[name] for name in COLUMNS])
+    num += len(chunks[-1][0])
+  if not chunks:
+    raise ValueError("no transition chunks in %s" % directory)
+  columns = [np.concatenate(column[::-1]) for column in zip(*chunks)]
+  if max_transitions is not None:
+    columns = [column[-max_transitions:] for column in columns]
+  return dict(zip(COLUMNS, columns))
+
+
+def minibatches(directory, batch_size, shuffle=True, epochs=1, rng=np.random):
+  """Stream a dataset as (obs_t, action, reward, obs_tp1, done) minibatches.
+
+  Only one chunk (plus the remainder of the previous one) is in memory at
+  a time. With `shuffle`, chunk order and the transitions within each chunk
+  are shuffled, which mixes well enough when chunks span many episodes.
+
+  Parameters
+  ----------
+  directory: str
+      dataset directory
+  batch_size: int
+      transitions per minibatch; a last, short minibatch is dropped
+  shuffle: bool
+      shuffle chunk order and transitions within chunks
+  epochs: int
+      passes over the dataset, or None to loop forever
+  rng: np.random.RandomState
+      source of the shuffling
+  """
+  paths = chunk_files(directory)
+  if not paths:
+    raise ValueError("no transition chunks in %s" % directory)
+  epoch = 0
+  while epochs is None or epoch < epochs:
+    order = rng.permutation(len(paths)) if shuffle else range(len(paths))
+    carry = None
+    for i in order:
+      with np.load(paths[i]) as chunk:
+        columns = [chunk[name] for name in COLUMNS]
+      if shuffle:
+        perm = rng.permutation(len(columns[0]))
+        columns = [column[perm] for column in columns]
+      if carry is not None:
+        columns = [np.concatenate([old, new]) for old, new in zip(carry, columns)]
+      num_batches = len(columns[0]) // batch_size
+      for b in range(num_batches):
+        yield tuple(column[b * batch_size:(b + 1) * batch_size] for column in columns)
+      carry = [column[num_batches * batch_size:] for column in columns]
+    epoch += 1
@@ -0,0 +1,571 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""DQN learner shared by the map scripts.
+
+What is specific to a map is plugged in through sc2rl.components: the
+EnvAdapter runs the env, the ObservationEncoder builds the screen, the
+ActionDecoder names the Q heads and builds the FunctionCall, and the
+RewardShaper computes the training reward. Every head gets its own
+Q-network, target network and replay buffer, all fed from the same steps.
+"""
+
+import os
+import time
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+import baselines.common.tf_util as U
+
+from baselines import logger
+from baselines.common.schedules import LinearSchedule
+from baselines import deepq
+from baselines.deepq.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+
+from pysc2.env import environment
+
+from sc2rl.episode_stats import EpisodeStats
+from sc2rl.profiler import PhaseProfiler
+from sc2rl.memory import (estimate_transition_nbytes, buffer_size_for_budget,
+                          replay_footprint, record_footprint, format_bytes)
+from sc2rl.exploration import ScheduleTable, EpsilonGreedy
+from sc2rl.act_wrapper import ActWrapper
+from sc2rl.training_state import TrainingState, replay_columns
+from sc2rl.replay_io import bulk_add
+from sc2rl.mmap_replay import MmapReplayBuffer, MmapPrioritizedReplayBuffer
+from sc2rl.dataset import TransitionRecorder, chunk_files, load_columns
+from sc2rl.replay_capture import ReplayCapture
+from sc2rl.metrics import MetricsSink
+from sc2rl.components import EnvAdapter, RewardShaper
+
+
+def _make_replay_buffers(names, buffer_size, prioritized_replay, alpha, backend, mmap_dir):
+  """One buffer per head; with the mmap backend they all read the first head's frames."""
+  replay_buffers = {}
+  frames = None
+  for name in names:
+    if backend == "mmap":
+      if prioritized_replay:
+        buffer = MmapPrioritizedReplayBuffer(buffer_size, alpha=alpha, directory=mmap_dir,
+                                             frames=frames)
+      else:
+        buffer = MmapReplayBuffer(buffer_size, directory=mmap_dir, frames=frames)
+      frames = buffer.frames
+    elif prioritized_replay:
+      buffer = PrioritizedReplayBuffer(buffer_size, alpha=alpha)
+    else:
+      buffer = ReplayBuffer(buffer_size)
+    replay_buffers[name] = buffer
+  return replay_buffers
+
+
+def _warmstart_sources(replay_warmstart, head_names, replay_names, max_transitions):
+  """Columns to pre-fill each replay buffer with, keyed by replay buffer name."""
+  if chunk_files(replay_warmstart):
+    columns = load_columns(replay_warmstart, max_transitions)
+    # Recorded actions hold one column per head
+    head_actions = columns["action"].reshape(len(columns["action"]), -1)
+    return dict((replay_name, dict(columns, action=head_actions[:, i]))
+                for i, replay_name in enumerate(replay_names))
+  sources = replay_columns(replay_warmstart, max_transitions)
+  # Keep the screens shared between the buffers, as in live collection
+  for replay_name in replay_names[1:]:
+    for key in ("obs_t", "obs_tp1"):
+      sources[replay_name][key] = sources[replay_names[0]][key]
+  return sources
+
+
+def learn(env,
+          q_func,
+          encoder,
+          decoder,
+          reward_shaper=None,
+          adapter=None,
+          lr=5e-4,
+          max_timesteps=100000,
+          buffer_size=50000,
+          exploration_fraction=0.1,
+          exploration_final_eps=0.02,
+          train_freq=1,
+          batch_size=32,
+          print_freq=1,
+          checkpoint_freq=None,
+          learning_starts=1000,
+          gamma=1.0,
+          target_network_update_freq=500,
+          prioritized_replay=False,
+          prioritized_replay_alpha=0.6,
+          prioritized_replay_beta0=0.4,
+          prioritized_replay_beta_iters=None,
+          prioritized_replay_eps=1e-6,
+          num_cpu=16,
+          param_noise=False,
+          param_noise_threshold=0.05,
+          callback=None,
+          profile=False,
+          profile_freq=1000,
+          replay_memory_budget=None,
+          state_dir=None,
+          snapshot_freq=50000,
+          replay_backend="memory",
+          replay_mmap_dir=None,
+          record_dir=None,
+          replay_warmstart=None,
+          replay_save_period=None,
+          replay_dir="replays/",
+          async_metrics=True,
+          score_name="score"):
+  """Train one deepq model per action head of `decoder`.
+
+  Parameters
+  -------
+  env: pysc2.env.SC2Env
+      environment to train on
+  q_func: (tf.Variable, int, str, bool) -> tf.Variable
+      the model of every head, see deepq.build_train
+  encoder: sc2rl.components.ObservationEncoder
+      builds the screen the heads see from a TimeStep
+  decoder: sc2rl.components.ActionDecoder
+      names the heads and turns their actions into a FunctionCall
+  reward_shaper: sc2rl.components.RewardShaper
+      training reward of a step; the env reward if None
+  adapter: sc2rl.components.EnvAdapter
+      starts episodes and executes FunctionCalls; EnvAdapter() if None
+  lr: float
+      learning rate for adam optimizer
+  max_timesteps: int
+      number of env steps to optimizer for
+  buffer_size: int
+      size of every head's replay buffer
+  exploration_fraction: float
+      fraction of entire training period over which the exploration rate is annealed
+  exploration_final_eps: float
+      final value of random action probability
+  train_freq: int
+      update the model every `train_freq` steps.
+  batch_size: int
+      size of a batched sampled from replay buffer for training
+  print_freq: int
+      how often to print out training progress
+      set to None to disable printing
+  checkpoint_freq: int
+      how often to save the model when the mean reward improved, so that the
+      best version is restored at the end of the training. None disables it.
+  learning_starts: int
+      how many steps of the model to collect transitions for before learning starts
+  gamma: float
+      discount factor
+  target_network_update_freq: int
+      update the target network every `target_network_update_freq` steps.
+  prioritized_replay: True
+      if True prioritized replay buffer will be used.
+  prioritized_replay_alpha: float
+      alpha parameter for prioritized replay buffer
+  prioritized_replay_beta0: float
+      initial value of beta for prioritized replay buffer
+  prioritized_replay_beta_iters: int
+      number of iterations over which beta will be annealed from initial value
+      to 1.0. If set to None equals to max_timesteps.
+  prioritized_replay_eps: float
+      epsilon to add to the TD errors when updating priorities.
+  num_cpu: int
+      number of cpus to use for training
+  param_noise: bool
+      explore with parameter space noise instead of epsilon-greedy
+  param_noise_threshold: float
+      see baselines.deepq.build_train
+  callback: (locals, globals) -> None
+      function called at every steps with state of the algorithm.
+      If callback returns true training stops.
+  profile: bool
+      if True, time every phase of a step and record the percentiles on the logger.
+  profile_freq: int
+      number of env steps summarized by each profiler rollup.
+  replay_memory_budget: int
+      if set, bytes all replay buffers may use together; buffer_size is then
+      derived from it instead of taken as given.
+  state_dir: str
+      if set, a snapshot of the run is kept there and an existing one is
+      resumed from instead of starting over, see sc2rl.training_state.
+  snapshot_freq: int
+      minimum number of steps between snapshots, taken at episode ends.
+  replay_backend: str
+      "memory" or "mmap" (screens in a memory-mapped file, see sc2rl.mmap_replay).
+  replay_mmap_dir: str
+      directory of the "mmap" backend's frame file (system temp dir if None).
+  record_dir: str
+      if set, every (screen, actions, reward, next_screen, done) transition is
+      also recorded to this offline dataset (see sc2rl.dataset).
+  replay_warmstart: str
+      recorded dataset directory or state_dir of an earlier run to pre-fill
+      the replay buffers from. Learning then starts right away. Ignored when
+      resuming from state_dir.
+  replay_save_period: int
+      if set, the StarCraft II replay of every `replay_save_period`-th
+      episode is saved to `replay_dir` and indexed there by episode, reward
+      and snapshot step (see sc2rl.replay_capture).
+  replay_dir: str
+      directory of the saved StarCraft II replays.
+  async_metrics: bool
+      if True, metrics are buffered and written to the baselines logger on a
+      background thread (see sc2rl.metrics); callbacks should record through
+      the `metrics` local then. If False they are written synchronously.
+  score_name: str
+      what the env reward counts ("beacon", "mineral", ...), used in the logs.
+
+  Returns
+  -------
+  acts: dict
+      head name -> ActWrapper over its act function.
+  """
+  if reward_shaper is None:
+    reward_shaper = RewardShaper()
+  if adapter is None:
+    adapter = EnvAdapter()
+  metrics = MetricsSink() if async_metrics else logger
+  head_names = [name for name, _ in decoder.heads]
+  head_actions = [num_actions for _, num_actions in decoder.heads]
+  replay_names = ["replay_" + name for name in head_names]
+
+  sess = U.make_session(num_cpu)
+  sess.__enter__()
+
+  # A local variable so it is not part of saved checkpoints; population based
+  # training changes it from the callback with lr_var.load(value, sess)
+  lr_var = tf.Variable(lr, trainable=False, name="lr",
+                       collections=[tf.GraphKeys.LOCAL_VARIABLES])
+
+  def make_obs_ph(name):
+    return U.BatchInput(encoder.shape, name=name)
+
+  acts, trains, update_targets = {}, {}, {}
+  for name, num_actions in decoder.heads:
+    acts[name], trains[name], update_targets[name], _ = deepq.build_train(
+      make_obs_ph=make_obs_ph,
+      q_func=q_func,
+      num_actions=num_actions,
+      optimizer=tf.train.AdamOptimizer(learning_rate=lr_var),
+      gamma=gamma,
+      grad_norm_clipping=10,
+      param_noise=param_noise,
+      scope="deep_" + name)
+
+  # Create the replay buffers
+  if replay_backend not in ("memory", "mmap"):
+    raise ValueError("unknown replay_backend {}".format(replay_backend))
+  if replay_memory_budget is not None and replay_backend == "memory":
+    # All buffers store the same screens
+    transition_nbytes = estimate_transition_nbytes(
+      np.zeros(encoder.shape, dtype=encoder.dtype), num_buffers=len(head_names))
+    buffer_size = buffer_size_for_budget(replay_memory_budget, transition_nbytes,
+                                         num_buffers=len(head_names),
+                                         prioritized=prioritized_replay)
+    metrics.log("Replay buffer size {} fits the {} memory budget ({} per step)".format(
+      buffer_size, format_bytes(replay_memory_budget), format_bytes(transition_nbytes)))
+  replay_buffers = _make_replay_buffers(replay_names, buffer_size, prioritized_replay,
+                                        prioritized_replay_alpha, replay_backend, replay_mmap_dir)
+
+  beta_schedule = None
+  if prioritized_replay:
+    if prioritized_replay_beta_iters is None:
+      prioritized_replay_beta_iters = max_timesteps
+    # All heads anneal beta identically, so one precomputed table serves them
+    beta_schedule = ScheduleTable(LinearSchedule(prioritized_replay_beta_iters,
+                                                 initial_p=prioritized_replay_beta0,
+                                                 final_p=1.0),
+                                  max_timesteps)
+  # Create the schedule for exploration starting from 1.
+  exploration = ScheduleTable(LinearSchedule(schedule_timesteps=int(exploration_fraction * max_timesteps),
+                                             initial_p=1.0,
+                                             final_p=exploration_final_eps),
+                              max_timesteps)
+  # Epsilon-greedy of all heads is drawn at once outside of the act graphs
+  explorer = EpsilonGreedy(head_actions)
+
+  U.initialize()
+  sess.run(lr_var.initializer)
+  for name in head_names:
+    update_targets[name]()
+
+  # Episode metrics, updated once per finished episode
+  episode_stats = EpisodeStats(
+    ["reward", "score", "score_per_time", "time_per_score"], window=100)
+  episode_reward = 0.0
+  episode_score = 0.0
+  episode_score_time = 0.0
+
+  num_episodes = 0
+  mean_100ep_reward = None
+  saved_mean_reward = None
+
+  profiler = PhaseProfiler(enabled=profile, rollup_freq=profile_freq, sink=metrics)
+  recorder = TransitionRecorder(record_dir) if record_dir is not None else None
+  replay_capture = None
+  if replay_save_period is not None:
+    replay_capture = ReplayCapture(replay_dir, replay_save_period,
+                                   map_name=getattr(env, "_map_name", getattr(env, "map_name", "episode")),
+                                   sink=metrics)
+
+  try:
+    # Every replay buffer gets one add per executed step, so one counter serves them all
+    num_transitions = 0
+    num_train_steps = 0
+    t_start = 0
+    last_snapshot = 0
+    training_state = None
+    if state_dir is not None:
+      training_state = TrainingState(state_dir)
+      if training_state.exists():
+        t_start, num_transitions, counters = training_state.load(sess, replay_buffers)
+        episode_stats = counters["episode_stats"]
+        num_episodes = episode_stats.num_episodes
+        if num_episodes:
+          mean_100ep_reward = round(episode_stats["reward"].mean(), 1)
+        saved_mean_reward = counters["saved_mean_reward"]
+        lr_var.load(counters["lr"], sess)
+        last_snapshot = t_start
+        metrics.log("Resumed from {} at step {} ({} episodes)".format(
+          state_dir, t_start, num_episodes))
+
+    if replay_warmstart is not None and t_start == 0:
+      sources = _warmstart_sources(replay_warmstart, head_names, replay_names, buffer_size)
+      for replay_name in replay_names:
+        source = sources[replay_name]
+        num_warm = bulk_add(replay_buffers[replay_name], source["obs_t"], source["action"],
+                            source["reward"], source["obs_tp1"], source["done"])
+      num_transitions += num_warm
+      if num_warm >= batch_size:
+        learning_starts = 0
+      metrics.log("Warm-started replay with {} transitions from {}".format(num_warm, replay_warmstart))
+
+    obs = adapter.reset(env)
+    for component in (encoder, decoder, reward_shaper):
+      component.reset(obs[0])
+    screen = encoder.encode(obs[0])
+
+    reset = True
+    with tempfile.TemporaryDirectory() as td:
+      model_saved = False
+      model_file = os.path.join(td, "model")
+
+      score_time_start = t_start
+      # Throughput since the previous log dump
+      last_dump_time = time.perf_counter()
+      last_dump_t = t_start
+      last_dump_train_steps = 0
+
+      for t in range(t_start, max_timesteps):
+        if callback is not None:
+          if callback(locals(), globals()):
+            break
+        # Take action and update exploration to the newest value
+        kwargs = {}
+        eps = exploration.value(t)
+        if not param_noise:
+          update_eps = eps
+        else:
+          update_eps = 0.
+          kwargs['reset'] = reset
+          kwargs['update_param_noise_scale'] = True
+
+        if not param_noise:
+          greedy = []
+          for name in head_names:
+            with profiler.phase("act_" + name):
+              greedy.append(acts[name](np.array(screen)[None], stochastic=False)[0])
+          actions = explorer.select([greedy], update_eps)[0]
+        else:
+          actions = []
+          for name, num_actions in decoder.heads:
+            if param_noise_threshold >= 0.:
+              update_param_noise_threshold = param_noise_threshold
+            else:
+              # Compute the threshold such that the KL divergence between perturbed and non-perturbed
+              # policy is comparable to eps-greedy exploration with eps = exploration.value(t).
+              # See Appendix C.1 in Parameter Space Noise for Exploration, Plappert et al., 2017
+              # for detailed explanation.
+              update_param_noise_threshold = -np.log(1. - eps + eps / float(num_actions))
+            with profiler.phase("act_" + name):
+              actions.append(acts[name](np.array(screen)[None], update_eps=update_eps,
+                                        update_param_noise_threshold=update_param_noise_threshold,
+                                        **kwargs)[0])
+        reset = False
+
+        with profiler.phase("env_step"):
+          # The adapter re-selects the army first if needed (an extra env step);
+          # when the actions still could not run they are not stored
+          obs, executed = adapter.step(env, obs[0], decoder.decode(actions, obs[0]))
+
+        with profiler.phase("preprocess"):
+          rew = reward_shaper.shape(obs[0], actions)
+          new_screen = encoder.encode(obs[0])
+
+        score_time = 0
+        if obs[0].reward != 0:
+          score_time = t - score_time_start
+          score_time_start = t
+
+        done = obs[0].step_type == environment.StepType.LAST
+
+        if executed:
+          with profiler.phase("replay_add"):
+            for replay_name, action in zip(replay_names, actions):
+              replay_buffers[replay_name].add(screen, action, rew, new_screen, float(done))
+            if recorder is not None:
+              recorder.add(screen, tuple(actions), rew, new_screen, float(done))
+          num_transitions += 1
+
+        screen = new_screen
+
+        episode_reward += rew
+        episode_score += obs[0].reward
+        episode_score_time += score_time
+
+        if done:
+          if replay_capture is not None and replay_capture.should_save(num_episodes):
+            # Only fetching the replay from the game has to happen before the
+            # reset; it is written to disk on the capture's own thread
+            with profiler.phase("replay_capture"):
+              replay_capture.capture(env, num_episodes, episode_reward, t + 1,
+                                     checkpoint=last_snapshot if training_state is not None else None)
+
+          with profiler.phase("env_reset"):
+            obs = adapter.reset(env)
+          for component in (encoder, decoder, reward_shaper):
+            component.reset(obs[0])
+          screen = encoder.encode(obs[0])
+
+          if episode_score_time != 0.0:
+            score_per_time = episode_score / episode_score_time
+          else:
+            score_per_time = 0.0
+          if episode_score_time != 0.0 and episode_score != 0.0:
+            time_per_score = episode_score_time / episode_score
+          else:
+            time_per_score = np.nan
+
+          episode_stats.end_episode(reward=episode_reward,
+                                    score=episode_score,
+                                    score_per_time=score_per_time,
+                                    time_per_score=time_per_score)
+          episode_reward = 0.0
+          episode_score = 0.0
+          episode_score_time = 0.0
+          score_time_start = t
+
+          num_episodes = episode_stats.num_episodes
+          mean_100ep_reward = round(episode_stats["reward"].mean(), 1)
+          mean_100ep_score = round(episode_stats["score"].mean(), 1)
+          mean_100ep_score_per_time = episode_stats["score_per_time"].mean()
+          mean_100ep_time_per_score = episode_stats["time_per_score"].nanmean()
+
+          if training_state is not None and t + 1 - last_snapshot >= snapshot_freq:
+            with profiler.phase("snapshot"):
+              training_state.save(sess, t + 1, {
+                "episode_stats": episode_stats,
+                "saved_mean_reward": saved_mean_reward,
+                "lr": sess.run(lr_var),
+              }, replay_buffers, num_transitions)
+            last_snapshot = t + 1
+
+          reset = True
+
+        if t > learning_starts and t % train_freq == 0:
+          # Minimize the error in Bellman's equation on a batch sampled from replay buffer.
+          for replay_name, name in zip(replay_names, head_names):
+            replay_buffer = replay_buffers[replay_name]
+            with profiler.phase("replay_sample"):
+              if prioritized_replay:
+                experience = replay_buffer.sample(batch_size, beta=beta_schedule.value(t))
+                (obses_t, actions_t, rewards, obses_tp1, dones, weights, batch_idxes) = experience
+              else:
+                obses_t, actions_t, rewards, obses_tp1, dones = replay_buffer.sample(batch_size)
+                weights, batch_idxes = np.ones_like(rewards), None
+
+            with profiler.phase("train_" + name):
+              td_errors = trains[name](obses_t, actions_t, rewards, obses_tp1, dones, weights)
+
+            if prioritized_replay:
+              with profiler.phase("update_priorities"):
+                new_priorities = np.abs(td_errors) + prioritized_replay_eps
+                replay_buffer.update_priorities(batch_idxes, new_priorities)
+          num_train_steps += 1
+
+        if t > learning_starts and t % target_network_update_freq == 0:
+          # Update target network periodically.
+          with profiler.phase("update_target"):
+            for name in head_names:
+              update_targets[name]()
+
+        profiler.step(t)
+
+        if done and print_freq is not None and num_episodes % print_freq == 0:
+          now = time.perf_counter()
+          dump_seconds = max(now - last_dump_time, 1e-12)
+          metrics.record_tabular("steps", t)
+          metrics.record_tabular("episodes", num_episodes)
+          metrics.record_tabular("mean 100 episode reward", mean_100ep_reward)
+          metrics.record_tabular("mean 100 episode %s" % score_name, mean_100ep_score)
+          metrics.record_tabular("% time spent exploring", int(100 * eps))
+          metrics.record_tabular("mean %s per step" % score_name, mean_100ep_score_per_time)
+          metrics.record_tabular("mean time between %s" % score_name, mean_100ep_time_per_score)
+          metrics.record_tabular("env steps per sec", (t + 1 - last_dump_t) / dump_seconds)
+          metrics.record_tabular("train steps per sec",
+                                 (num_train_steps - last_dump_train_steps) / dump_seconds)
+          # Each costs an extra step_mul of game time, see sc2rl.army_select
+          metrics.record_tabular("steps with reselect", adapter.num_reselects)
+          metrics.record_tabular("replay fill",
+                                 len(replay_buffers[replay_names[0]]) / float(buffer_size))
+          # The other buffers share the observation arrays of the first one
+          record_footprint("replay", replay_footprint(replay_buffers[replay_names[0]]), sink=metrics)
+          metrics.dump_tabular()
+          last_dump_time = now
+          last_dump_t = t + 1
+          last_dump_train_steps = num_train_steps
+
+        if (checkpoint_freq is not None and t > learning_starts and mean_100ep_reward is not None and
+                num_episodes > 100 and t % checkpoint_freq == 0):
+          if saved_mean_reward is None or mean_100ep_reward > saved_mean_reward:
+            if print_freq is not None:
+              metrics.log("Saving model due to mean reward increase: {} -> {}".format(
+                saved_mean_reward, mean_100ep_reward))
+            U.save_state(model_file)
+            model_saved = True
+            saved_mean_reward = mean_100ep_reward
+      if model_saved:
+        if print_freq is not None:
+          metrics.log("Restored model with mean reward: {}".format(saved_mean_reward))
+        U.load_state(model_file)
+  finally:
+    # Write what the background threads still hold even if training failed
+    if recorder is not None:
+      recorder.close()
+    if replay_capture is not None:
+      replay_capture.close()
+    if async_metrics:
+      metrics.close()
+
+  return dict((name, ActWrapper(acts[name])) for name in head_names)
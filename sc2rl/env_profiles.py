@@ -0,0 +1,107 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Named SC2Env configurations, so performance-relevant settings are explicit.
+
+A profile says how the env is run (rendering, replays, minimap size); the
+map settings say how big the screen and how long an agent step is for
+each map. `make_env(map_name, profile)` combines the two.
+
+Rendering costs the pygame renderer a frame per agent step, and every
+feature layer is rendered at its full size by the game, so "train" turns
+off visualization and shrinks the minimap, which none of the learners
+read, to `_TRAIN_MINIMAP_DIM`.
+"""
+
+import collections
+
+_TRAIN_MINIMAP_DIM = 8
+
+MapSettings = collections.namedtuple("MapSettings", ["screen_dim", "step_mul"])
+
+# Smallest screen the learners of each map work with, and game steps per
+# agent step. step_mul is 8 on all three maps on purpose; it was not
+# measured per map. It is the value every learner's exploration schedule,
+# gamma and max_timesteps were tuned at, and the SC2LE paper's setting
+# (about 1/3 s of game time at "faster" speed). A larger step_mul raises
+# steps/sec (see benchmark.py --only=env_profiles) but changes the control
+# rate, so retune it per map only together with training runs.
+MAP_SETTINGS = {
+  "MoveToBeacon": MapSettings(screen_dim=16, step_mul=8),
+  "CollectMineralShards": MapSettings(screen_dim=32, step_mul=8),
+  "DefeatRoaches": MapSettings(screen_dim=32, step_mul=8),
+}
+
+Profile = collections.namedtuple("Profile", ["visualize", "minimap_dim", "replay_dir"])
+
+PROFILES = {
+  # Training throughput: no renderer, smallest minimap, no replays
+  "train": Profile(visualize=False, minimap_dim=_TRAIN_MINIMAP_DIM, replay_dir=None),
+  # Watching an agent: renderer on, full minimap, replays kept
+  "watch": Profile(visualize=True, minimap_dim=None, replay_dir="replays/"),
+}
+
+
+def env_kwargs(map_name, profile="train", screen_dim=None, step_mul=None):
+  """SC2Env keyword arguments of `map_name` under `profile`.
+
+  Parameters
+  ----------
+  map_name: str
+      pysc2 map name; maps without MAP_SETTINGS need screen_dim and step_mul
+  profile: str
+      key of PROFILES
+  screen_dim: int
+      screen size in pixels, the map's setting if None
+  step_mul: int
+      game steps per agent step, the map's setting if None
+  """
+  if profile not in PROFILES:
+    raise ValueError("unknown env profile {}, expected one of {}".format(
+      profile, sorted(PROFILES)))
+  settings = PROFILES[profile]
+  defaults = MAP_SETTINGS.get(map_name)
+  if defaults is None and (screen_dim is None or step_mul is None):
+    raise ValueError("no MAP_SETTINGS for {}, give screen_dim and step_mul".format(map_name))
+  screen_dim = screen_dim or defaults.screen_dim
+  step_mul = step_mul or defaults.step_mul
+  minimap_dim = min(settings.minimap_dim or screen_dim, screen_dim)
+  kwargs = {
+    "map_name": map_name,
+    "step_mul": step_mul,
+    "visualize": settings.visualize,
+    "screen_size_px": (screen_dim, screen_dim),
+    "minimap_size_px": (minimap_dim, minimap_dim),
+  }
+  if settings.replay_dir is not None:
+    kwargs["replay_dir"] = settings.replay_dir
+  return kwargs
+
+
+def make_env(map_name, profile="train", screen_dim=None, step_mul=None, **kwargs):
+  """pysc2 SC2Env of `map_name` under `profile`; extra kwargs go to SC2Env."""
+  from pysc2.env import sc2_env
+  env_args = env_kwargs(map_name, profile, screen_dim, step_mul)
+  env_args.update(kwargs)
+  return sc2_env.SC2Env(**env_args)
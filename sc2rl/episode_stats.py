@@ -0,0 +1,143 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+from collections import deque
+
+
+class RollingStats(object):
+  """Mean, nanmean, min and max over the last `window` values.
+
+  Every statistic is maintained incrementally, so `append` and all the
+  queries are O(1) (amortized), regardless of how long training runs.
+  NaN values are stored and make `mean` return NaN, just like `np.mean`;
+  `nanmean`, `min` and `max` skip them.
+  """
+
+  def __init__(self, window=100):
+    self._window = window
+    self._values = np.zeros(window, dtype=np.float64)
+    self._next_idx = 0
+    self._size = 0
+    self._num_added = 0
+    self._finite_sum = 0.0
+    self._finite_count = 0
+    # Monotonic queues of (insertion number, value) for the sliding min/max.
+    self._min_queue = deque()
+    self._max_queue = deque()
+
+  def __len__(self):
+    return self._size
+
+  @property
+  def window(self):
+    return self._window
+
+  def append(self, value):
+    value = float(value)
+    if self._size == self._window:
+      self._remove(self._values[self._next_idx])
+    else:
+      self._size += 1
+    self._values[self._next_idx] = value
+    self._next_idx = (self._next_idx + 1) % self._window
+    self._num_added += 1
+
+    if not np.isnan(value):
+      self._finite_sum += value
+      self._finite_count += 1
+      while self._min_queue and self._min_queue[-1][1] >= value:
+        self._min_queue.pop()
+      self._min_queue.append((self._num_added, value))
+      while self._max_queue and self._max_queue[-1][1] <= value:
+        self._max_queue.pop()
+      self._max_queue.append((self._num_added, value))
+
+    oldest = self._num_added - self._size
+    while self._min_queue and self._min_queue[0][0] <= oldest:
+      self._min_queue.popleft()
+    while self._max_queue and self._max_queue[0][0] <= oldest:
+      self._max_queue.popleft()
+
+    # Running sums drift when values are subtracted again; resync once per
+    # window so the error stays bounded at an amortized O(1) cost.
+    if self._num_added % self._window == 0:
+      finite = self._values[~np.isnan(self._values[:self._size])]
+      self._finite_sum = float(finite.sum())
+
+  def _remove(self, value):
+    if not np.isnan(value):
+      self._finite_sum -= value
+      self._finite_count -= 1
+
+  def mean(self):
+    if self._size == 0 or self._finite_count != self._size:
+      return np.nan
+    return self._finite_sum / self._size
+
+  def nanmean(self):
+    if self._finite_count == 0:
+      return np.nan
+    return self._finite_sum / self._finite_count
+
+  def min(self):
+    return self._min_queue[0][1] if self._min_queue else np.nan
+
+  def max(self):
+    return self._max_queue[0][1] if self._max_queue else np.nan
+
+  def values(self):
+    """Window contents, oldest first (makes a copy; not for the hot loop)."""
+    if self._size < self._window:
+      return self._values[:self._size].copy()
+    return np.roll(self._values, -self._next_idx)
+
+
+class EpisodeStats(object):
+  """Named `RollingStats` that are all updated once per finished episode.
+
+  Example
+  -------
+  stats = EpisodeStats(["reward", "beacons"])
+  stats.end_episode(reward=12.0, beacons=3)
+  stats["reward"].mean()
+  """
+
+  def __init__(self, keys, window=100):
+    self._stats = dict((key, RollingStats(window)) for key in keys)
+    self.num_episodes = 0
+
+  def __getitem__(self, key):
+    return self._stats[key]
+
+  def __contains__(self, key):
+    return key in self._stats
+
+  def keys(self):
+    return self._stats.keys()
+
+  def end_episode(self, **values):
+    for key, value in values.items():
+      self._stats[key].append(value)
+    self.num_episodes += 1
@@ -0,0 +1,210 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Greedy evaluation of saved x/y ActWrapper checkpoints.
+
+Each checkpoint is rolled out without exploration on a ShmVecEnv, with the
+screens of all envs going through one batched act call per head and step.
+Several checkpoints are evaluated at once in separate processes, each with
+its own TF session and env pool, so a folder of checkpoints keeps every
+core busy.
+"""
+
+import os
+import glob
+import zipfile
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+from sc2rl.preprocess import beacon_screen
+from sc2rl.scripted import move_calls
+from sc2rl.shm_vec_env import ShmVecEnv, player_relative_spec
+
+
+def find_checkpoints(directory, x_prefix="mineral_x_", y_prefix="mineral_y_"):
+  """(tag, x_path, y_path) of every x checkpoint in `directory` with a matching y one.
+
+  deepq_callback names them <prefix><mean_100ep_reward>.pkl; tags are the
+  part after the prefix and results are sorted by it.
+  """
+  checkpoints = []
+  for x_path in glob.glob(os.path.join(directory, x_prefix + "*.pkl")):
+    tag = os.path.basename(x_path)[len(x_prefix):-len(".pkl")]
+    y_path = os.path.join(directory, y_prefix + tag + ".pkl")
+    if os.path.exists(y_path):
+      checkpoints.append((tag, x_path, y_path))
+
+  def sort_key(checkpoint):
+    try:
+      return (0, float(checkpoint[0]), "")
+    except ValueError:
+      return (1, 0., checkpoint[0])
+  return sorted(checkpoints, key=sort_key)
+
+
+def restore_scope(sess, path, scope):
+  """Restore the `scope` variables of `sess` from an ActWrapper.save pickle."""
+  import dill
+  import tensorflow as tf
+
+  with open(path, "rb") as f:
+    model_data = dill.load(f)
+  with tempfile.TemporaryDirectory() as td:
+    arc_path = os.path.join(td, "packed.zip")
+    with open(arc_path, "wb") as f:
+      f.write(model_data)
+    zipfile.ZipFile(arc_path, 'r', zipfile.ZIP_DEFLATED).extractall(td)
+    saver = tf.train.Saver(tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope=scope + "/"))
+    saver.restore(sess, os.path.join(td, "model"))
+
+
+def mean_ci(values, z=1.96):
+  """Mean and normal-approximation confidence half-width, ignoring NaNs."""
+  values = np.asarray(values, dtype=np.float64)
+  values = values[~np.isnan(values)]
+  if not len(values):
+    return np.nan, np.nan
+  if len(values) == 1:
+    return float(values[0]), np.nan
+  return float(values.mean()), float(z * values.std(ddof=1) / np.sqrt(len(values)))
+
+
+def rollout(vec_env, act_x, act_y, num_episodes):
+  """Greedy episodes of an x/y policy on every env of `vec_env`.
+
+  Returns
+  -------
+  rewards, beacon_times: list of float
+      per finished episode: the summed env reward and the mean number of
+      steps per beacon (NaN without beacons), as logged by the omni learner.
+  """
+  num_envs = vec_env.num_envs
+  episode_rewards = np.zeros(num_envs)
+  episode_steps = np.zeros(num_envs)
+  rewards = []
+  beacon_times = []
+  obs = vec_env.reset()
+  while len(rewards) < num_episodes:
+    screens = beacon_screen(obs["player_relative"])
+    targets = np.stack([act_x(screens, stochastic=False),
+                        act_y(screens, stochastic=False)], axis=1)
+    obs, step_rewards, dones = vec_env.step(move_calls(targets))
+    episode_rewards += step_rewards
+    episode_steps += 1
+    for i in np.flatnonzero(dones):
+      rewards.append(episode_rewards[i])
+      beacon_times.append(episode_steps[i] / episode_rewards[i] if episode_rewards[i] > 0 else np.nan)
+      episode_rewards[i] = 0.
+      episode_steps[i] = 0
+  return rewards[:num_episodes], beacon_times[:num_episodes]
+
+
+def evaluate_checkpoint(x_path, y_path, env_fn, make_obs_ph, q_func, num_actions,
+                        screen_dim, num_envs=4, num_episodes=100, num_cpu=1):
+  """Evaluate one checkpoint pair; returns a dict of summary statistics."""
+  # Imported here so that find_checkpoints does not pay for TensorFlow
+  import tensorflow as tf
+  import baselines.common.tf_util as U
+  from baselines import deepq
+
+  with tf.Graph().as_default():
+    sess = U.make_session(num_cpu=num_cpu)
+    with sess.as_default():
+      act_x = deepq.build_act(make_obs_ph, q_func, num_actions, scope="deep_x")
+      act_y = deepq.build_act(make_obs_ph, q_func, num_actions, scope="deep_y")
+      restore_scope(sess, x_path, "deep_x")
+      restore_scope(sess, y_path, "deep_y")
+      with ShmVecEnv([env_fn] * num_envs, player_relative_spec(screen_dim)) as vec_env:
+        rewards, beacon_times = rollout(vec_env, act_x, act_y, num_episodes)
+    sess.close()
+  reward_mean, reward_ci = mean_ci(rewards)
+  beacon_time_mean, beacon_time_ci = mean_ci(beacon_times)
+  return {
+    "episodes": len(rewards),
+    "reward_mean": reward_mean,
+    "reward_ci95": reward_ci,
+    "beacon_time_mean": beacon_time_mean,
+    "beacon_time_ci95": beacon_time_ci,
+  }
+
+
+def _evaluator(tasks, results, kwargs):
+  while True:
+    task = tasks.get()
+    if task is None:
+      break
+    tag, x_path, y_path = task
+    try:
+      result = evaluate_checkpoint(x_path, y_path, **kwargs)
+    except Exception as e:
+      result = {"error": repr(e)}
+    result.update(checkpoint=tag, x_path=x_path, y_path=y_path)
+    results.put(result)
+
+
+def evaluate_checkpoints(checkpoints, max_parallel=None, **kwargs):
+  """Evaluate (tag, x_path, y_path) checkpoints, several at a time.
+
+  Parameters
+  ----------
+  checkpoints: list
+      as returned by find_checkpoints
+  max_parallel: int
+      checkpoints evaluated at once; by default enough to give every core
+      one env worker or evaluator
+  kwargs:
+      passed to evaluate_checkpoint (env_fn, make_obs_ph, q_func, ...)
+
+  Yields
+  ------
+  result: dict
+      evaluate_checkpoint's statistics plus checkpoint/x_path/y_path, in
+      order of completion; failed evaluations carry an "error" instead.
+  """
+  num_envs = kwargs.get("num_envs", 4)
+  if max_parallel is None:
+    max_parallel = max(1, multiprocessing.cpu_count() // (num_envs + 1))
+  max_parallel = min(max_parallel, len(checkpoints))
+  # Evaluators fork their own env workers, so they cannot be daemonic
+  ctx = multiprocessing.get_context("fork")
+  tasks = ctx.Queue()
+  results = ctx.Queue()
+  for checkpoint in checkpoints:
+    tasks.put(checkpoint)
+  processes = []
+  for _ in range(max_parallel):
+    tasks.put(None)
+    process = ctx.Process(target=_evaluator, args=(tasks, results, kwargs))
+    process.start()
+    processes.append(process)
+  try:
+    for _ in checkpoints:
+      yield results.get()
+  finally:
+    for process in processes:
+      process.join(timeout=1)
+      if process.is_alive():
+        process.terminate()
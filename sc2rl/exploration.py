@@ -0,0 +1,108 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+
+from baselines.common.schedules import LinearSchedule
+
+
+class ScheduleTable(object):
+  """A baselines schedule evaluated once for every step in [0, num_steps).
+
+  `value(t)` is then a single array lookup, and `values(ts)` evaluates many
+  steps at once. Steps past the end return the last value, which is where
+  every baselines schedule ends up anyway.
+  """
+
+  def __init__(self, schedule, num_steps):
+    num_steps = max(int(num_steps), 1)
+    if isinstance(schedule, LinearSchedule):
+      ts = np.arange(num_steps, dtype=np.float64)
+      fraction = np.minimum(ts / max(schedule.schedule_timesteps, 1), 1.0)
+      self._values = schedule.initial_p + fraction * (schedule.final_p - schedule.initial_p)
+    else:
+      self._values = np.array([schedule.value(t) for t in range(num_steps)], dtype=np.float64)
+    self._last = len(self._values) - 1
+
+  def __len__(self):
+    return len(self._values)
+
+  def value(self, t):
+    return self._values[t if t < self._last else self._last]
+
+  def values(self, ts):
+    return self._values[np.minimum(ts, self._last)]
+
+  def scale(self, factor, start=0, low=0., high=1.):
+    """Multiply the values from step `start` on by `factor`, clipped to [low, high].
+
+    Used to perturb a member's exploration in population based training.
+    """
+    self._values[start:] = np.clip(self._values[start:] * factor, low, high)
+
+
+def apex_epsilons(num_envs, base_eps=0.4, alpha=7.):
+  """Per-env epsilons eps_i = base_eps ** (1 + alpha * i / (N - 1)) of Ape-X (Horgan et al., 2018)."""
+  if num_envs == 1:
+    return np.array([base_eps])
+  return base_eps ** (1. + alpha * np.arange(num_envs) / (num_envs - 1.))
+
+
+class EpsilonGreedy(object):
+  """Epsilon-greedy over a batch of envs and action heads in one random draw.
+
+  Parameters
+  ----------
+  num_actions: int or list of int
+      number of actions of every head, or one entry per head
+  rng: np.random.RandomState
+      source of randomness, np.random by default
+  """
+
+  def __init__(self, num_actions, rng=None):
+    self._num_actions = np.asarray(num_actions)
+    self._rng = rng if rng is not None else np.random
+
+  def select(self, greedy_actions, eps):
+    """Replace greedy actions by uniform random ones with probability eps.
+
+    Parameters
+    ----------
+    greedy_actions: np.array
+        (num_envs, num_heads) greedy actions, e.g. act(obs, stochastic=False)
+        of every head stacked along axis 1
+    eps: float or np.array
+        one epsilon for all envs or (num_envs,) epsilons, see `apex_epsilons`
+
+    Returns
+    -------
+    actions: np.array
+        (num_envs, num_heads) actions to take
+    """
+    greedy_actions = np.asarray(greedy_actions)
+    draws = self._rng.random_sample((2,) + greedy_actions.shape)
+    eps = np.asarray(eps, dtype=np.float64).reshape(-1, 1)
+    explore = draws[0] < eps
+    random_actions = (draws[1] * self._num_actions).astype(greedy_actions.dtype)
+    return np.where(explore, random_actions, greedy_actions)
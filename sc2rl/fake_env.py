@@ -0,0 +1,152 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+
+from pysc2.env import environment
+from pysc2.lib import actions as sc2_actions
+from pysc2.lib import features
+
+_PLAYER_RELATIVE = features.SCREEN_FEATURES.player_relative.index
+_PLAYER_FRIENDLY = 1
+_PLAYER_NEUTRAL = 3  # beacon/minerals
+_PLAYER_HOSTILE = 4  # roaches
+_NO_OP = sc2_actions.FUNCTIONS.no_op.id
+_MOVE_SCREEN = sc2_actions.FUNCTIONS.Move_screen.id
+_ATTACK_SCREEN = sc2_actions.FUNCTIONS.Attack_screen.id
+_SELECT_ARMY = sc2_actions.FUNCTIONS.select_army.id
+
+_NUM_SCREEN_LAYERS = len(features.SCREEN_FEATURES)
+_NUM_MINIMAP_LAYERS = len(features.MINIMAP_FEATURES)
+
+
+class FakeSC2Env(object):
+  """Stand-in for `pysc2.env.sc2_env.SC2Env` that needs no StarCraft II binary.
+
+  It plays a crude MoveToBeacon (one beacon), CollectMineralShards
+  (`num_targets` shards) or DefeatRoaches (one hostile target): a marine
+  walks `speed` pixels per step towards the last Move_screen or
+  Attack_screen target and every target it touches gives a reward of 1.
+  Observations have the same layout as the real env (a list with one
+  TimeStep whose observation holds "screen", "minimap" and
+  "available_actions"), so the learners, benchmarks and evaluation code run
+  on it unchanged. Only the dynamics are fake; use it for throughput work,
+  never to judge a policy.
+  """
+
+  def __init__(self, map_name="MoveToBeacon", screen_size_px=(64, 64),
+               minimap_size_px=(64, 64), episode_steps=240, speed=4,
+               num_targets=None, seed=None, **kwargs):
+    self.map_name = map_name
+    self._size = screen_size_px[0]
+    self._minimap_size = minimap_size_px[0]
+    self._episode_steps = episode_steps
+    self._speed = speed
+    if num_targets is None:
+      num_targets = 20 if map_name == "CollectMineralShards" else 1
+    self._num_targets = num_targets
+    self._respawn = map_name != "CollectMineralShards"
+    self._target_player = _PLAYER_HOSTILE if map_name == "DefeatRoaches" else _PLAYER_NEUTRAL
+    self._rng = np.random.RandomState(seed)
+    self._screen = np.zeros((_NUM_SCREEN_LAYERS, self._size, self._size), dtype=np.int32)
+    self._minimap = np.zeros(
+      (_NUM_MINIMAP_LAYERS, self._minimap_size, self._minimap_size), dtype=np.int32)
+    self._steps = 0
+    self._marine = np.zeros(2, dtype=np.float64)
+    self._target = None
+    self._targets = np.zeros((0, 2), dtype=np.int64)
+    self._selected = False
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def close(self):
+    pass
+
+  def save_replay(self, replay_dir):
+    return None
+
+  def reset(self):
+    self._steps = 0
+    self._selected = False
+    self._target = None
+    self._marine = self._rng.randint(0, self._size, size=2).astype(np.float64)
+    self._targets = self._rng.randint(0, self._size, size=(self._num_targets, 2))
+    return self._observe(environment.StepType.FIRST, 0)
+
+  def step(self, actions):
+    action = actions[0]
+    if action.function == _SELECT_ARMY:
+      self._selected = True
+    elif action.function in (_MOVE_SCREEN, _ATTACK_SCREEN) and self._selected:
+      self._target = np.array(action.arguments[1], dtype=np.float64)
+
+    if self._target is not None:
+      delta = self._target - self._marine
+      dist = np.sqrt((delta ** 2).sum())
+      if dist <= self._speed:
+        self._marine = self._target.copy()
+        self._target = None
+      else:
+        self._marine += delta * (self._speed / dist)
+
+    reward = 0
+    if len(self._targets):
+      hit = (np.abs(self._targets - self._marine).max(axis=1) <= 1)
+      reward = int(hit.sum())
+      if self._respawn:
+        self._targets[hit] = self._rng.randint(0, self._size, size=(reward, 2))
+      else:
+        self._targets = self._targets[~hit]
+
+    self._steps += 1
+    if self._steps >= self._episode_steps or not len(self._targets):
+      step_type = environment.StepType.LAST
+    else:
+      step_type = environment.StepType.MID
+    return self._observe(step_type, reward)
+
+  def _observe(self, step_type, reward):
+    player_relative = self._screen[_PLAYER_RELATIVE]
+    player_relative[:] = 0
+    for x, y in self._targets:
+      player_relative[y, x] = self._target_player
+    x, y = np.clip(self._marine.astype(np.int64), 0, self._size - 1)
+    player_relative[y, x] = _PLAYER_FRIENDLY
+
+    if self._selected:
+      available_actions = np.array([_NO_OP, _SELECT_ARMY, _MOVE_SCREEN, _ATTACK_SCREEN])
+    else:
+      available_actions = np.array([_NO_OP, _SELECT_ARMY])
+    observation = {
+      "screen": self._screen.copy(),
+      "minimap": self._minimap.copy(),
+      "available_actions": available_actions,
+    }
+    discount = 0. if step_type == environment.StepType.LAST else 1.
+    return [environment.TimeStep(step_type=step_type, reward=reward,
+                                 discount=discount, observation=observation)]
@@ -0,0 +1,160 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import sys
+import numpy as np
+
+from baselines import logger
+
+# Python object overhead of what a baselines replay buffer stores per slot:
+# the (obs_t, action, reward, obs_tp1, done) tuple, the list slot pointing at
+# it and the boxed action/reward/done scalars.
+_TUPLE_BYTES = sys.getsizeof((0, 0, 0, 0, 0)) + 8
+_SCALAR_BYTES = sys.getsizeof(np.int64(0)) + 2 * sys.getsizeof(0.0)
+# Sum and min segment trees of the prioritized buffer: 2 lists of
+# 2 * capacity boxed floats each (capacity is rounded up to a power of 2).
+_PRIORITY_BYTES_PER_SLOT = 2 * 2 * (8 + sys.getsizeof(0.0))
+
+
+def object_nbytes(obj, seen=None):
+  """Approximate resident bytes of arrays/scalars/tuples, counting each object once."""
+  if seen is None:
+    seen = set()
+  if id(obj) in seen:
+    return 0
+  seen.add(id(obj))
+  if isinstance(obj, np.ndarray):
+    if obj.base is None:
+      return sys.getsizeof(obj)
+    return sys.getsizeof(obj) + obj.nbytes
+  if isinstance(obj, (tuple, list)):
+    return sys.getsizeof(obj) + sum(object_nbytes(item, seen) for item in obj)
+  return sys.getsizeof(obj)
+
+
+def estimate_transition_nbytes(obs, shares_next_obs=True, num_buffers=1):
+  """Bytes one (obs, action, reward, next_obs, done) transition will take.
+
+  Parameters
+  ----------
+  obs: np.array
+      an observation as it is passed to `replay_buffer.add`
+  shares_next_obs: bool
+      True when `next_obs` of a transition is the same array object as `obs`
+      of the following one (`screen = new_screen` in the learners), so each
+      observation is only resident once.
+  num_buffers: int
+      number of replay buffers the same observation arrays are added to, like
+      the x and y buffers of the omni beacon learner. The arrays are shared,
+      only the per slot overhead is paid again.
+  """
+  obs_bytes = sys.getsizeof(obs) if obs.base is None else sys.getsizeof(obs) + obs.nbytes
+  num_obs = 1 if shares_next_obs else 2
+  return num_obs * obs_bytes + num_buffers * (_TUPLE_BYTES + _SCALAR_BYTES)
+
+
+def _priority_tree_nbytes(capacity):
+  tree_capacity = 1
+  while tree_capacity < capacity:
+    tree_capacity *= 2
+  return 2 * (sys.getsizeof([]) + 2 * tree_capacity * (8 + sys.getsizeof(0.0)))
+
+
+def replay_footprint(replay_buffer, sample_size=64, rng=np.random):
+  """Memory accounting of a baselines (Prioritized)ReplayBuffer.
+
+  Bytes per transition are measured on up to `sample_size` stored
+  transitions (including the next one of each, so shared observation arrays
+  are only counted once), which keeps this cheap on full buffers.
+
+  Returns
+  -------
+  footprint: dict
+      transitions, capacity, bytes_per_transition, resident_bytes and
+      projected_bytes (size once the buffer holds `capacity` transitions).
+  """
+  if hasattr(replay_buffer, "footprint"):
+    # Buffers that keep observations out of RAM account for themselves
+    return replay_buffer.footprint()
+
+  storage = replay_buffer._storage
+  capacity = replay_buffer._maxsize
+  size = len(storage)
+
+  bytes_per_transition = 0.
+  if size:
+    idxes = rng.randint(0, size, size=min(sample_size, size))
+    measured = []
+    for idx in idxes:
+      seen = set()
+      # Objects shared with the following transition are charged to that one.
+      if idx + 1 < size:
+        object_nbytes(storage[idx + 1], seen)
+      measured.append(object_nbytes(storage[idx], seen) + 8)
+    bytes_per_transition = float(np.mean(measured))
+
+  fixed_bytes = sys.getsizeof(storage)
+  if hasattr(replay_buffer, "_it_sum"):
+    fixed_bytes += _priority_tree_nbytes(capacity)
+
+  return {
+    "transitions": size,
+    "capacity": capacity,
+    "bytes_per_transition": bytes_per_transition,
+    "resident_bytes": fixed_bytes + bytes_per_transition * size,
+    "projected_bytes": fixed_bytes + bytes_per_transition * capacity,
+  }
+
+
+def buffer_size_for_budget(budget_bytes, transition_nbytes, num_buffers=1,
+                           prioritized=False):
+  """Largest replay capacity that keeps the buffers within `budget_bytes`.
+
+  `transition_nbytes` is the cost of one env step over all `num_buffers`
+  buffers, as returned by `estimate_transition_nbytes`.
+  """
+  per_slot = transition_nbytes
+  if prioritized:
+    # Worst case of the power of 2 rounding in the segment trees.
+    per_slot += num_buffers * 2 * _PRIORITY_BYTES_PER_SLOT
+  return max(int(budget_bytes // per_slot), 1)
+
+
+def format_bytes(num_bytes):
+  for unit in ("B", "KB", "MB", "GB"):
+    if abs(num_bytes) < 1024.:
+      return "%.1f%s" % (num_bytes, unit)
+    num_bytes /= 1024.
+  return "%.1fTB" % num_bytes
+
+
+def record_footprint(name, footprint, sink=None):
+  """Record a `replay_footprint` under `name` on `sink`, the baselines logger by default."""
+  sink = sink if sink is not None else logger
+  sink.record_tabular("%s transitions" % name, footprint["transitions"])
+  sink.record_tabular("%s bytes per transition" % name, footprint["bytes_per_transition"])
+  sink.record_tabular("%s resident MB" % name, footprint["resident_bytes"] / 2. ** 20)
+  sink.record_tabular("%s projected MB" % name, footprint["projected_bytes"] / 2. ** 20)
+  if "disk_bytes" in footprint:
+    sink.record_tabular("%s disk MB" % name, footprint["disk_bytes"] / 2. ** 20)
@@ -0,0 +1,127 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Buffered metrics with the TensorBoard/JSON/stdout writing on a background thread.
+
+`MetricsSink` has the `record_tabular`, `dump_tabular` and `log` calls of
+`baselines.logger`, so a learner can hold either one as its `metrics`:
+
+  metrics = MetricsSink() if async_metrics else logger
+
+With the sink, `record_tabular` only sets a key of the current row and
+`dump_tabular` hands the finished row to the writer thread, which replays
+it onto the baselines logger (and so onto whatever outputs `start.py`
+configured). Messages keep their order relative to the rows. While a sink
+is in use, everything on the training thread has to record through it,
+since the baselines logger is not thread safe.
+"""
+
+import sys
+import queue
+import threading
+
+from baselines import logger
+
+_LOG, _ROW, _FLUSH = range(3)
+
+
+def _has_seq_writer():
+  """Whether logger.log reaches any output of the current baselines logger."""
+  seq_writer = getattr(logger, "SeqWriter", None)
+  if seq_writer is None:
+    return True
+  return any(isinstance(fmt, seq_writer) for fmt in logger.Logger.CURRENT.output_formats)
+
+
+class MetricsSink(object):
+  """Collects rows of scalars in memory and writes them on a background thread.
+
+  Parameters
+  ----------
+  max_pending: int
+      rows and messages waiting for the writer. When it falls this far
+      behind, further rows are dropped (and counted in `num_dropped`)
+      instead of stalling training.
+  echo: bool
+      print messages to stdout when no output of the baselines logger
+      takes messages (e.g. TensorBoard only), so they are not lost.
+  """
+
+  def __init__(self, max_pending=1000, echo=True):
+    self.echo = echo
+    self.num_dropped = 0
+    self._row = {}
+    self._queue = queue.Queue(maxsize=max_pending)
+    self._thread = threading.Thread(target=self._write_loop, name="metrics-writer")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def record_tabular(self, key, value):
+    self._row[key] = value
+
+  def dump_tabular(self):
+    row, self._row = self._row, {}
+    if not row:
+      return
+    try:
+      self._queue.put((_ROW, row), block=False)
+    except queue.Full:
+      self.num_dropped += 1
+
+  def log(self, *args):
+    # Messages are rare and expected to show up, so they wait for room
+    self._queue.put((_LOG, args))
+
+  def flush(self):
+    """Block until everything recorded so far is written."""
+    done = threading.Event()
+    self._queue.put((_FLUSH, done))
+    done.wait()
+
+  def close(self):
+    """Write the last dumped rows and stop the writer."""
+    self._queue.put(None)
+    self._thread.join()
+
+  def _write_loop(self):
+    while True:
+      item = self._queue.get()
+      if item is None:
+        return
+      kind, payload = item
+      try:
+        if kind == _ROW:
+          for key, value in payload.items():
+            logger.record_tabular(key, value)
+          logger.dump_tabular()
+        elif kind == _LOG:
+          logger.log(*payload)
+          if self.echo and not _has_seq_writer():
+            print(" ".join(str(arg) for arg in payload))
+            sys.stdout.flush()
+        else:
+          payload.set()
+      except Exception as e:
+        # Losing a row must not take the writer (and all later rows) down
+        print("metrics writer: %s" % e)
@@ -0,0 +1,269 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Replay buffers whose observations live in a memory-mapped file.
+
+Drop-in replacements for the baselines ReplayBuffer and
+PrioritizedReplayBuffer for capacities that do not fit in RAM. Every
+transition is a fixed-size record (obs_t, obs_tp1) in the mapped file,
+written in ring order, so writes are sequential; actions, rewards, dones
+and the priority trees stay in RAM. `sample` gathers its records from the
+file in ascending offset order.
+
+`_storage` is a read/write view over the records, so code that snapshots
+or restores baselines buffers through `_storage` (replay_io,
+training_state) works unchanged.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from baselines.deepq.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+
+from sc2rl.memory import _priority_tree_nbytes
+
+
+class FrameStore(object):
+  """Fixed-size (obs_t, obs_tp1) records in a memory-mapped file.
+
+  The file is created on the first write, once the observation shape is
+  known. Without a `path` it is a temporary file that is unlinked as soon
+  as it is mapped, so it goes away with the process.
+
+  Parameters
+  ----------
+  capacity: int
+      number of records
+  path: str
+      file to map, or None for an anonymous temporary file
+  directory: str
+      where the temporary file is created when `path` is None
+  dtype: np.dtype
+      dtype frames are stored as; defaults to that of the first observation
+  in_memory: bool
+      keep the records in a plain numpy array instead of a file; a compact
+      replay for observations that fit in RAM as fixed-size records
+  """
+
+  def __init__(self, capacity, path=None, directory=None, dtype=None, in_memory=False):
+    self.capacity = capacity
+    self.path = path
+    self.directory = directory
+    self.dtype = dtype
+    self.in_memory = in_memory
+    self.frames = None
+
+  def _allocate(self, obs):
+    obs = np.asarray(obs)
+    dtype = np.dtype(self.dtype or obs.dtype)
+    shape = (self.capacity, 2) + obs.shape
+    if self.in_memory:
+      self.frames = np.zeros(shape, dtype=dtype)
+    elif self.path is None:
+      fd, path = tempfile.mkstemp(prefix="replay_", suffix=".frames", dir=self.directory)
+      os.close(fd)
+      self.frames = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+      os.unlink(path)
+    else:
+      self.frames = np.memmap(self.path, dtype=dtype, mode="w+", shape=shape)
+
+  def write(self, idx, obs_t, obs_tp1):
+    if self.frames is None:
+      self._allocate(obs_t)
+    record = self.frames[idx]
+    record[0] = obs_t
+    record[1] = obs_tp1
+
+  def write_many(self, idxes, obs_t, obs_tp1):
+    if self.frames is None:
+      self._allocate(obs_t[0])
+    self.frames[idxes, 0] = obs_t
+    self.frames[idxes, 1] = obs_tp1
+
+  def gather(self, idxes):
+    """Return the obs_t and obs_tp1 batches of records `idxes`."""
+    idxes = np.asarray(idxes)
+    # Read the file front to back, then put the batch back in sample order
+    order = np.argsort(idxes, kind="mergesort")
+    records = np.empty((len(idxes),) + self.frames.shape[1:], dtype=self.frames.dtype)
+    records[order] = self.frames[idxes[order]]
+    return records[:, 0], records[:, 1]
+
+  @property
+  def nbytes(self):
+    return 0 if self.frames is None else self.frames.nbytes
+
+  def flush(self):
+    if isinstance(self.frames, np.memmap):
+      self.frames.flush()
+
+
+class _Records(object):
+  """Sequence view of a MmapReplayBuffer as baselines transition tuples."""
+
+  def __init__(self, buffer):
+    self._buffer = buffer
+
+  def __len__(self):
+    return self._buffer._size
+
+  def __getitem__(self, idx):
+    if not 0 <= idx < self._buffer._size:
+      raise IndexError(idx)
+    b = self._buffer
+    record = b._frames.frames[idx]
+    return (np.array(record[0]), b._actions[idx], b._rewards[idx],
+            np.array(record[1]), b._dones[idx])
+
+
+class MmapReplayBuffer(ReplayBuffer):
+  def __init__(self, size, path=None, directory=None, dtype=None, frames=None, in_memory=False):
+    """Replay buffer storing observations in a memory-mapped FrameStore.
+
+    Parameters
+    ----------
+    size: int
+        Max number of transitions to store in the buffer. When the buffer
+        overflows the old memories are dropped.
+    path, directory, dtype, in_memory:
+        see FrameStore
+    frames: FrameStore
+        frames of another buffer that is added to in lockstep with this one
+        and stores the same observations (the x and y buffers of the omni
+        learner); this buffer then only keeps its own actions and rewards.
+    """
+    # ReplayBuffer.__init__ assigns _storage before _maxsize, so everything
+    # the _storage setter needs is set up first
+    self._maxsize = size
+    self._owns_frames = frames is None
+    if frames is None:
+      frames = FrameStore(size, path, directory, dtype, in_memory)
+    self._frames = frames
+    if self._frames.capacity != size:
+      raise ValueError("shared frames hold %d records, buffer size is %d" % (
+        self._frames.capacity, size))
+    self._actions = None
+    self._rewards = np.zeros(size, dtype=np.float32)
+    self._dones = np.zeros(size, dtype=np.float32)
+    super(MmapReplayBuffer, self).__init__(size)
+
+  @property
+  def frames(self):
+    return self._frames
+
+  @property
+  def _storage(self):
+    return _Records(self)
+
+  @_storage.setter
+  def _storage(self, transitions):
+    # Also called with [] by ReplayBuffer.__init__
+    self._size = 0
+    self._next_idx = 0
+    for data in transitions:
+      self._write(self._size, *data)
+      self._size += 1
+    self._next_idx = self._size % self._maxsize
+
+  def __len__(self):
+    return self._size
+
+  def _write(self, idx, obs_t, action, reward, obs_tp1, done):
+    if self._actions is None:
+      action = np.asarray(action)
+      self._actions = np.zeros((self._maxsize,) + action.shape, dtype=action.dtype)
+    if self._owns_frames:
+      self._frames.write(idx, obs_t, obs_tp1)
+    self._actions[idx] = action
+    self._rewards[idx] = reward
+    self._dones[idx] = done
+
+  def add(self, obs_t, action, reward, obs_tp1, done):
+    self._write(self._next_idx, obs_t, action, reward, obs_tp1, done)
+    self._size = min(self._size + 1, self._maxsize)
+    self._next_idx = (self._next_idx + 1) % self._maxsize
+
+  def extend(self, idxes, obs_t, action, reward, obs_tp1, done):
+    """Write whole columns of transitions to ring positions `idxes` (see replay_io.bulk_add)."""
+    if self._actions is None:
+      self._actions = np.zeros((self._maxsize,) + action.shape[1:], dtype=action.dtype)
+    if self._owns_frames:
+      self._frames.write_many(idxes, obs_t, obs_tp1)
+    self._actions[idxes] = action
+    self._rewards[idxes] = reward
+    self._dones[idxes] = done
+    self._size = min(self._size + len(idxes), self._maxsize)
+    self._next_idx = (idxes[-1] + 1) % self._maxsize
+
+  def _encode_sample(self, idxes):
+    idxes = np.asarray(idxes)
+    obses_t, obses_tp1 = self._frames.gather(idxes)
+    return (obses_t, self._actions[idxes], self._rewards[idxes],
+            obses_tp1, self._dones[idxes])
+
+  def footprint(self):
+    """RAM and disk use, in the format of sc2rl.memory.replay_footprint."""
+    per_transition = self._rewards.itemsize + self._dones.itemsize
+    if self._actions is not None:
+      per_transition += self._actions[0].nbytes
+    fixed_bytes = 0
+    if hasattr(self, "_it_sum"):
+      fixed_bytes += _priority_tree_nbytes(self._maxsize)
+    frame_bytes = self._frames.nbytes if self._owns_frames else 0
+    disk_bytes = 0
+    if self._frames.in_memory:
+      per_transition += frame_bytes // self._maxsize
+    else:
+      disk_bytes = frame_bytes
+    return {
+      "transitions": self._size,
+      "capacity": self._maxsize,
+      "bytes_per_transition": float(per_transition),
+      "resident_bytes": fixed_bytes + per_transition * self._maxsize,
+      "projected_bytes": fixed_bytes + per_transition * self._maxsize,
+      "disk_bytes": disk_bytes,
+    }
+
+
+class MmapPrioritizedReplayBuffer(PrioritizedReplayBuffer, MmapReplayBuffer):
+  def __init__(self, size, alpha, path=None, directory=None, dtype=None, frames=None,
+               in_memory=False):
+    """PrioritizedReplayBuffer over a MmapReplayBuffer.
+
+    Parameters
+    ----------
+    size: int
+        Max number of transitions to store in the buffer.
+    alpha: float
+        how much prioritization is used (0 - no prioritization, 1 - full
+        prioritization)
+    path, directory, dtype, frames, in_memory:
+        see MmapReplayBuffer
+    """
+    # PrioritizedReplayBuffer.__init__ reaches MmapReplayBuffer.__init__ through
+    # super() with the size only, so set up the mapped storage again afterwards
+    PrioritizedReplayBuffer.__init__(self, size, alpha)
+    MmapReplayBuffer.__init__(self, size, path, directory, dtype, frames, in_memory)
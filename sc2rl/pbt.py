@@ -0,0 +1,224 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Population based training (Jaderberg et al., 2017) of `learn()` workers.
+
+Every member is a forked process running a regular `learn()` whose
+callback is a `PBTCallback`. Every `ready_steps` env steps a member
+publishes its rolling `mean_100ep_reward` and checkpoints its weights,
+optimizer state and replay buffers. A member in the bottom `truncation`
+fraction then exploits a random member of the top fraction (copies its
+checkpoint, replay and hyperparameters) and explores by perturbing the
+copied learning rate and exploration rate.
+
+The learner must expose `lr_var` (a non-saved tf.Variable used as the
+learning rate), `exploration` (a ScheduleTable), `mean_100ep_reward`
+(None until the first episode ends) and a `replay_buffers` dict (name ->
+buffer) as locals, as sc2rl.dqn does. sc2rl.apex keeps its replay in a
+separate process and so cannot be a member.
+"""
+
+import os
+import json
+import time
+import ctypes
+import random
+import multiprocessing
+
+import numpy as np
+import tensorflow as tf
+
+from baselines import logger
+
+from sc2rl import replay_io
+
+
+class Population(object):
+  """Scores and checkpoints of all members, shared by the forked processes."""
+
+  def __init__(self, size, pbt_dir, ctx=multiprocessing):
+    self.size = size
+    self.pbt_dir = pbt_dir
+    self._scores = ctx.Array(ctypes.c_double, [np.nan] * size)
+    self._steps = ctx.Array(ctypes.c_long, [0] * size)
+    self._locks = [ctx.Lock() for _ in range(size)]
+
+  def member_dir(self, member_id):
+    path = os.path.join(self.pbt_dir, "member_%d" % member_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+  def lock(self, member_id):
+    return self._locks[member_id]
+
+  def report(self, member_id, score, steps):
+    self._scores[member_id] = score
+    self._steps[member_id] = steps
+
+  def scores(self):
+    return np.array(self._scores[:])
+
+  def steps(self):
+    return np.array(self._steps[:])
+
+  def select_donor(self, member_id, truncation, rng):
+    """A top member to copy from if `member_id` is in the bottom fraction, else None."""
+    scores = self.scores()
+    ready = np.flatnonzero(~np.isnan(scores))
+    cutoff = int(np.ceil(truncation * len(ready)))
+    if member_id not in ready or len(ready) < 2 or cutoff == 0:
+      return None
+    ranked = ready[np.argsort(scores[ready])]
+    if member_id not in ranked[:cutoff]:
+      return None
+    return int(rng.choice(list(ranked[-cutoff:])))
+
+
+class PBTCallback(object):
+  """`learn()` callback making the learner a member of a `Population`."""
+
+  def __init__(self, member_id, population, ready_steps=20000, truncation=0.2,
+               perturb_factors=(0.8, 1.2), callback=None, seed=None):
+    self.member_id = member_id
+    self.population = population
+    self.ready_steps = ready_steps
+    self.truncation = truncation
+    self.perturb_factors = perturb_factors
+    self._callback = callback
+    self._rng = random.Random(seed)
+    self._last_ready = 0
+    self._saver = None
+    self.hparams = None
+    self.eps_scale = 1.0
+
+  def __call__(self, locals, globals):
+    if self._callback is not None and self._callback(locals, globals):
+      return True
+    t = locals['t']
+    if t - self._last_ready < self.ready_steps or locals.get('mean_100ep_reward') is None:
+      return False
+    self._last_ready = t
+    if self.hparams is None:
+      self.hparams = {"lr": float(locals['sess'].run(locals['lr_var'])), "eps_scale": 1.0}
+
+    # Record through the learner's metrics sink when it has one, see sc2rl.metrics
+    metrics = locals.get('metrics', logger)
+    self._save(locals)
+    self.population.report(self.member_id, locals['mean_100ep_reward'], t)
+    donor = self.population.select_donor(self.member_id, self.truncation, self._rng)
+    if donor is not None:
+      self._exploit(locals, donor)
+      self._explore(locals)
+      metrics.log("PBT member {} copied member {}: lr {:.6g}, eps scale {:.3g}".format(
+        self.member_id, donor, self.hparams["lr"], self.hparams["eps_scale"]))
+    metrics.record_tabular("pbt lr", self.hparams["lr"])
+    metrics.record_tabular("pbt eps scale", self.hparams["eps_scale"])
+    return False
+
+  def _checkpoint_path(self, member_id):
+    return os.path.join(self.population.member_dir(member_id), "model")
+
+  def _save(self, locals):
+    if self._saver is None:
+      self._saver = tf.train.Saver()
+    member_dir = self.population.member_dir(self.member_id)
+    with self.population.lock(self.member_id):
+      self._saver.save(locals['sess'], self._checkpoint_path(self.member_id))
+      for name, replay_buffer in locals['replay_buffers'].items():
+        replay_io.save(replay_buffer, os.path.join(member_dir, name + ".pkl"))
+      with open(os.path.join(member_dir, "hparams.json"), "w") as f:
+        json.dump(self.hparams, f)
+
+  def _exploit(self, locals, donor):
+    donor_dir = self.population.member_dir(donor)
+    with self.population.lock(donor):
+      self._saver.restore(locals['sess'], self._checkpoint_path(donor))
+      for name, replay_buffer in locals['replay_buffers'].items():
+        path = os.path.join(donor_dir, name + ".pkl")
+        if os.path.exists(path):
+          replay_io.load(replay_buffer, path)
+      with open(os.path.join(donor_dir, "hparams.json")) as f:
+        donor_hparams = json.load(f)
+    # Move this member's exploration onto the donor's
+    locals['exploration'].scale(donor_hparams["eps_scale"] / self.hparams["eps_scale"],
+                                start=locals['t'])
+    self.hparams = dict(donor_hparams)
+    locals['lr_var'].load(self.hparams["lr"], locals['sess'])
+
+  def _explore(self, locals):
+    lr_factor = self._rng.choice(self.perturb_factors)
+    eps_factor = self._rng.choice(self.perturb_factors)
+    self.hparams["lr"] *= lr_factor
+    self.hparams["eps_scale"] *= eps_factor
+    locals['lr_var'].load(self.hparams["lr"], locals['sess'])
+    locals['exploration'].scale(eps_factor, start=locals['t'])
+
+
+def _member(member_fn, member_id, population, callback_kwargs):
+  callback = PBTCallback(member_id, population, seed=member_id, **callback_kwargs)
+  member_fn(member_id, callback)
+
+
+def run_population(member_fn, population_size, pbt_dir, poll_secs=60.,
+                   **callback_kwargs):
+  """Run `population_size` members in forked processes until all are done.
+
+  Parameters
+  ----------
+  member_fn: (int, PBTCallback) -> None
+      sets up logging and an env for the given member id and calls
+      `learn(..., callback=pbt_callback)`; runs inside the member process
+  population_size: int
+      number of members
+  pbt_dir: str
+      directory of the members' checkpoints and replay snapshots
+  poll_secs: float
+      seconds between population score reports of this process
+  callback_kwargs:
+      ready_steps, truncation, perturb_factors and callback of `PBTCallback`
+
+  Returns
+  -------
+  scores: np.array
+      last reported score of every member
+  """
+  ctx = multiprocessing.get_context("fork")
+  population = Population(population_size, pbt_dir, ctx=ctx)
+  processes = []
+  for member_id in range(population_size):
+    process = ctx.Process(target=_member,
+                          args=(member_fn, member_id, population, callback_kwargs))
+    process.start()
+    processes.append(process)
+
+  try:
+    while any(process.is_alive() for process in processes):
+      time.sleep(poll_secs)
+      print("pbt scores : %s steps : %s" % (population.scores(), population.steps()))
+  finally:
+    for process in processes:
+      if process.is_alive():
+        process.terminate()
+      process.join()
+  return population.scores()
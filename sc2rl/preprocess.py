@@ -0,0 +1,107 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+
+from pysc2.lib import features
+
+_PLAYER_RELATIVE = features.SCREEN_FEATURES.player_relative.index
+_PLAYER_FRIENDLY = 1
+_PLAYER_NEUTRAL = 3  # beacon/minerals
+_PLAYER_HOSTILE = 4
+
+
+def player_relative_screen(obs):
+  """The `player_relative` screen layer of a single pysc2 TimeStep."""
+  return obs.observation["screen"][_PLAYER_RELATIVE]
+
+
+def beacon_screen(player_relative):
+  """Binary mask of the neutral units (beacon/minerals). Works on batches too."""
+  return (player_relative == _PLAYER_NEUTRAL).astype(int)
+
+
+def player_position(player_relative):
+  """[x, y] centroid of the friendly units on a single screen.
+
+  Raises ValueError when no friendly unit is visible, e.g. when something
+  else overlaps the marine.
+  """
+  player_y, player_x = (player_relative == _PLAYER_FRIENDLY).nonzero()
+  return [int(player_x.mean()), int(player_y.mean())]
+
+
+def centroids(player_relative, player_id):
+  """Vectorized [x, y] centroids of `player_id` units over a batch of screens.
+
+  Parameters
+  ----------
+  player_relative: np.array
+      (batch, height, width) stack of `player_relative` layers
+  player_id: int
+      _PLAYER_FRIENDLY, _PLAYER_NEUTRAL or _PLAYER_HOSTILE
+
+  Returns
+  -------
+  coords: np.array
+      (batch, 2) int array of [x, y]; -1 where no such unit is visible
+  """
+  mask = (player_relative == player_id)
+  counts = mask.sum(axis=(1, 2))
+  ys = np.arange(mask.shape[1])
+  xs = np.arange(mask.shape[2])
+  sum_y = (mask.sum(axis=2) * ys).sum(axis=1)
+  sum_x = (mask.sum(axis=1) * xs).sum(axis=1)
+  safe_counts = np.maximum(counts, 1)
+  coords = np.stack([sum_x // safe_counts, sum_y // safe_counts], axis=1)
+  coords[counts == 0] = -1
+  return coords
+
+
+def player_relative_planes(player_relative):
+  """Friendly, neutral and hostile masks as float channels.
+
+  (..., height, width) -> (..., height, width, 3), the input layout of the
+  convolutional A2C policy.
+  """
+  ids = np.array([_PLAYER_FRIENDLY, _PLAYER_NEUTRAL, _PLAYER_HOSTILE])
+  return (player_relative[..., None] == ids).astype(np.float32)
+
+
+def center_on(screen, position):
+  """Shift `screen` so that `position` ([x, y]) lands on its center.
+
+  Pixels shifted in from outside the screen are 0, so the agent sees its
+  surroundings in a frame that moves with it.
+  """
+  height, width = screen.shape[:2]
+  dx = position[0] - width // 2
+  dy = position[1] - height // 2
+  centered = np.zeros_like(screen)
+  src_y = slice(max(dy, 0), height + min(dy, 0))
+  dst_y = slice(max(-dy, 0), height + min(-dy, 0))
+  src_x = slice(max(dx, 0), width + min(dx, 0))
+  dst_x = slice(max(-dx, 0), width + min(-dx, 0))
+  centered[dst_y, dst_x] = screen[src_y, src_x]
+  return centered
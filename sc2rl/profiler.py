@@ -0,0 +1,149 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import time
+import numpy as np
+
+from baselines import logger
+
+
+class _NullPhase(object):
+  """Shared no-op context manager returned while profiling is disabled."""
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+  def __init__(self, samples):
+    self._samples = samples
+    self._start = 0.0
+
+  def __enter__(self):
+    self._start = time.perf_counter()
+    return self
+
+  def __exit__(self, *args):
+    self._samples.append(time.perf_counter() - self._start)
+    return False
+
+
+class PhaseProfiler(object):
+  """Wall-clock timers around the phases of the training loop.
+
+  Wrap each phase of a step in `with profiler.phase(name):` and call
+  `profiler.step(t)` once per env step. Every `rollup_freq` steps the
+  collected durations are summarized (mean, p50/p90/p99, max, share of the
+  step time) and recorded on the baselines logger as `profile/<phase>/...`
+  keys, so they are written by the next `logger.dump_tabular()` to whatever
+  outputs `start.py` configured. Pass `sink` (e.g. a sc2rl.metrics
+  MetricsSink) to record them there instead. A log-spaced histogram per phase is kept
+  over the whole run, see `histogram`.
+
+  When `enabled` is False, `phase` hands back a shared no-op context manager
+  and `step` returns right away.
+  """
+
+  def __init__(self, enabled=True, rollup_freq=1000, min_seconds=1e-6,
+               max_seconds=10.0, num_buckets=40, sink=None):
+    self.enabled = enabled
+    self.sink = sink if sink is not None else logger
+    self.rollup_freq = rollup_freq
+    self.bucket_edges = np.logspace(np.log10(min_seconds),
+                                    np.log10(max_seconds), num_buckets + 1)
+    self._samples = {}
+    self._phases = {}
+    self._histograms = {}
+    self._steps = 0
+    self._window_start = time.perf_counter()
+    self.last_summary = {}
+
+  def phase(self, name):
+    if not self.enabled:
+      return _NULL_PHASE
+    phase = self._phases.get(name)
+    if phase is None:
+      self._samples[name] = []
+      phase = self._phases[name] = _Phase(self._samples[name])
+    return phase
+
+  def step(self, t=None):
+    """Count one env step and roll the window up every `rollup_freq` steps."""
+    if not self.enabled:
+      return
+    self._steps += 1
+    if self._steps >= self.rollup_freq:
+      self.rollup(t)
+
+  def rollup(self, t=None):
+    """Summarize and log the current window, then start a new one."""
+    now = time.perf_counter()
+    window_seconds = max(now - self._window_start, 1e-12)
+    summary = {}
+    for name, samples in self._samples.items():
+      if not samples:
+        continue
+      durations = np.asarray(samples)
+      del samples[:]
+      counts, _ = np.histogram(np.clip(durations, self.bucket_edges[0],
+                                       self.bucket_edges[-1]),
+                               bins=self.bucket_edges)
+      if name in self._histograms:
+        self._histograms[name] += counts
+      else:
+        self._histograms[name] = counts
+      p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+      summary[name] = {
+        "calls": len(durations),
+        "mean_ms": 1000. * durations.mean(),
+        "p50_ms": 1000. * p50,
+        "p90_ms": 1000. * p90,
+        "p99_ms": 1000. * p99,
+        "max_ms": 1000. * durations.max(),
+        "share": durations.sum() / window_seconds,
+      }
+
+    if summary:
+      if t is not None:
+        self.sink.record_tabular("profile/steps", t)
+      self.sink.record_tabular("profile/steps_per_sec", self._steps / window_seconds)
+      for name, stats in summary.items():
+        for key, value in stats.items():
+          self.sink.record_tabular("profile/%s/%s" % (name, key), value)
+
+    self.last_summary = summary
+    self._steps = 0
+    self._window_start = now
+    return summary
+
+  def histogram(self, name):
+    """Return (counts, bucket_edges) of every rolled-up duration of `name`, in seconds."""
+    counts = self._histograms.get(name, np.zeros(len(self.bucket_edges) - 1, dtype=np.int64))
+    return counts, self.bucket_edges
@@ -0,0 +1,158 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""StarCraft II replays of every Nth training episode, written off the hot path.
+
+The replay data has to be fetched from the game before the env is reset,
+so `ReplayCapture.capture` does that one request on the training thread.
+Writing the file and indexing it happen on a background thread. Every saved
+replay gets a line in `index.jsonl` in the replay directory with its
+episode number, reward, step and checkpoint version, and `read_index`
+sorts them to find the best and worst episodes.
+"""
+
+import os
+import json
+import queue
+import threading
+import collections
+
+from baselines import logger
+
+INDEX_FILE = "index.jsonl"
+
+
+def _replay_data(env):
+  """Replay of the game `env` is playing, as bytes."""
+  # pysc2 1.x keeps a single controller, later versions one per player
+  controller = getattr(env, "_controller", None)
+  if controller is None:
+    controller = env._controllers[0]
+  return controller.save_replay()
+
+
+class ReplayCapture(object):
+  """Saves the replay of every `period`-th episode on a background thread.
+
+  Parameters
+  ----------
+  replay_dir: str
+      directory of the replays and their index
+  period: int
+      save episodes 0, period, 2 * period, ...
+  map_name: str
+      prefix of the replay file names
+  max_pending: int
+      replays fetched but not yet written. When the writer falls behind,
+      further replays are skipped instead of stalling training.
+  sink: MetricsSink or baselines.logger
+      where messages go, the baselines logger by default. Messages are only
+      logged on the thread calling `capture` and `close`; a failed write is
+      reported by the next of those calls.
+  """
+
+  def __init__(self, replay_dir, period, map_name="episode", max_pending=4, sink=None):
+    self.replay_dir = replay_dir
+    self.sink = sink if sink is not None else logger
+    self.period = period
+    self.map_name = map_name
+    os.makedirs(replay_dir, exist_ok=True)
+    # (episode, error) of failed writes, appended by the writer thread
+    self._failures = collections.deque()
+    self._queue = queue.Queue(maxsize=max_pending)
+    self._thread = threading.Thread(target=self._write_loop, name="replay-capture")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def should_save(self, episode):
+    return self.period is not None and self.period > 0 and episode % self.period == 0
+
+  def capture(self, env, episode, reward, steps, checkpoint=None):
+    """Fetch the replay of the episode `env` just finished and queue it for writing.
+
+    Must be called before the env is reset.
+
+    Parameters
+    ----------
+    episode: int
+        number of the episode, starting at 0
+    reward: float
+        episode reward, stored in the index
+    steps: int
+        training step the episode ended at
+    checkpoint: int or str
+        version of the model that played the episode (e.g. the step of the
+        last snapshot), stored in the index
+    """
+    self._report_failures()
+    if self._queue.full():
+      self.sink.log("Replay writer behind, skipping the replay of episode {}".format(episode))
+      return
+    data = _replay_data(env)
+    self._queue.put((data, {
+      "episode": int(episode),
+      "reward": float(reward),
+      "steps": int(steps),
+      "checkpoint": checkpoint,
+    }))
+
+  def _write_loop(self):
+    index_path = os.path.join(self.replay_dir, INDEX_FILE)
+    while True:
+      item = self._queue.get()
+      if item is None:
+        self._queue.task_done()
+        return
+      data, entry = item
+      try:
+        filename = "%s_%08d.SC2Replay" % (self.map_name, entry["episode"])
+        with open(os.path.join(self.replay_dir, filename), "wb") as f:
+          f.write(data)
+        entry["file"] = filename
+        with open(index_path, "a") as f:
+          f.write(json.dumps(entry, sort_keys=True) + "\n")
+      except (IOError, OSError) as e:
+        self._failures.append((entry["episode"], e))
+      self._queue.task_done()
+
+  def _report_failures(self):
+    while self._failures:
+      episode, error = self._failures.popleft()
+      self.sink.log("Failed to save the replay of episode {}: {}".format(episode, error))
+
+  def close(self):
+    """Wait for the queued replays to be written and stop the writer."""
+    self._queue.put(None)
+    self._thread.join()
+    self._report_failures()
+
+
+def read_index(replay_dir, sort_by="reward", reverse=True):
+  """Index entries of the replays in `replay_dir`, best reward first by default."""
+  path = os.path.join(replay_dir, INDEX_FILE)
+  if not os.path.exists(path):
+    return []
+  with open(path) as f:
+    entries = [json.loads(line) for line in f if line.strip()]
+  return sorted(entries, key=lambda entry: entry[sort_by], reverse=reverse)
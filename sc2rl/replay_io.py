@@ -0,0 +1,144 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Snapshots of baselines replay buffers.
+
+A snapshot is a plain dict holding the stored transitions, the write
+position and, for PrioritizedReplayBuffer, the priority segment trees. It
+can be pickled to disk or restored into another buffer of the same
+capacity, e.g. to copy a better population member's replay in PBT.
+
+`bulk_add` fills a buffer from whole columns of transitions at once, to
+warm-start replay from a recorded dataset or an earlier run.
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+
+def snapshot(replay_buffer):
+  state = {
+    "maxsize": replay_buffer._maxsize,
+    "storage": list(replay_buffer._storage),
+    "next_idx": replay_buffer._next_idx,
+  }
+  if hasattr(replay_buffer, "_it_sum"):
+    state["it_sum"] = list(replay_buffer._it_sum._value)
+    state["it_min"] = list(replay_buffer._it_min._value)
+    state["max_priority"] = replay_buffer._max_priority
+  return state
+
+
+def restore(replay_buffer, state):
+  """Make `replay_buffer` hold exactly the transitions of `state`."""
+  if state["maxsize"] != replay_buffer._maxsize:
+    raise ValueError("snapshot of a buffer of size %d does not fit a buffer of size %d" % (
+      state["maxsize"], replay_buffer._maxsize))
+  replay_buffer._storage = list(state["storage"])
+  replay_buffer._next_idx = state["next_idx"]
+  if hasattr(replay_buffer, "_it_sum"):
+    if "it_sum" in state:
+      replay_buffer._it_sum._value = list(state["it_sum"])
+      replay_buffer._it_min._value = list(state["it_min"])
+      replay_buffer._max_priority = state["max_priority"]
+    else:
+      # Uniform snapshot into a prioritized buffer: every transition at max priority
+      replay_buffer.update_priorities(range(len(replay_buffer._storage)),
+                                      [replay_buffer._max_priority] * len(replay_buffer._storage))
+
+
+def save(replay_buffer, path):
+  """Pickle a snapshot of `replay_buffer` to `path`, atomically."""
+  tmp_path = path + ".tmp"
+  with open(tmp_path, "wb") as f:
+    pickle.dump(snapshot(replay_buffer), f, protocol=pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, path)
+
+
+def load(replay_buffer, path):
+  with open(path, "rb") as f:
+    restore(replay_buffer, pickle.load(f))
+
+
+def _rebuild_tree(tree, operation):
+  """Recompute all inner nodes of a baselines segment tree from its leaves."""
+  values = np.array(tree._value, dtype=np.float64)
+  hi = tree._capacity
+  while hi > 1:
+    lo = hi // 2
+    values[lo:hi] = operation(values[2 * lo:2 * hi:2], values[2 * lo + 1:2 * hi:2])
+    hi = lo
+  tree._value = values.tolist()
+
+
+def bulk_add(replay_buffer, obs_t, action, reward, obs_tp1, done):
+  """Add a batch of transitions given as columns, oldest first.
+
+  Equivalent to calling `replay_buffer.add` on every row. New transitions
+  get the buffer's max priority; for large batches the segment trees are
+  rebuilt once instead of updated per transition. Only the last `_maxsize`
+  rows can survive, so earlier ones are skipped, but they still advance
+  the ring position like their `add` would have.
+
+  Returns the number of rows, i.e. of `add` calls this stands for.
+  """
+  capacity = replay_buffer._maxsize
+  total = len(reward)
+  skip = max(0, total - capacity)
+  columns = [np.asarray(column)[skip:] for column in (obs_t, action, reward, obs_tp1, done)]
+  num = total - skip
+  if not num:
+    return 0
+  start = (replay_buffer._next_idx + skip) % capacity
+  idxes = (start + np.arange(num)) % capacity
+
+  if hasattr(replay_buffer, "extend"):
+    replay_buffer.extend(idxes, *columns)
+  else:
+    storage = replay_buffer._storage
+    # Every slot up to the last index written is either already filled or
+    # written by this batch, as it would be by adding row by row
+    storage.extend([None] * (int(idxes.max()) + 1 - len(storage)))
+    for idx, transition in zip(idxes, zip(*columns)):
+      storage[idx] = transition
+    replay_buffer._next_idx = (start + num) % capacity
+
+  if hasattr(replay_buffer, "_it_sum"):
+    priority = replay_buffer._max_priority ** replay_buffer._alpha
+    tree_capacity = replay_buffer._it_sum._capacity
+    if num * np.log2(tree_capacity) < tree_capacity:
+      # A few rows, e.g. one step of a vec env: cheaper than a rebuild
+      for idx in idxes:
+        replay_buffer._it_sum[idx] = priority
+        replay_buffer._it_min[idx] = priority
+    else:
+      leaf = tree_capacity + idxes
+      for tree, operation in ((replay_buffer._it_sum, np.add), (replay_buffer._it_min, np.minimum)):
+        values = np.array(tree._value, dtype=np.float64)
+        values[leaf] = priority
+        tree._value = values.tolist()
+        _rebuild_tree(tree, operation)
+  return total
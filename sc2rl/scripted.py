@@ -0,0 +1,123 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Vectorized scripted policies for demonstration data.
+
+Policies map a (batch, height, width) stack of `player_relative` screens to
+one Move_screen target [x, y] per screen, using whole-batch numpy ops only,
+so one call serves every env of a ShmVecEnv. `demo_transitions` runs a
+policy on a MoveToBeacon vec env and yields the transitions in the layout
+the omni beacon learner stores: (beacon screen, (x, y), reward, next
+screen, done). The mineral shards DQN acts in 4-way moves on a
+marine-centered path memory screen instead, which these clicks do not
+translate to, so there are no shard demos.
+"""
+
+import numpy as np
+
+from pysc2.lib import actions as sc2_actions
+
+from sc2rl.preprocess import centroids, beacon_screen, _PLAYER_FRIENDLY, _PLAYER_NEUTRAL
+
+_MOVE_SCREEN = sc2_actions.FUNCTIONS.Move_screen.id
+_NOT_QUEUED = [0]
+
+
+def beacon_policy(player_relative):
+  """Click the beacon centroid; screens without a beacon click the center."""
+  targets = centroids(player_relative, _PLAYER_NEUTRAL)
+  missing = targets[:, 0] < 0
+  targets[missing] = [player_relative.shape[2] // 2, player_relative.shape[1] // 2]
+  return targets
+
+
+def nearest_shard_policy(player_relative):
+  """Click the neutral pixel closest to the marines' centroid.
+
+  Screens without a visible shard (or marine) click where the marines
+  already are, or the center when they are not visible either.
+  """
+  batch, height, width = player_relative.shape
+  marines = centroids(player_relative, _PLAYER_FRIENDLY)
+  no_marine = marines[:, 0] < 0
+  marines[no_marine] = [width // 2, height // 2]
+
+  ys, xs = np.mgrid[0:height, 0:width]
+  distances = ((xs[None] - marines[:, 0, None, None]) ** 2 +
+               (ys[None] - marines[:, 1, None, None]) ** 2).astype(np.float64)
+  shards = player_relative == _PLAYER_NEUTRAL
+  distances[~shards] = np.inf
+  nearest = distances.reshape(batch, -1).argmin(axis=1)
+  targets = np.stack([nearest % width, nearest // width], axis=1)
+  no_shard = ~shards.any(axis=(1, 2))
+  targets[no_shard] = marines[no_shard]
+  return targets
+
+
+POLICIES = {
+  "beacon": beacon_policy,
+  "nearest_shard": nearest_shard_policy,
+}
+
+
+def move_calls(targets):
+  """One [Move_screen] FunctionCall list per target, for ShmVecEnv.step."""
+  return [[sc2_actions.FunctionCall(_MOVE_SCREEN, [_NOT_QUEUED, [int(x), int(y)]])]
+          for x, y in targets]
+
+
+def demo_transitions(vec_env, num_steps, policy=beacon_policy, screen_fn=beacon_screen):
+  """Run `policy` on every env of a MoveToBeacon `vec_env` for `num_steps` steps.
+
+  Yields one dict of obs_t, action, reward, obs_tp1 and done columns (one
+  row per env whose move ran, see ShmVecEnv.executed) per step. The vec env resets finished envs itself, so the
+  obs_tp1 of a done transition is the first screen of the next episode;
+  learners do not bootstrap through it.
+
+  Parameters
+  ----------
+  vec_env: ShmVecEnv
+      MoveToBeacon envs whose obs hold a "player_relative" array
+  num_steps: int
+      vec env steps to run
+  policy: (batch, h, w) array -> (batch, 2) array
+      batched click policy, by default the beacon centroid
+  screen_fn: (batch, h, w) array -> array
+      what is stored as observation, by default the beacon mask
+  """
+  obs = vec_env.reset()
+  screens = screen_fn(obs["player_relative"])
+  for _ in range(num_steps):
+    targets = policy(obs["player_relative"])
+    obs, rewards, dones = vec_env.step(move_calls(targets))
+    next_screens = screen_fn(obs["player_relative"])
+    executed = vec_env.executed.copy()
+    yield {
+      "obs_t": screens[executed],
+      "action": targets[executed],
+      "reward": rewards[executed].astype(np.float32),
+      "obs_tp1": next_screens[executed],
+      "done": dones[executed].astype(np.float32),
+    }
+    screens = next_screens
@@ -0,0 +1,244 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Env worker pool that hands observations over in shared memory.
+
+Unlike baselines' SubprocVecEnv, which pickles every observation through a
+pipe, each worker here writes its preprocessed observation, reward and done
+flag into preallocated shared arrays. Only the commands and the (small)
+pysc2 FunctionCalls go over the pipes, and the trainer reads the batched
+observations of all envs as numpy views of the shared arrays.
+"""
+
+import ctypes
+import multiprocessing
+
+import numpy as np
+
+from pysc2.env import environment
+from pysc2.lib import actions as sc2_actions
+from pysc2.lib import features
+
+from sc2rl.action_catalog import load_catalog
+from sc2rl.army_select import needs_reselect, select_and_step
+
+_PLAYER_RELATIVE = features.SCREEN_FEATURES.player_relative.index
+_SELECT_ARMY = sc2_actions.FUNCTIONS.select_army.id
+_SELECT_ALL = [0]
+
+
+def _shared_array(ctx, shape, dtype):
+  dtype = np.dtype(dtype)
+  raw = ctx.RawArray(ctypes.c_byte, max(int(np.prod(shape)), 1) * dtype.itemsize)
+  return raw, shape, dtype
+
+
+def _view(shared):
+  raw, shape, dtype = shared
+  return np.frombuffer(raw, dtype=dtype)[:int(np.prod(shape))].reshape(shape)
+
+
+def player_relative_obs(timestep):
+  """Default `obs_fn`: the player_relative layer and the available actions mask."""
+  return {
+    "player_relative": timestep.observation["screen"][_PLAYER_RELATIVE],
+    "available_actions": load_catalog().available_mask([timestep.observation["available_actions"]])[0],
+  }
+
+
+def player_relative_spec(screen_dim):
+  """`obs_spec` matching `player_relative_obs` for a screen_dim x screen_dim screen."""
+  catalog = load_catalog(screen_size=screen_dim)
+  return {
+    "player_relative": (catalog.spatial_shape("screen"), np.int32),
+    "available_actions": ((catalog.num_functions,), np.bool_),
+  }
+
+
+def select_army_reset(env):
+  """`reset_fn` that resets and selects all army units, as the learners do."""
+  env.reset()
+  return env.step(actions=[sc2_actions.FunctionCall(_SELECT_ARMY, [_SELECT_ALL])])
+
+
+def select_and_step_fn(env, timestep, actions):
+  """Default `step_fn`: re-select the army within the step when the action needs it."""
+  return select_and_step(env, timestep, actions[0])
+
+
+def _worker(index, env_fn, obs_fn, reset_fn, step_fn, conn, obs_shared, rewards_shared, dones_shared,
+            executed_shared, reselected_shared):
+  obs_views = dict((name, _view(shared)) for name, shared in obs_shared.items())
+  rewards = _view(rewards_shared)
+  dones = _view(dones_shared)
+  executed = _view(executed_shared)
+  reselected = _view(reselected_shared)
+
+  def write(timestep):
+    for name, value in obs_fn(timestep).items():
+      obs_views[name][index] = value
+
+  env = env_fn(index)
+  timestep = None
+  try:
+    while True:
+      command, data = conn.recv()
+      if command == "step":
+        reselected[index] = needs_reselect(timestep, data[0])
+        obs, executed[index] = step_fn(env, timestep, data)
+        timestep = obs[0]
+        done = timestep.step_type == environment.StepType.LAST
+        rewards[index] = timestep.reward
+        dones[index] = done
+        if done:
+          # Like SubprocVecEnv, start the next episode right away
+          timestep = reset_fn(env)[0]
+        write(timestep)
+        conn.send(None)
+      elif command == "reset":
+        timestep = reset_fn(env)[0]
+        write(timestep)
+        rewards[index] = 0
+        dones[index] = False
+        executed[index] = True
+        reselected[index] = False
+        conn.send(None)
+      elif command == "call":
+        method, args = data
+        conn.send(getattr(env, method)(*args))
+      elif command == "close":
+        conn.send(None)
+        break
+  finally:
+    env.close()
+
+
+class ShmVecEnv(object):
+  """Steps `len(env_fns)` pysc2 envs in lockstep in forked worker processes.
+
+  Parameters
+  ----------
+  env_fns: list of (int -> env)
+      env_fns[i](i) creates the env of worker i, inside the worker
+  obs_spec: dict
+      name -> (shape, dtype) of every array `obs_fn` returns, per env
+  obs_fn: TimeStep -> dict
+      turns a pysc2 TimeStep into the arrays stored in shared memory
+  reset_fn: env -> list of TimeStep
+      starts an episode; also used to auto-reset envs that finished
+  step_fn: (env, TimeStep, actions) -> (list of TimeStep, bool)
+      executes the actions sent to `step` given the env's latest TimeStep,
+      and tells whether they ran
+
+  The arrays returned by `reset` and `step` are views of shared memory that
+  the next `step` overwrites; copy what has to outlive it (e.g. replay).
+  `executed` is a (num_envs,) bool view of whether the actions of the last
+  `step` ran in each env; learners should not store the others.
+  `reselected` tells whether the first action sent to each env was
+  unavailable, so the default step_fn spent an extra step re-selecting.
+  """
+
+  def __init__(self, env_fns, obs_spec, obs_fn=player_relative_obs,
+               reset_fn=select_army_reset, step_fn=select_and_step_fn, ctx=None):
+    if ctx is None:
+      ctx = multiprocessing.get_context("fork")
+    self.num_envs = len(env_fns)
+    self.obs_spec = obs_spec
+    obs_shared = dict((name, _shared_array(ctx, (self.num_envs,) + tuple(shape), dtype))
+                      for name, (shape, dtype) in obs_spec.items())
+    rewards_shared = _shared_array(ctx, (self.num_envs,), np.float64)
+    dones_shared = _shared_array(ctx, (self.num_envs,), np.bool_)
+    executed_shared = _shared_array(ctx, (self.num_envs,), np.bool_)
+    reselected_shared = _shared_array(ctx, (self.num_envs,), np.bool_)
+
+    self._conns = []
+    self._processes = []
+    for index, env_fn in enumerate(env_fns):
+      conn, worker_conn = ctx.Pipe()
+      process = ctx.Process(target=_worker,
+                            args=(index, env_fn, obs_fn, reset_fn, step_fn, worker_conn,
+                                  obs_shared, rewards_shared, dones_shared, executed_shared,
+                                  reselected_shared))
+      process.daemon = True
+      process.start()
+      worker_conn.close()
+      self._conns.append(conn)
+      self._processes.append(process)
+
+    self.obs = dict((name, _view(shared)) for name, shared in obs_shared.items())
+    self.rewards = _view(rewards_shared)
+    self.dones = _view(dones_shared)
+    self.executed = _view(executed_shared)
+    self.reselected = _view(reselected_shared)
+    self._waiting = False
+    self.closed = False
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def _wait(self):
+    for conn in self._conns:
+      conn.recv()
+    self._waiting = False
+
+  def reset(self):
+    for conn in self._conns:
+      conn.send(("reset", None))
+    self._wait()
+    return self.obs
+
+  def step_async(self, actions):
+    """Send one list of FunctionCalls (what env.step takes) per env."""
+    for conn, action in zip(self._conns, actions):
+      conn.send(("step", action))
+    self._waiting = True
+
+  def step_wait(self):
+    self._wait()
+    return self.obs, self.rewards, self.dones
+
+  def step(self, actions):
+    self.step_async(actions)
+    return self.step_wait()
+
+  def call(self, index, method, *args):
+    """Call `method` on the env of worker `index` and return the result."""
+    self._conns[index].send(("call", (method, args)))
+    return self._conns[index].recv()
+
+  def close(self):
+    if self.closed:
+      return
+    if self._waiting:
+      self._wait()
+    for conn in self._conns:
+      conn.send(("close", None))
+    for conn in self._conns:
+      conn.recv()
+    for process in self._processes:
+      process.join()
+    self.closed = True
@@ -0,0 +1,74 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Import timing of the entry points.
+
+TensorFlow, baselines and pysc2 take seconds to import, so the entry
+points import them inside the branch that needs them and time every such
+block with an `ImportTimer`:
+
+  import_timer = ImportTimer()
+  with import_timer.phase("deepq"):
+    from sc2rl import dqn
+  print(import_timer.report())
+
+benchmark.py's startup group measures the cold import of every entry point
+in a fresh interpreter against a budget.
+"""
+
+import sys
+import time
+import contextlib
+import collections
+
+
+class ImportTimer(object):
+  """Wall time and number of newly loaded modules of named import blocks."""
+
+  def __init__(self):
+    self._created = time.perf_counter()
+    self.phases = collections.OrderedDict()
+
+  @contextlib.contextmanager
+  def phase(self, name):
+    num_modules = len(sys.modules)
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      seconds, modules = self.phases.get(name, (0., 0))
+      self.phases[name] = (seconds + time.perf_counter() - start,
+                           modules + len(sys.modules) - num_modules)
+
+  def total(self):
+    return sum(seconds for seconds, _ in self.phases.values())
+
+  def report(self):
+    """One line per phase, slowest first, and the total."""
+    lines = ["import time since start: %.3fs" % (time.perf_counter() - self._created)]
+    for name, (seconds, modules) in sorted(self.phases.items(), key=lambda item: -item[1][0]):
+      lines.append("  %-16s %7.3fs %5d modules" % (name, seconds, modules))
+    lines.append("  %-16s %7.3fs" % ("total", self.total()))
+    return "\n".join(lines)
+
@@ -0,0 +1,236 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+"""Resumable snapshots of a whole training run.
+
+A snapshot holds everything `learn()` needs to continue exactly where it
+stopped: all TF variables (networks, target networks and Adam slots), the
+step counter the exploration and beta schedules are derived from,
+episode statistics, RNG state, and the replay buffers.
+
+Replay buffers are written incrementally: each snapshot appends one
+segment file with the transitions added since the previous snapshot, plus
+the current priorities. Segments that the ring buffer has completely
+overwritten are deleted. The manifest that says which segments make up a
+snapshot is stored in `state.pkl`, which is replaced atomically last, so a
+crash while snapshotting leaves the previous snapshot intact.
+"""
+
+import os
+import pickle
+
+import numpy as np
+import tensorflow as tf
+
+_STATE_FILE = "state.pkl"
+
+
+def _atomic_pickle(obj, path):
+  tmp_path = path + ".tmp"
+  with open(tmp_path, "wb") as f:
+    pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, path)
+
+
+class SegmentedReplayWriter(object):
+  """Append-only on-disk copy of baselines (Prioritized)ReplayBuffers.
+
+  All buffers given to one writer must have the same capacity and receive
+  one `add` each per env step, like the x and y buffers of the omni beacon
+  learner. Their new transitions go into the same pickle, so observation
+  arrays shared between buffers (and between consecutive transitions) are
+  written and restored once.
+
+  `total_adds` is the number of `add` calls every buffer has seen in its
+  lifetime, which the learner counts; transition k lives at storage index
+  k % capacity.
+  """
+
+  def __init__(self, directory, manifest=None):
+    self.directory = directory
+    os.makedirs(directory, exist_ok=True)
+    if manifest is None:
+      manifest = {"total_adds": 0, "segments": [], "priorities": None}
+    self.manifest = manifest
+    self._pending_deletes = []
+
+  def write(self, replay_buffers, total_adds):
+    """Append the transitions added since the last call; returns the new manifest."""
+    capacity = next(iter(replay_buffers.values()))._maxsize
+    start = max(self.manifest["total_adds"], total_adds - capacity)
+    segments = list(self.manifest["segments"])
+    if total_adds > start:
+      transitions = dict((name, [buffer._storage[k % capacity] for k in range(start, total_adds)])
+                         for name, buffer in replay_buffers.items())
+      filename = "segment_%012d_%012d.pkl" % (start, total_adds)
+      _atomic_pickle(transitions, os.path.join(self.directory, filename))
+      segments.append((start, total_adds, filename))
+
+    priorities = None
+    max_priorities = {}
+    leaves = {}
+    for name, buffer in replay_buffers.items():
+      if hasattr(buffer, "_it_sum"):
+        # Leaves of the sum tree start at its power of 2 capacity
+        tree = buffer._it_sum
+        leaves[name] = np.array(tree._value[tree._capacity:tree._capacity + len(buffer._storage)])
+        max_priorities[name] = buffer._max_priority
+    if leaves:
+      priorities = "priorities_%012d.npz" % total_adds
+      np.savez(os.path.join(self.directory, priorities), **leaves)
+
+    # Drop segments whose every transition has been overwritten since
+    live = [segment for segment in segments if segment[1] > total_adds - capacity]
+    self._pending_deletes = [segment[2] for segment in segments if segment not in live]
+    if self.manifest["priorities"] not in (None, priorities):
+      self._pending_deletes.append(self.manifest["priorities"])
+
+    self.manifest = {
+      "total_adds": total_adds,
+      "capacity": capacity,
+      "segments": live,
+      "priorities": priorities,
+      "max_priorities": max_priorities,
+    }
+    return self.manifest
+
+  def commit(self):
+    """Delete files only the previous snapshot needed, once the new one is saved."""
+    for filename in self._pending_deletes:
+      path = os.path.join(self.directory, filename)
+      if os.path.exists(path):
+        os.remove(path)
+    self._pending_deletes = []
+
+  def restore(self, replay_buffers):
+    """Load the transitions and priorities of `self.manifest` into empty buffers."""
+    capacity = next(iter(replay_buffers.values()))._maxsize
+    total_adds = self.manifest["total_adds"]
+    size = min(total_adds, capacity)
+    storages = dict((name, [None] * size) for name in replay_buffers)
+    for start, end, filename in self.manifest["segments"]:
+      with open(os.path.join(self.directory, filename), "rb") as f:
+        transitions = pickle.load(f)
+      for name, storage in storages.items():
+        for k, transition in zip(range(start, end), transitions[name]):
+          if k >= total_adds - capacity:
+            storage[k % capacity] = transition
+
+    if self.manifest["priorities"] is not None:
+      leaves = np.load(os.path.join(self.directory, self.manifest["priorities"]))
+    for name, buffer in replay_buffers.items():
+      buffer._storage = storages[name]
+      buffer._next_idx = total_adds % capacity
+      if hasattr(buffer, "_it_sum") and name in self.manifest["max_priorities"]:
+        for idx, value in enumerate(leaves[name]):
+          buffer._it_sum[idx] = value
+          buffer._it_min[idx] = value
+        buffer._max_priority = self.manifest["max_priorities"][name]
+
+
+def replay_columns(state_dir, max_transitions=None):
+  """Columns of the replay buffers in the latest snapshot of `state_dir`.
+
+  Returns a dict mapping each buffer name to a dict of obs_t, action,
+  reward, obs_tp1 and done arrays holding its last `max_transitions`
+  transitions, oldest first, for replay_io.bulk_add.
+  """
+  with open(os.path.join(state_dir, _STATE_FILE), "rb") as f:
+    manifest = pickle.load(f)["replay"]
+  first = manifest["total_adds"] - manifest["capacity"]
+  if max_transitions is not None:
+    first = max(first, manifest["total_adds"] - max_transitions)
+  transitions = {}
+  for start, end, filename in manifest["segments"]:
+    if end <= first:
+      continue
+    with open(os.path.join(state_dir, "replay", filename), "rb") as f:
+      segment = pickle.load(f)
+    for name, rows in segment.items():
+      transitions.setdefault(name, []).extend(rows[max(0, first - start):])
+  columns = {}
+  for name, rows in transitions.items():
+    columns[name] = dict(zip(("obs_t", "action", "reward", "obs_tp1", "done"),
+                             [np.array(column) for column in zip(*rows)]))
+  return columns
+
+
+class TrainingState(object):
+  """Snapshots of a run in `state_dir`; see the module docstring."""
+
+  def __init__(self, state_dir):
+    self.state_dir = state_dir
+    os.makedirs(state_dir, exist_ok=True)
+    self._saver = None
+    self._writer = SegmentedReplayWriter(os.path.join(state_dir, "replay"))
+
+  @property
+  def saver(self):
+    if self._saver is None:
+      self._saver = tf.train.Saver(max_to_keep=2)
+    return self._saver
+
+  def exists(self):
+    return os.path.exists(os.path.join(self.state_dir, _STATE_FILE))
+
+  def save(self, sess, t, counters, replay_buffers, total_adds):
+    """Snapshot the run at step `t`.
+
+    Parameters
+    ----------
+    sess: tf.Session
+        session holding the variables to save
+    t: int
+        step the run resumes at
+    counters: dict
+        anything picklable the learner needs back (episode stats, lr, ...)
+    replay_buffers: dict
+        name -> replay buffer, all added to once per env step
+    total_adds: int
+        lifetime number of adds of each of the buffers
+    """
+    model_path = self.saver.save(sess, os.path.join(self.state_dir, "model"), global_step=t)
+    manifest = self._writer.write(replay_buffers, total_adds)
+    _atomic_pickle({
+      "t": t,
+      "model_path": os.path.basename(model_path),
+      "counters": counters,
+      "replay": manifest,
+      "np_random": np.random.get_state(),
+    }, os.path.join(self.state_dir, _STATE_FILE))
+    self._writer.commit()
+
+  def load(self, sess, replay_buffers):
+    """Restore the latest snapshot; returns (t, total_adds, counters).
+
+    `replay_buffers` maps the names used when saving to freshly created,
+    empty buffers.
+    """
+    with open(os.path.join(self.state_dir, _STATE_FILE), "rb") as f:
+      state = pickle.load(f)
+    self.saver.restore(sess, os.path.join(self.state_dir, state["model_path"]))
+    self._writer = SegmentedReplayWriter(os.path.join(self.state_dir, "replay"), state["replay"])
+    self._writer.restore(replay_buffers)
+    np.random.set_state(state["np_random"])
+    return state["t"], state["replay"]["total_adds"], state["counters"]
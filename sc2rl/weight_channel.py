@@ -0,0 +1,104 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import time
+import ctypes
+import multiprocessing
+
+import numpy as np
+
+
+class WeightChannel(object):
+  """Learner-to-actors weight publication through shared memory.
+
+  One writer publishes a list of arrays (e.g. `VariableSync.get()`) that
+  are flattened into a single shared float buffer; any number of forked
+  readers see the latest version without pickling. A sequence counter
+  (odd while a write is in progress) lets readers detect torn reads and
+  retry, so the writer never waits for them.
+
+  Create it before forking the readers, with the shapes of what will be
+  published.
+  """
+
+  def __init__(self, shapes, dtype=np.float32, ctx=multiprocessing):
+    self._shapes = [tuple(shape) for shape in shapes]
+    sizes = [int(np.prod(shape)) for shape in self._shapes]
+    self._offsets = np.cumsum([0] + sizes)
+    self._dtype = np.dtype(dtype)
+    self._raw = ctx.RawArray(ctypes.c_byte, max(int(self._offsets[-1]), 1) * self._dtype.itemsize)
+    self._sequence = ctx.RawValue(ctypes.c_uint64, 0)
+    self._version = ctx.RawValue(ctypes.c_uint64, 0)
+    self._published_at = ctx.RawValue(ctypes.c_double, 0.)
+    self._flat = None
+
+  def _views(self):
+    # Created lazily so every process maps its own view of the buffer
+    if self._flat is None:
+      self._flat = np.frombuffer(self._raw, dtype=self._dtype)[:self._offsets[-1]]
+    return [self._flat[start:end].reshape(shape) for start, end, shape
+            in zip(self._offsets[:-1], self._offsets[1:], self._shapes)]
+
+  @property
+  def version(self):
+    return self._version.value
+
+  def publish(self, arrays):
+    """Write a new version; returns the seconds spent copying."""
+    start = time.time()
+    views = self._views()
+    self._sequence.value += 1
+    for view, array in zip(views, arrays):
+      view[...] = array
+    self._version.value += 1
+    self._published_at.value = time.time()
+    self._sequence.value += 1
+    return self._published_at.value - start
+
+  def read(self, consumer, since_version=0, max_retries=100):
+    """Pass zero-copy views of the latest weights to `consumer(arrays)`.
+
+    `consumer` must be done with the views when it returns (e.g. it fed
+    them into TF assign ops). Nothing happens unless the channel holds a
+    version newer than `since_version`.
+
+    Returns
+    -------
+    (version, latency): (int, float)
+        version consumed and seconds since it was published, or None if
+        there was nothing newer or every attempt raced with the writer.
+    """
+    for _ in range(max_retries):
+      sequence = self._sequence.value
+      if sequence % 2:
+        time.sleep(0)
+        continue
+      version = self._version.value
+      if version <= since_version:
+        return None
+      published_at = self._published_at.value
+      consumer(self._views())
+      if self._sequence.value == sequence:
+        return version, time.time() - published_at
+    return None
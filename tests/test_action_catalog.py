@@ -0,0 +1,50 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sc2rl.action_catalog import load_catalog
+
+
+def test_available_mask():
+  catalog = load_catalog()
+  move = catalog.index["Move_screen"]
+  mask = catalog.available_mask([[0, 7, move], [], [0]])
+  assert mask.shape == (3, catalog.num_functions)
+  np.testing.assert_array_equal(mask.sum(axis=1), [3, 0, 1])
+  assert mask[0, move] and not mask[2, move]
+
+
+@pytest.mark.parametrize("screen_size", [None, 16, 32])
+def test_spatial_shape(screen_size):
+  catalog = load_catalog(screen_size=screen_size, minimap_size=8)
+  expected = screen_size or 84
+  assert catalog.spatial_shape("screen") == (expected, expected)
+  assert catalog.spatial_shape("minimap") == (8, 8)
@@ -0,0 +1,55 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+import multiprocessing
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+pytest.importorskip("baselines.deepq")
+
+from sc2rl.apex import _recv
+
+
+def _exit(code):
+  sys.exit(code)
+
+
+def test_recv_raises_when_a_process_died():
+  ctx = multiprocessing.get_context("fork")
+  conn, _ = ctx.Pipe()
+  process = ctx.Process(target=_exit, args=(3,), name="apex actor 0")
+  process.start()
+  process.join()
+  with pytest.raises(RuntimeError, match="apex actor 0 exited with code 3"):
+    _recv(conn, [process], poll_interval=0.01)
+
+
+def test_recv_returns_pending_data():
+  ctx = multiprocessing.get_context("fork")
+  conn, other = ctx.Pipe()
+  other.send(42)
+  assert _recv(conn, [], poll_interval=0.01) == 42
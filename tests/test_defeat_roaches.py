@@ -0,0 +1,79 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+tf = pytest.importorskip("tensorflow")
+pytest.importorskip("baselines.deepq")
+pytest.importorskip("pysc2.env.environment")
+
+from sc2rl.fake_env import FakeSC2Env
+from sc2rl.shm_vec_env import ShmVecEnv
+
+_SCREEN_DIM = 8
+
+
+def _load_trainer():
+  path = os.path.join(ROOT, "02-defeat-roaches", "02-defeat-roaches.py")
+  spec = importlib.util.spec_from_file_location("defeat_roaches", path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+def _fake_env(index):
+  return FakeSC2Env(map_name="DefeatRoaches", screen_size_px=(_SCREEN_DIM, _SCREEN_DIM),
+                    minimap_size_px=(_SCREEN_DIM, _SCREEN_DIM), episode_steps=20, seed=index)
+
+
+@pytest.mark.parametrize("prioritized_replay", [True, False])
+def test_learn_smoke(prioritized_replay):
+  roaches = _load_trainer()
+  seen = {}
+
+  def callback(locals, globals):
+    seen["t"] = locals["t"]
+    seen["num_episodes"] = locals["num_episodes"]
+
+  with ShmVecEnv([_fake_env] * 2, roaches.roach_obs_spec(_SCREEN_DIM),
+                 obs_fn=roaches.roach_obs) as vec_env:
+    with tf.Graph().as_default():
+      act = roaches.learn(vec_env, roaches.fully_conv_q_func, max_timesteps=120,
+                          buffer_size=50, batch_size=8, learning_starts=40,
+                          target_network_update_freq=40, prioritized_replay=prioritized_replay,
+                          print_freq=1, num_cpu=1, callback=callback)
+      planes = vec_env.reset()["planes"].copy()
+      actions = act(planes, stochastic=False)
+
+  assert seen["t"] == 118
+  assert seen["num_episodes"] >= 4
+  assert actions.shape == (2,)
+  assert np.all((actions >= 0) & (actions < _SCREEN_DIM * _SCREEN_DIM))
@@ -0,0 +1,89 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+pytest.importorskip("baselines.deepq")
+
+from sc2rl.mmap_replay import MmapReplayBuffer, MmapPrioritizedReplayBuffer
+
+
+def _fill(buffer, num, dim=4):
+  for i in range(num):
+    buffer.add(np.full((dim, dim), i, dtype=np.uint8), i % 3, float(i),
+               np.full((dim, dim), i + 1, dtype=np.uint8), float(i % 5 == 4))
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_add_and_sample(tmpdir, in_memory):
+  buffer = MmapReplayBuffer(10, directory=str(tmpdir), in_memory=in_memory)
+  assert len(buffer) == 0
+  _fill(buffer, 13)
+  assert len(buffer) == 10
+  assert buffer._next_idx == 3
+
+  obs_t, actions, rewards, obs_tp1, dones = buffer.sample(8)
+  assert obs_t.shape == (8, 4, 4)
+  # Transitions 0..2 were overwritten by 10..12
+  assert rewards.min() >= 3
+  np.testing.assert_array_equal(obs_t[:, 0, 0], rewards)
+  np.testing.assert_array_equal(obs_tp1[:, 0, 0], rewards + 1)
+  np.testing.assert_array_equal(actions, rewards.astype(int) % 3)
+
+
+def test_prioritized_sample_and_update():
+  buffer = MmapPrioritizedReplayBuffer(10, alpha=0.6, in_memory=True)
+  _fill(buffer, 12)
+  obs_t, actions, rewards, obs_tp1, dones, weights, idxes = buffer.sample(6, beta=0.4)
+  assert obs_t.shape == (6, 4, 4)
+  assert weights.shape == (6,)
+  buffer.update_priorities(idxes, np.arange(1., 7.))
+  assert buffer._max_priority == 6.
+
+
+def test_shared_frames():
+  x = MmapReplayBuffer(8, in_memory=True)
+  y = MmapReplayBuffer(8, frames=x.frames)
+  for i in range(5):
+    screen = np.full((4, 4), i, dtype=np.uint8)
+    x.add(screen, i, 1., screen, 0.)
+    y.add(screen, 10 + i, 1., screen, 0.)
+  obs_t, actions, _, _, _ = y._encode_sample([0, 4])
+  np.testing.assert_array_equal(obs_t[:, 0, 0], [0, 4])
+  np.testing.assert_array_equal(actions, [10, 14])
+
+
+def test_storage_round_trip():
+  buffer = MmapReplayBuffer(6, in_memory=True)
+  _fill(buffer, 4)
+  copy = MmapReplayBuffer(6, in_memory=True)
+  copy._storage = list(buffer._storage)
+  assert len(copy) == 4
+  assert copy._next_idx == 4
+  np.testing.assert_array_equal(copy._storage[2][0], buffer._storage[2][0])
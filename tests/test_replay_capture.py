@@ -0,0 +1,76 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sc2rl.replay_capture import ReplayCapture, read_index
+
+
+class _Controller(object):
+  def save_replay(self):
+    return b"replay"
+
+
+class _Env(object):
+  _controller = _Controller()
+
+
+class _Sink(object):
+  """Records every message with the thread that logged it."""
+
+  def __init__(self):
+    self.messages = []
+
+  def log(self, *args):
+    self.messages.append((threading.current_thread(), " ".join(str(arg) for arg in args)))
+
+
+def test_capture_writes_and_indexes(tmpdir):
+  sink = _Sink()
+  capture = ReplayCapture(str(tmpdir), period=2, map_name="Beacon", sink=sink)
+  for episode in range(4):
+    if capture.should_save(episode):
+      capture.capture(_Env(), episode, reward=float(episode), steps=10 * episode)
+  capture.close()
+  entries = read_index(str(tmpdir))
+  assert [entry["episode"] for entry in entries] == [2, 0]
+  assert os.path.exists(os.path.join(str(tmpdir), entries[0]["file"]))
+  assert not sink.messages
+
+
+def test_write_failures_are_logged_on_the_calling_thread(tmpdir):
+  sink = _Sink()
+  capture = ReplayCapture(str(tmpdir), period=1, map_name="Beacon", sink=sink)
+  # A directory in the way of the replay file makes the write fail
+  os.mkdir(os.path.join(str(tmpdir), "Beacon_00000000.SC2Replay"))
+  capture.capture(_Env(), 0, reward=1., steps=10)
+  capture.close()
+  assert len(sink.messages) == 1
+  thread, message = sink.messages[0]
+  assert thread is threading.current_thread()
+  assert "episode 0" in message
@@ -0,0 +1,87 @@
+'''
+MIT License
+
+Copyright (c) 2017 Jack Chen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+pytest.importorskip("baselines.deepq")
+
+from baselines.deepq.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+
+from sc2rl.mmap_replay import MmapReplayBuffer
+from sc2rl.replay_io import bulk_add
+
+
+def _columns(first, num, dim=4):
+  rows = np.arange(first, first + num)
+  obs_t = np.tile(rows[:, None, None], (1, dim, dim)).astype(np.uint8)
+  return (obs_t, rows % 3, rows.astype(np.float32), obs_t + 1,
+          (rows % 5 == 4).astype(np.float32))
+
+
+def _add_rows(buffer, columns):
+  for row in zip(*columns):
+    buffer.add(*row)
+
+
+def _transitions(buffer):
+  return [buffer._encode_sample([i]) for i in range(len(buffer))]
+
+
+def _assert_same(bulk, rowwise):
+  assert len(bulk) == len(rowwise)
+  assert bulk._next_idx == rowwise._next_idx
+  for got, expected in zip(_transitions(bulk), _transitions(rowwise)):
+    for got_column, expected_column in zip(got, expected):
+      np.testing.assert_array_equal(got_column, expected_column)
+
+
+_BUFFERS = {
+  "list": lambda: ReplayBuffer(10),
+  "prioritized": lambda: PrioritizedReplayBuffer(10, alpha=0.6),
+  "mmap": lambda: MmapReplayBuffer(10, in_memory=True),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(_BUFFERS))
+@pytest.mark.parametrize("prefill, num", [(0, 4), (3, 4), (0, 23), (3, 23), (8, 10)])
+def test_bulk_add_matches_add(kind, prefill, num):
+  bulk, rowwise = _BUFFERS[kind](), _BUFFERS[kind]()
+  for buffer in (bulk, rowwise):
+    _add_rows(buffer, _columns(100, prefill))
+
+  columns = _columns(0, num)
+  assert bulk_add(bulk, *columns) == num
+  _add_rows(rowwise, columns)
+  _assert_same(bulk, rowwise)
+
+  if kind == "prioritized":
+    leaves = slice(bulk._it_sum._capacity, 2 * bulk._it_sum._capacity)
+    np.testing.assert_allclose(bulk._it_sum._value[leaves], rowwise._it_sum._value[leaves])
+    np.testing.assert_allclose(bulk._it_min._value[leaves], rowwise._it_min._value[leaves])
+    assert bulk._it_sum.sum() == pytest.approx(rowwise._it_sum.sum())